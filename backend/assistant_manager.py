@@ -1,56 +1,162 @@
 # E:\MemoryForFuture\backend\assistant_manager.py
 
 import os
-import sys
-import subprocess
-import threading
-from typing import Optional
-
-_process: Optional[subprocess.Popen] = None
-
-def _script_path() -> str:
-    here = os.path.dirname(os.path.abspath(__file__))
-    return os.path.join(here, "azure_voice_assistant_api.py")  # Correct script name
-
-def print_output(pipe):
-    for line in iter(pipe.readline, ''):
-        if line:
-            print(f"[Assistant Subprocess] {line.strip()}")
-
-def start_assistant():
-    global _process
-    if _process and _process.poll() is None:
-        print(f"[AssistantManager] Assistant already running with PID {_process.pid}")
-        return {"status": "already_running", "pid": _process.pid}
-
-    cmd = [sys.executable, _script_path()]
-    print(f"[AssistantManager] Starting assistant subprocess with command: {cmd}")
-    _process = subprocess.Popen(
-        cmd,
-        cwd=os.path.dirname(_script_path()),
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True,
-        creationflags=subprocess.CREATE_NEW_PROCESS_GROUP if os.name == "nt" else 0,
+import time
+import uuid
+import asyncio
+from typing import Dict, Optional
+
+from azure_voice_assistant_api import run_assistant
+
+MAX_SESSIONS = int(os.getenv("ASSISTANT_MAX_SESSIONS", "8"))
+IDLE_TIMEOUT_SECONDS = int(os.getenv("ASSISTANT_IDLE_TIMEOUT_SECONDS", "600"))
+REAP_INTERVAL_SECONDS = 30
+
+# Used when a client starts the assistant without naming a profile
+DEFAULT_PROFILE_ID = os.getenv("ASSISTANT_DEFAULT_PROFILE_ID", "yash_me")
+
+
+class AssistantSession:
+    """
+    One running voice assistant loop, executed as an asyncio task in this process.
+    """
+
+    def __init__(self, profile_id: str, session_id: str):
+        self.profile_id = profile_id
+        self.session_id = session_id
+        self.started_at = time.time()
+        self.last_activity = time.monotonic()
+        self.turns = 0
+        self.last_user_input: Optional[str] = None
+        self.stop_reason: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def record_turn(self, user_input: str):
+        self.turns += 1
+        self.last_user_input = user_input
+        self.last_activity = time.monotonic()
+
+    @property
+    def status(self) -> str:
+        if self.task is None or not self.task.done():
+            return "running"
+        if self.stop_reason:
+            return "stopped"
+        if self.task.cancelled() or self.task.exception() is None:
+            return "finished"
+        return "failed"
+
+    def to_dict(self) -> dict:
+        info = {
+            "session_id": self.session_id,
+            "profile_id": self.profile_id,
+            "status": self.status,
+            "started_at": self.started_at,
+            "idle_seconds": round(time.monotonic() - self.last_activity, 1),
+            "turns": self.turns,
+            "last_user_input": self.last_user_input,
+        }
+        if self.stop_reason:
+            info["stop_reason"] = self.stop_reason
+        if self.status == "failed":
+            info["error"] = str(self.task.exception())
+        return info
+
+
+_sessions: Dict[str, AssistantSession] = {}
+_reaper: Optional[asyncio.Task] = None
+
+
+def _running_sessions():
+    return [s for s in _sessions.values() if s.status == "running"]
+
+
+async def _reap_idle_sessions():
+    while True:
+        await asyncio.sleep(REAP_INTERVAL_SECONDS)
+        now = time.monotonic()
+        for session in _running_sessions():
+            if now - session.last_activity > IDLE_TIMEOUT_SECONDS:
+                print(f"[AssistantManager] Stopping idle session {session.session_id}")
+                await _stop_session(session, "idle_timeout")
+        # Forget finished sessions once they have been idle for a full timeout
+        for session_id, session in list(_sessions.items()):
+            if session.status != "running" and now - session.last_activity > IDLE_TIMEOUT_SECONDS:
+                _sessions.pop(session_id, None)
+
+
+def _ensure_reaper():
+    global _reaper
+    if _reaper is None or _reaper.done():
+        _reaper = asyncio.get_running_loop().create_task(_reap_idle_sessions())
+
+
+async def _stop_session(session: AssistantSession, reason: str):
+    session.stop_reason = reason
+    if session.task and not session.task.done():
+        session.task.cancel()
+        try:
+            await session.task
+        except (asyncio.CancelledError, Exception):
+            pass
+
+
+async def start_assistant(profile_id: Optional[str] = None, session_id: Optional[str] = None) -> dict:
+    profile_id = profile_id or DEFAULT_PROFILE_ID
+    session_id = session_id or f"{profile_id}-{uuid.uuid4().hex[:8]}"
+
+    existing = _sessions.get(session_id)
+    if existing and existing.status == "running":
+        print(f"[AssistantManager] Session {session_id} already running")
+        return {**existing.to_dict(), "status": "already_running"}
+
+    if len(_running_sessions()) >= MAX_SESSIONS:
+        return {"status": "limit_reached", "max_sessions": MAX_SESSIONS}
+
+    session = AssistantSession(profile_id, session_id)
+    session.task = asyncio.get_running_loop().create_task(
+        run_assistant(profile_id, on_turn=session.record_turn),
+        name=f"assistant:{session_id}",
     )
-    # Start thread to print assistant output
-    threading.Thread(target=print_output, args=(_process.stdout,), daemon=True).start()
-    print(f"[AssistantManager] Assistant started with PID {_process.pid}")
-    return {"status": "started", "pid": _process.pid}
-
-def stop_assistant():
-    global _process
-    if not _process or _process.poll() is not None:
-        print(f"[AssistantManager] No running assistant found to stop")
+    _sessions[session_id] = session
+    _ensure_reaper()
+    print(f"[AssistantManager] Started session {session_id} for profile {profile_id}")
+    return {**session.to_dict(), "status": "started"}
+
+
+async def stop_assistant(session_id: Optional[str] = None, profile_id: Optional[str] = None) -> dict:
+    """
+    Stops one session, all sessions of a profile, or (with no arguments) every running session.
+    """
+    targets = [
+        s for s in _running_sessions()
+        if (session_id is None or s.session_id == session_id)
+        and (profile_id is None or s.profile_id == profile_id)
+    ]
+    if not targets:
+        print("[AssistantManager] No running assistant found to stop")
         return {"status": "not_running"}
 
-    print(f"[AssistantManager] Terminating assistant with PID {_process.pid}")
-    _process.terminate()
-    try:
-        _process.wait(timeout=5)
-    except subprocess.TimeoutExpired:
-        print(f"[AssistantManager] Killing assistant with PID {_process.pid} after timeout")
-        _process.kill()
-    _process = None
-    print(f"[AssistantManager] Assistant stopped")
-    return {"status": "stopped"}
+    for session in targets:
+        await _stop_session(session, "stopped_by_request")
+    print(f"[AssistantManager] Stopped sessions: {[s.session_id for s in targets]}")
+    return {"status": "stopped", "session_ids": [s.session_id for s in targets]}
+
+
+def assistant_status(session_id: Optional[str] = None, profile_id: Optional[str] = None) -> dict:
+    sessions = [
+        s.to_dict() for s in _sessions.values()
+        if (session_id is None or s.session_id == session_id)
+        and (profile_id is None or s.profile_id == profile_id)
+    ]
+    return {
+        "running": len(_running_sessions()),
+        "max_sessions": MAX_SESSIONS,
+        "sessions": sessions,
+    }
+
+
+async def stop_all_assistants():
+    await stop_assistant()
+    if _reaper and not _reaper.done():
+        _reaper.cancel()
@@ -1,12 +1,22 @@
-from fastapi import APIRouter, UploadFile, Form, File, HTTPException
+from fastapi import APIRouter, UploadFile, Form, File, HTTPException, BackgroundTasks, Request
+from fastapi.responses import StreamingResponse
 from azure.storage.blob import BlobServiceClient, ContentSettings
 from dotenv import load_dotenv
 from utils.voice_model_manager import get_voice_model_config, save_voice_model_config
 from utils.memory_reader import get_latest_memory_summary
+from utils.profile_utils import get_profile_info
+from utils.speech.engine_pool import speech_pool
+from utils.speech.long_form import LONG_FORM_MIN_CHARS, iter_long_form, synthesize_long_form
+from utils.speech.tts_cache import get_or_synthesize, stream_tts, prewarm_phrases, DEFAULT_OUTPUT_FORMAT, DEFAULT_PREWARM_PHRASES
+from utils.speech.audio_formats import AUDIO_FORMATS, accepts_audio, negotiate_audio_format
+from utils.voice_reply_store import store_voice_reply
+from utils.tracing import trace, span, traced_stream
+from typing import Optional
+from urllib.parse import quote
 import os
+import asyncio
 import uuid
 import openai
-import azure.cognitiveservices.speech as speechsdk
 
 # Load environment variables
 load_dotenv()
@@ -25,6 +35,8 @@ openai.api_base = os.getenv("AZURE_OPENAI_ENDPOINT")
 openai.api_version = os.getenv("AZURE_OPENAI_VERSION")
 deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT")
 
+DEFAULT_REPLY_FORMAT = "mp3"
+
 
 @router.post("/upload-voice")
 async def upload_voice(profile_id: str = Form(...), file: UploadFile = File(...)):
@@ -59,45 +71,133 @@ async def train_voice_model(profile_id: str = Form(...), voice_id: str = Form(..
 
 
 @router.post("/voice-chat")
-async def voice_chat(profile_id: str = Form(...), question: str = Form(...)):
+async def voice_chat(request: Request, profile_id: str = Form(...), question: str = Form(...)):
     try:
-        memory_summary = get_latest_memory_summary(profile_id, container_client)
-        voice_config = get_voice_model_config(profile_id, container_client)
+        with trace("voice_chat", profile_id=profile_id) as turn:
+            with span("context"):
+                memory_summary = get_latest_memory_summary(profile_id, container_client)
+                voice_config = get_voice_model_config(profile_id, container_client)
+
+            if not voice_config:
+                raise HTTPException(status_code=400, detail="No voice model found.")
+
+            prompt = (
+                f"You are a voice clone of a loved one, helping reflect on memories.\n"
+                f"Memories:\n{memory_summary}\n\n"
+                f"Speak with warmth and kindness as the person."
+            )
+
+            with span("llm", prompt_chars=len(prompt) + len(question)) as llm:
+                response = openai.chat.completions.create(
+                    model=deployment_name,
+                    messages=[
+                        {"role": "system", "content": prompt},
+                        {"role": "user", "content": question}
+                    ]
+                )
+                reply = response.choices[0].message.content
+                llm.set(reply_chars=len(reply))
+
+            accept = request.headers.get("accept")
+            audio_format = negotiate_audio_format(accept, default=DEFAULT_REPLY_FORMAT)
+            turn.set(audio_format=audio_format)
+            if accepts_audio(accept):
+                with span("tts_start"):
+                    audio_stream = stream_reply_audio(reply, voice_config, audio_format)
+                return StreamingResponse(
+                    traced_stream(audio_stream, "tts_stream"),
+                    media_type=AUDIO_FORMATS[audio_format]["media_type"],
+                    headers={"X-Response-Text": quote(reply), "X-Trace-Id": turn.trace_id},
+                )
+
+            with span("tts") as tts:
+                audio = await asyncio.to_thread(get_reply_audio, reply, voice_config, audio_format)
+                tts.set(bytes_out=len(audio or b""))
+            with span("store"):
+                stored = await asyncio.to_thread(store_voice_reply, profile_id, audio, audio_format)
+            return {
+                "response_text": reply,
+                "audio_url": stored["audio_url"],
+                "audio_expires_at": stored["expires_at"],
+                "audio_format": audio_format,
+                "trace_id": turn.trace_id,
+            }
 
-        if not voice_config:
-            raise HTTPException(status_code=400, detail="No voice model found.")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/prewarm-tts")
+async def prewarm_tts(
+    background_tasks: BackgroundTasks,
+    profile_id: str = Form(...),
+    phrases: str = Form(""),
+):
+    """Synthesizes common greetings/farewells and the persona's signature phrases into the TTS cache."""
+    voice_config = get_voice_model_config(profile_id, container_client)
+    if not voice_config:
+        raise HTTPException(status_code=400, detail="No voice model found.")
+
+    profile = get_profile_info(profile_id) or {}
+    signature_phrases = [p for p in profile.get("signature_phrases", "").split(",") if p.strip()]
+    custom_phrases = [p for p in phrases.splitlines() if p.strip()]
+    all_phrases = DEFAULT_PREWARM_PHRASES + signature_phrases + custom_phrases
+
+    background_tasks.add_task(
+        prewarm_phrases,
+        voice_config["voice_id"],
+        voice_config.get("language"),
+        lambda phrase: synthesize_audio_bytes(phrase, voice_config, DEFAULT_REPLY_FORMAT),
+        all_phrases,
+        DEFAULT_REPLY_FORMAT,
+    )
+    return {"message": "TTS pre-warm scheduled.", "phrases": len(all_phrases)}
 
-        prompt = (
-            f"You are a voice clone of a loved one, helping reflect on memories.\n"
-            f"Memories:\n{memory_summary}\n\n"
-            f"Speak with warmth and kindness as the person."
-        )
 
-        response = openai.chat.completions.create(
-            model=deployment_name,
-            messages=[
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": question}
-            ]
+def _synthesize_chunk(text: str, voice_config: dict, audio_format: Optional[str] = None) -> bytes:
+    sdk_format = AUDIO_FORMATS[audio_format]["sdk_format"] if audio_format else None
+    return speech_pool.synthesize_to_bytes(
+        text, voice=voice_config["voice_id"], language=voice_config.get("language"), output_format=sdk_format
+    )
+
+
+def synthesize_audio_bytes(text: str, voice_config: dict, audio_format: Optional[str] = None) -> bytes:
+    if len(text) >= LONG_FORM_MIN_CHARS:
+        return synthesize_long_form(
+            text, lambda chunk: _synthesize_chunk(chunk, voice_config, audio_format), audio_format
         )
+    return _synthesize_chunk(text, voice_config, audio_format)
 
-        reply = response.choices[0].message.content
-        audio_path = f"/tmp/{uuid.uuid4().hex}.mp3"
-        generate_audio_from_text(reply, voice_config, audio_path)
 
-        return {"response_text": reply, "audio_path": audio_path}
+def stream_reply_audio(text: str, voice_config: dict, audio_format: str):
+    """Streams reply audio; long replies start playing while later sentences are still synthesizing."""
+    def synthesize():
+        if len(text) >= LONG_FORM_MIN_CHARS:
+            return iter_long_form(
+                text, lambda chunk: _synthesize_chunk(chunk, voice_config, audio_format), audio_format
+            )
+        return _synthesize_chunk(text, voice_config, audio_format)
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return stream_tts(
+        voice_config["voice_id"], voice_config.get("language"), text, synthesize, output_format=audio_format
+    )
 
 
-def generate_audio_from_text(text: str, voice_config: dict, output_path: str):
-    speech_config = speechsdk.SpeechConfig(
-        subscription=os.getenv("AZURE_SPEECH_KEY"),
-        region=os.getenv("AZURE_SPEECH_REGION")
+def get_reply_audio(text: str, voice_config: dict, audio_format: Optional[str] = None) -> bytes:
+    """Synthesized reply in the given format ("ogg", "mp3", "wav"), served from the TTS cache when possible."""
+    return get_or_synthesize(
+        voice_config["voice_id"],
+        voice_config.get("language"),
+        text,
+        lambda: synthesize_audio_bytes(text, voice_config, audio_format),
+        output_format=audio_format or DEFAULT_OUTPUT_FORMAT,
     )
-    speech_config.speech_synthesis_voice_name = voice_config["voice_id"]
 
-    audio_config = speechsdk.audio.AudioOutputConfig(filename=output_path)
-    synthesizer = speechsdk.SpeechSynthesizer(speech_config, audio_config)
-    synthesizer.speak_text_async(text).get()
+
+def generate_audio_from_text(text: str, voice_config: dict, output_path: str, audio_format: Optional[str] = None):
+    if audio_format is None:
+        ext = os.path.splitext(output_path)[1].lstrip(".").lower()
+        audio_format = ext if ext in AUDIO_FORMATS else None
+    audio = get_reply_audio(text, voice_config, audio_format)
+    with open(output_path, "wb") as f:
+        f.write(audio or b"")
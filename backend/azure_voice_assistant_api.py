@@ -1,14 +1,17 @@
 import os
-import time
+import asyncio
+import threading
+from typing import Callable, Optional
 from dotenv import load_dotenv
 from azure.storage.blob import BlobServiceClient
-from azure.cognitiveservices.speech import (
-    SpeechConfig, SpeechRecognizer, SpeechSynthesizer, AudioConfig, ResultReason
-)
+from azure.cognitiveservices.speech import ResultReason
 from openai import AzureOpenAI
-from utils.memory_reader import get_all_memory_metadata
-from utils.profile_utils import get_profile_info, get_user_facts
-from utils.conversation_utils import get_conversation_history, save_conversation_turn
+from utils.voice_context import get_voice_context, format_voice_context
+from utils.context_prefetch import ContextPrefetcher
+from utils.speech.engine_pool import speech_pool
+from utils.speech.continuous_session import ContinuousRecognitionSession
+from utils.speech.tts_cache import tts_cache, tts_cache_key, play_cached_audio, DEFAULT_OUTPUT_FORMAT
+from utils.tracing import trace, span, annotate
 
 # ----------------- Setup -----------------
 load_dotenv()
@@ -20,12 +23,8 @@ container_client = blob_service_client.get_container_client(
     os.getenv("AZURE_CONTAINER_NAME")
 )
 
-speech_config = SpeechConfig(
-    subscription=os.getenv("AZURE_SPEECH_KEY"),
-    region=os.getenv("AZURE_SPEECH_REGION"),
-)
-speech_config.speech_recognition_language = "en-US"
-speech_synthesizer = SpeechSynthesizer(speech_config=speech_config)
+# Speech engines come from the shared pool so the loop reuses warm connections
+SPEECH_LANGUAGE = "en-US"
 
 openai_client = AzureOpenAI(
     api_key=os.getenv("AZURE_OPENAI_KEY"),
@@ -37,8 +36,10 @@ deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT")
 EXIT_COMMANDS = {"bye", "goodbye", "exit", "quit", "stop", "cancel"}
 
 
-def build_system_prompt(profile_id: str, last_bot_question: str = "") -> str:
-    profile = get_profile_info(profile_id) or {}
+def build_system_prompt(profile_id: str, last_bot_question: str = "", context: Optional[dict] = None) -> str:
+    if context is None:
+        context = get_voice_context(profile_id)
+    profile = context.get("profile", {})
     name = profile.get("name", "Unknown Person")
     relation = profile.get("relation", "")
     personality = profile.get("personality", "Kind, caring, realistic")
@@ -48,12 +49,12 @@ def build_system_prompt(profile_id: str, last_bot_question: str = "") -> str:
     favorites = profile.get("favorites", "")
     opinions = profile.get("opinions", "")
 
-    persona_memories = get_all_memory_metadata(profile_id, container_client)
+    persona_memories = context.get("memories", [])
     memory_summary = "\n".join(
         [f"• {m['title']}: {m['description']}" for m in persona_memories]
     ) if persona_memories else "[no memories uploaded yet]"
 
-    user_facts = get_user_facts(profile_id)
+    user_facts = context.get("user_facts", {})
     user_facts_text = (
         "\n".join([f"{k}: {v}" for k, v in user_facts.items()]) if user_facts else "[no known facts yet]"
     )
@@ -89,24 +90,44 @@ Conversation flow will follow naturally, as if spoken.
 """.strip()
 
 
-def recognize_speech():
-    audio_config = AudioConfig(use_default_microphone=True)
-    recognizer = SpeechRecognizer(speech_config=speech_config, audio_config=audio_config)
-    print("Listening... Speak now.")
-    result = recognizer.recognize_once_async().get()
-    if result.reason == ResultReason.RecognizedSpeech:
-        return result.text.strip()
-    return None
-
-
-def speak_text(text):
+def speak_text(text, interrupt: Optional[threading.Event] = None):
+    """Speaks `text` on the local speaker; setting `interrupt` cuts playback short."""
     print(f"Assistant: {text}")
-    speech_synthesizer.speak_text_async(text).get()
-
-
-def get_response_from_openai(profile_id: str, user_input: str) -> str:
-    # Load full conversation history
-    history = get_conversation_history(profile_id, container_client)
+    key = tts_cache_key(None, SPEECH_LANGUAGE, text, DEFAULT_OUTPUT_FORMAT)
+    cached_path = tts_cache.get_path(key)
+    annotate(tts_cache="hit" if cached_path else "miss")
+    if cached_path and play_cached_audio(cached_path, interrupt=interrupt):
+        return
+
+    result = speech_pool.synthesize(text, language=SPEECH_LANGUAGE, speaker=True, interrupt=interrupt)
+    # An interrupted reply comes back canceled, so only complete audio gets cached
+    if result.reason == ResultReason.SynthesizingAudioCompleted and result.audio_data:
+        tts_cache.put(key, result.audio_data)
+
+
+async def speak_with_barge_in(session: ContinuousRecognitionSession, text: str):
+    """Plays a reply while the session keeps listening; user speech stops playback."""
+    interrupt = session.begin_playback(text)
+    try:
+        with span("tts", chars=len(text)) as tts:
+            await asyncio.to_thread(speak_text, text, interrupt)
+            tts.set(interrupted=interrupt.is_set())
+    finally:
+        session.end_playback()
+    if interrupt.is_set():
+        print("(interrupted)")
+
+
+def get_response_from_openai(profile_id: str, user_input: str, prefetcher: Optional[ContextPrefetcher] = None) -> str:
+    # Persona context and history are usually already loaded while the user was speaking;
+    # otherwise both are read in parallel here
+    if prefetcher is None:
+        prefetcher = ContextPrefetcher(profile_id, container_client)
+    with span("context") as ctx:
+        ctx.set(prefetched=prefetcher.is_ready())
+        prefetched = prefetcher.get()
+        ctx.set(history_messages=len(prefetched["history"]))
+    history = prefetched["history"]
     chat_history = history[-10:] if history else []  # last 10 turns for context
 
     last_bot_question = ""
@@ -115,7 +136,7 @@ def get_response_from_openai(profile_id: str, user_input: str) -> str:
             last_bot_question = msg.get("content", "")
             break
 
-    system_prompt = build_system_prompt(profile_id, last_bot_question)
+    system_prompt = build_system_prompt(profile_id, last_bot_question, context=prefetched["voice_context"])
 
     # Strip out any non-required keys like "source" from past messages
     clean_history = []
@@ -130,58 +151,64 @@ def get_response_from_openai(profile_id: str, user_input: str) -> str:
     messages.extend(clean_history)
     messages.append({"role": "user", "content": user_input})
 
-    response = openai_client.chat.completions.create(
-        model=deployment_name,
-        messages=messages,
-        temperature=0.7,
-    )
-
-    reply = response.choices[0].message.content.strip()
-
-    # Save conversation turn with source tagging
-    save_conversation_turn(
-        profile_id,
+    with span("llm", prompt_chars=sum(len(m["content"] or "") for m in messages)) as llm:
+        response = openai_client.chat.completions.create(
+            model=deployment_name,
+            messages=messages,
+            temperature=0.7,
+        )
+        reply = response.choices[0].message.content.strip()
+        llm.set(reply_chars=len(reply))
+
+    # Save conversation turn with source tagging; the write happens in the background
+    prefetcher.record_turn(
         {"role": "user", "content": user_input},
         {"role": "assistant", "content": reply},
-        container_client,
         source="voice_assistant"  # specify source to keep chat and voice history separated
     )
 
     return reply
 
 
+async def run_assistant(profile_id: str, on_turn: Optional[Callable[[str], None]] = None):
+    """
+    Voice loop for one profile. Blocking Speech SDK and OpenAI calls run in worker
+    threads, so many loops can share one event loop; cancel the task to stop it.
+    """
+    print(f"MemoryForFuture Voice Assistant Started for profile: {profile_id}")
+    # The first partial result of each utterance kicks off loading the persona context
+    prefetcher = ContextPrefetcher(profile_id, container_client)
+    prefetcher.trigger()
+    session = ContinuousRecognitionSession(SPEECH_LANGUAGE, on_partial=prefetcher.trigger)
+    await session.start()
+    try:
+        await speak_with_barge_in(session, "Hello, how are you feeling today?")
+        while True:
+            print("Listening... Speak now.")
+            user_input = await session.next_utterance()
+            if on_turn:
+                on_turn(user_input)
+
+            normalized_input = user_input.lower().strip()
+            if any(cmd in normalized_input for cmd in EXIT_COMMANDS):
+                await speak_with_barge_in(session, "Goodbye for now.")
+                return
+
+            print(f"You: {user_input}")
+            with trace("assistant_turn", profile_id=profile_id, utterance_chars=len(user_input)):
+                response = await asyncio.to_thread(get_response_from_openai, profile_id, user_input, prefetcher)
+                await speak_with_barge_in(session, response)
+    finally:
+        await session.stop()
+
+
 def main(profile_id=None):
     if profile_id is None:
         profile_id = input("Enter profile ID: ").strip()
+    asyncio.run(run_assistant(profile_id))
 
-    print(f"MemoryForFuture Voice Assistant Started for profile: {profile_id}")
-    speak_text("Hello, how are you feeling today?")
-
-    last_user_input = None
-    while True:
-        user_input = recognize_speech()
-        if not user_input or user_input == last_user_input:
-            continue
-        last_user_input = user_input
-
-        normalized_input = user_input.lower().strip()
-        if any(cmd in normalized_input for cmd in EXIT_COMMANDS):
-            speak_text("Goodbye for now.")
-            return
-
-        print(f"You: {user_input}")
-        response = get_response_from_openai(profile_id, user_input)
-        speak_text(response)
-        time.sleep(1.5)
-
-def fetch_memories():
-    print("Loading memories from Azure Blob...")
-    memory_context = ""
-    for blob in container_client.list_blobs():
-        if blob.name.endswith(('.txt', '.json')):
-            stream = container_client.download_blob(blob.name).readall().decode('utf-8')
-            memory_context += f"\n\n---\n{blob.name}:\n{stream}"
-    return memory_context
+def fetch_memories(profile_id: str) -> str:
+    return format_voice_context(get_voice_context(profile_id))
 
 
 if __name__ == "__main__":
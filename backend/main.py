@@ -6,22 +6,22 @@ import io
 import uuid
 import datetime
 import threading
+import asyncio
 from pydantic import BaseModel
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from typing import Optional
 from dotenv import load_dotenv
 from azure_voice_assistant_api import fetch_memories, get_response_from_openai,speak_text
 from azure_voice_assistant_api import main as voice_assistant_main
 from typing import List
 from azure.storage.blob import BlobServiceClient
-from azure.storage.blob import generate_blob_sas, BlobSasPermissions, ContentSettings
 import datetime
 
 
 
 
-import requests
 import uvicorn
 
 # Add project root and backend to Python path for imports
@@ -30,8 +30,8 @@ sys.path.append(project_root)  # backend folder
 sys.path.append(os.path.abspath(os.path.join(project_root, "..")))  # MemoryForFuture root
 
 from assistant_loop import start_voice_loop
-# Import process manager for assistant start/stop
-from assistant_manager import start_assistant, stop_assistant
+# In-process assistant session manager
+from assistant_manager import start_assistant, stop_assistant, assistant_status, stop_all_assistants
 from routes import vr
 
 
@@ -47,10 +47,6 @@ blob_service_client = BlobServiceClient.from_connection_string(AZURE_CONNECTION_
 container_client = blob_service_client.get_container_client(BLOB_CONTAINER)
 
 
-# API Keys and URLs
-API_KEY = os.getenv("FISH_AUDIO_API_KEY")
-BASE_URL = "https://api.fish.audio/v1"
-
 # Initialize FastAPI instance
 app = FastAPI(title="MemoryForFuture API")
 
@@ -66,16 +62,29 @@ app.add_middleware(
 # Import your routers
 from routes.chat_with_ai import router as chat_ai_router
 from azure_voice import router as voice_router
-from routes.meshy import router as meshy_router
-from routes.flux_aging import router as flux_router
+from routes.meshy import router as meshy_router, resume_tracking as resume_meshy_tracking, shutdown as shutdown_meshy
+from routes.flux_aging import router as flux_router, shutdown as shutdown_flux_aging
 from voice_assistant_api import router as voice_assistant_router
 from routes.age_transform import router as age_transform_router
+from routes.traces import router as traces_router
+from routes.artifacts import router as artifacts_router
 
 # Import utilities
 from azure_utils import upload_file_to_blob
 from utils.file_type import detect_file_type
 from config.blob_config import blob_service_client, container_name
 from utils.memory_reader import get_all_memory_metadata
+from utils.memory_manifest import add_to_memory_manifest
+from utils.renditions import generate_renditions, pick_rendition
+from utils.voice_context import invalidate_voice_context
+from utils.speech.tts_cache import tts_cache, tts_cache_key, atee_to_cache
+from utils import fish_audio
+from utils.speech.engine_pool import speech_pool
+from utils.voice_reply_store import run_voice_reply_janitor
+from utils.disk_cache import run_cache_sweeper
+from utils.blob_sas import run_delegation_key_refresher, sign_read_urls
+from utils.image_preprocess import shutdown_image_workers
+from utils.model_lod import shutdown_model_workers
 from utils.profile_utils import (
     create_profile_in_storage,
     profile_exists,
@@ -107,6 +116,39 @@ app.include_router(flux_router, prefix="/flux", tags=["Flux AI Aging"])
 app.include_router(voice_assistant_router, prefix="/voice", tags=["Voice to Voice Chat"])
 app.include_router(age_transform_router, tags=["GPT Image Aging"])
 app.include_router(vr.router, prefix="/vr", tags=["VR"])  # Add this line
+app.include_router(traces_router, prefix="/debug", tags=["Tracing"])
+app.include_router(artifacts_router, prefix="/debug", tags=["Artifacts"])
+
+@app.on_event("startup")
+async def warm_speech_pool():
+    # Open the first synthesizer connection off the request path
+    threading.Thread(target=speech_pool.warm, kwargs={"language": "en-US"}, daemon=True).start()
+
+@app.on_event("startup")
+async def start_voice_reply_janitor():
+    asyncio.get_running_loop().create_task(run_voice_reply_janitor())
+
+@app.on_event("startup")
+async def start_cache_sweeper():
+    asyncio.get_running_loop().create_task(run_cache_sweeper())
+
+@app.on_event("startup")
+async def start_sas_key_refresher():
+    asyncio.get_running_loop().create_task(run_delegation_key_refresher())
+
+@app.on_event("startup")
+async def start_meshy_tracker():
+    asyncio.get_running_loop().create_task(resume_meshy_tracking())
+
+@app.on_event("shutdown")
+async def close_shared_clients():
+    await stop_all_assistants()
+    await fish_audio.close_client()
+    speech_pool.close_all()
+    await shutdown_flux_aging()
+    await shutdown_meshy()
+    shutdown_image_workers()
+    shutdown_model_workers()
 
 # Root endpoint
 @app.get("/")
@@ -129,6 +171,7 @@ async def test_storage_access():
 # Upload memory endpoint
 @app.post("/upload-memory/")
 async def upload_memory(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     title: str = Form(...),
     profile_id: str = Form(...),
@@ -163,6 +206,10 @@ async def upload_memory(
 
         metadata_bytes = io.BytesIO(json.dumps(metadata, indent=2).encode("utf-8"))
         upload_file_to_blob(profile_id, "metadata", metadata_bytes, f"{memory_id}.json")
+        add_to_memory_manifest(profile_id, metadata, container_client)
+        invalidate_voice_context(profile_id)
+        # Thumbnails/posters are built after the response; metadata lists them once ready
+        background_tasks.add_task(generate_renditions, profile_id, metadata, file_content, container_client)
 
         return {
             "message": "Memory uploaded successfully ✅",
@@ -173,9 +220,19 @@ async def upload_memory(
         logger.error(f"Memory upload failed: {str(e)}")
         return {"message": "Memory upload failed ❌", "error": str(e)}
 
+def _public_blob_url(blob_path: str) -> str:
+    return f"https://{blob_service_client.account_name}.blob.core.windows.net/{container_name}/{blob_path}"
+
 # Get memories endpoint
 @app.get("/get-memories/{profile_id}")
-async def get_memories(profile_id: str):
+async def get_memories(profile_id: str, thumb_size: int = 320, display_size: int = 1280, signed: bool = False):
+    """
+    Lists a profile's memories. Besides `content_url` (the original), each memory gets
+    `thumbnail_url` and `display_url`: the smallest rendition covering thumb_size /
+    display_size pixels, falling back to the original while renditions are pending.
+    With `signed=true` the URLs carry read SAS tokens (minted in one batch), for
+    containers without public access.
+    """
     try:
         container_client = blob_service_client.get_container_client(container_name)
         prefix = f"profiles/{profile_id}/metadata/"
@@ -189,11 +246,21 @@ async def get_memories(profile_id: str):
                 try:
                     memory = json.loads(content)
                     if "file_path" in memory:
-                        memory["content_url"] = f"https://{blob_service_client.account_name}.blob.core.windows.net/{container_name}/{memory['file_path']}"
+                        memory["content_url"] = memory["file_path"]
+                        memory["thumbnail_url"] = pick_rendition(memory, thumb_size) or memory["file_path"]
+                        memory["display_url"] = pick_rendition(memory, display_size) or memory["file_path"]
                     memories.append(memory)
                 except json.JSONDecodeError as err:
                     logger.warning(f"Skipping malformed JSON: {blob.name} ❌ Error: {err}")
 
+        url_fields = ("content_url", "thumbnail_url", "display_url")
+        paths = [m[field] for m in memories for field in url_fields if field in m]
+        urls = sign_read_urls(paths) if signed else {path: _public_blob_url(path) for path in paths}
+        for memory in memories:
+            for field in url_fields:
+                if field in memory:
+                    memory[field] = urls[memory[field]]
+
         return memories
     except Exception as e:
         logger.error(f"Failed to fetch memories for profile {profile_id}: {str(e)}")
@@ -245,13 +312,7 @@ async def clone_voice(
     language: str = Form("en"),
 ):
     try:
-        url = f"{BASE_URL}/voice/clone"
-        files = {"audio": (audio.filename, await audio.read())}
-        headers = {"Authorization": f"Bearer {API_KEY}"}
-        data = {"language": language}
-        response = requests.post(url, headers=headers, files=files, data=data)
-        response.raise_for_status()
-        return response.json()
+        return await fish_audio.clone_voice(audio, language)
     except Exception as e:
         logger.error(f"Voice clone failed: {str(e)}")
         return {"error": str(e)}
@@ -263,16 +324,18 @@ async def tts_with_clone(
     text: str = Form(...),
     language: str = Form("en"),
 ):
+    key = tts_cache_key(voice_id, language, text, fish_audio.FISH_OUTPUT_FORMAT)
+    cached = tts_cache.iter_chunks(key)
+    if cached is not None:
+        return StreamingResponse(cached, media_type="audio/mpeg")
+
     try:
-        url = f"{BASE_URL}/tts"
-        headers = {"Authorization": f"Bearer {API_KEY}"}
-        data = {"voice_id": voice_id, "text": text, "language": language}
-        response = requests.post(url, headers=headers, json=data)
-        response.raise_for_status()
-        return response.content
+        audio_stream = await fish_audio.open_tts_stream(voice_id, text, language)
     except Exception as e:
         logger.error(f"TTS with clone failed: {str(e)}")
         return {"error": str(e)}
+    # Bytes go to the client as Fish Audio sends them; the full reply is cached at the end
+    return StreamingResponse(atee_to_cache(key, audio_stream), media_type="audio/mpeg")
 
 # Voice assistant loop starter
 def run_voice_assistant(user_id: str):
@@ -286,105 +349,48 @@ async def talk_to_ai(user_id: str = Form(...)):
 # *** Start/Stop assistant endpoints updated below ***
 
 @app.post("/start-assistant")
-async def start_assistant_endpoint():
-    """Start azure_voice_assistant_api.py as subprocess."""
-    result = start_assistant()
+async def start_assistant_endpoint(
+    profile_id: Optional[str] = Form(None),
+    session_id: Optional[str] = Form(None),
+):
+    """Start an in-process assistant session for a profile."""
+    result = await start_assistant(profile_id, session_id)
+    if result["status"] == "limit_reached":
+        raise HTTPException(status_code=429, detail=f"Assistant session limit reached ({result['max_sessions']})")
     return result
 
 @app.post("/stop-assistant")
-async def stop_assistant_endpoint():
-    """Stop running assistant subprocess."""
-    result = stop_assistant()
+async def stop_assistant_endpoint(
+    session_id: Optional[str] = Form(None),
+    profile_id: Optional[str] = Form(None),
+):
+    """Stop one session, a profile's sessions, or all running sessions."""
+    result = await stop_assistant(session_id, profile_id)
     return result
 
-def get_account_key():
-    for part in AZURE_CONNECTION_STRING.split(";"):
-        if part.lower().startswith("accountkey="):
-            return part.split("=", 1)[1]
-    raise RuntimeError("Could not find account key in connection string")
-
-account_name = blob_service_client.account_name
-account_key = get_account_key()
-
-def generate_sas_url(blob_name: str, expiry_hours: int = 105) -> str:
-    sas_token = generate_blob_sas(
-        account_name=account_name,
-        container_name=CONTAINER_NAME,
-        blob_name=blob_name,
-        account_key=account_key,
-        permission=BlobSasPermissions(read=True),
-        expiry=datetime.datetime.utcnow() + datetime.timedelta(hours=expiry_hours),
-    )
-    return f"https://{account_name}.blob.core.windows.net/{CONTAINER_NAME}/{blob_name}?{sas_token}"
+@app.get("/assistant-status")
+async def assistant_status_endpoint(session_id: Optional[str] = None, profile_id: Optional[str] = None):
+    return assistant_status(session_id, profile_id)
 
 @app.post("/create-vr-room/")
 async def create_vr_room(selection: MemorySelection):
     if not selection.profile_id or not selection.selected_memory_ids:
         raise HTTPException(status_code=400, detail="profile_id and selected_memory_ids are required")
 
-    # Define possible memory types and folders/extensions as per your storage layout
-    possible_locations = {
-        "image": ("images", [".jpg", ".jpeg", ".png", ".webp"]),
-        "video": ("videos", [".mp4", ".mov", ".webm"]),
-        "audio": ("voice_samples", [".mp3", ".wav", ".m4a"]),
-        "text":  ("documents", [".txt", ".json", ".pdf"]),
-    }
-
-    memories = []
-
-    for mem_id in selection.selected_memory_ids:
-        found = False
-        for mem_type, (folder, exts) in possible_locations.items():
-            for ext in exts:
-                blob_name = f"profiles/{selection.profile_id}/{folder}/{mem_id}{ext}"
-                blob_client = container_client.get_blob_client(blob_name)
-                try:
-                    if blob_client.exists():
-                        url = generate_sas_url(blob_name)
-                        memories.append({
-                            "id": mem_id,
-                            "type": mem_type,
-                            "url": url,
-                            "title": f"{mem_id}{ext}",
-                            # You can add 3D transform defaults or leave None
-                            "position": None,
-                            "rotation": None,
-                            "scale": None,
-                        })
-                        found = True
-                        break
-                except Exception:
-                    continue
-            if found:
-                break
-
-    if not memories:
-        raise HTTPException(status_code=404, detail="No matching memories found")
-
-    active_room = {
-        "room_id": "testroom1",
-        "profile_id": selection.profile_id,
-        "memories": memories,
-    }
-
-    active_room_json = json.dumps(active_room, indent=2)
-
-    blob_path = f"profiles/{selection.profile_id}/active_room.json"
-    blob_client = container_client.get_blob_client(blob_path)
+    # Each build is stored as a new versioned room under the profile
+    room, _ = await vr.create_room(selection.profile_id, selection.selected_memory_ids)
 
     try:
-        blob_client.upload_blob(
-            active_room_json,
-            overwrite=True,
-            content_settings=ContentSettings(content_type="application/json"),
-        )
+        await asyncio.to_thread(vr.write_active_room, room)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to upload active_room.json: {str(e)}")
 
     return {
         "ok": True,
         "profile_id": selection.profile_id,
-        "memories_count": len(memories),
+        "room_id": room["room_id"],
+        "version": room["version"],
+        "memories_count": len(room["items"]),
     }
 
 
@@ -1,25 +1,22 @@
-import os
-import io
 import base64
-import uuid
-from datetime import datetime
+import asyncio
 from typing import Optional
 
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse
 
 # Comment out OpenAI and dotenv imports for local/mock/dev run
 # from openai import OpenAI
 # from dotenv import load_dotenv
-from PIL import Image
+
+from utils.image_preprocess import content_hash, preprocess_image
+from utils.aging_cache import aging_cache_key, get_cached_result, media_type_for, result_url, store_result
 
 # Optionally: load_dotenv()  # Only needed if using dotenv
 
 router = APIRouter(prefix="/age-transform", tags=["image"])
 
-# For local file saves
-SAVE_DIR = os.path.join("static", "aging_results")
-os.makedirs(SAVE_DIR, exist_ok=True)
+MODEL_NAME = "mock-gpt-image"
 
 
 def _build_prompt(direction: str, years: Optional[int], strength: float) -> str:
@@ -73,22 +70,26 @@ async def age_transform(
         prompt = _build_prompt(direction.strip().lower(), years, strength)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
-    # Read and validate image (test if PIL can open it)
     input_bytes = await file.read()
-    try:
-        img = Image.open(io.BytesIO(input_bytes))
-        img.verify()
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid image file.")
-
-    # Instead of OpenAI, just "save" the original image and return dummy info
-    uid = uuid.uuid4().hex[:12]
-    ts = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
-    filename = f"{direction}-{years or 'auto'}y-{uid}-{ts}.png"
-    saved_path = os.path.join(SAVE_DIR, filename)
-    with open(saved_path, "wb") as f:
-        f.write(input_bytes)
-    public_url = f"/static/aging_results/{filename}"
+    direction = direction.strip().lower()
+    key = aging_cache_key(
+        content_hash(input_bytes),
+        direction=direction,
+        years=years,
+        strength=strength,
+        prompt=prompt,
+        model=MODEL_NAME,
+    )
+    cache_hit = await asyncio.to_thread(get_cached_result, key) is not None
+    if not cache_hit:
+        # Decode, orient and downscale once in the worker pool; this also validates the image
+        try:
+            image = await preprocess_image(input_bytes, max_side=1024)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid image file.")
+        # Instead of OpenAI, just "save" the normalized image and return dummy info
+        await asyncio.to_thread(store_result, key, image["data"])
+    public_url = result_url(key)
 
     # Return mock success for the UI/frontend
     return JSONResponse(
@@ -97,12 +98,29 @@ async def age_transform(
             "direction": direction,
             "years": years,
             "strength": strength,
-            "model": "mock-gpt-image",
+            "model": MODEL_NAME,
             "prompt_used": prompt,
             "url": public_url,
             "profile_id": profile_id,
             "collection": collection,
+            "cache_hit": cache_hit,
             "note": "This is a mock/dummy response; no actual age transformation performed.",
         },
         status_code=200,
     )
+
+
+@router.get("/results/{key}")
+async def get_aging_result(key: str):
+    """Serves a cached aging result (from this worker's disk, or pulled from the blob mirror)."""
+    try:
+        path = await asyncio.to_thread(get_cached_result, key)
+    except ValueError:
+        path = None
+    if not path:
+        raise HTTPException(status_code=404, detail="Result not found or expired.")
+    return FileResponse(
+        path,
+        media_type=media_type_for(path),
+        headers={"Cache-Control": "public, max-age=86400, immutable"},
+    )
@@ -0,0 +1,22 @@
+# backend/routes/artifacts.py
+
+from fastapi import APIRouter, HTTPException, Query
+
+from utils.disk_cache import registered_caches
+
+router = APIRouter()
+
+
+@router.get("/artifacts")
+async def list_artifact_stores():
+    """Size, quota and entry count of every managed local cache (TTS audio, images, aging results)."""
+    return {name: cache.stats() for name, cache in registered_caches().items()}
+
+
+@router.get("/artifacts/{store}")
+async def list_artifacts(store: str, limit: int = Query(100, ge=1, le=1000)):
+    """Index of one store's entries, most recently used first."""
+    cache = registered_caches().get(store)
+    if cache is None:
+        raise HTTPException(status_code=404, detail="Unknown artifact store")
+    return {**cache.stats(), "entries": cache.entries(limit=limit)}
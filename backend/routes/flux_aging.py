@@ -1,107 +1,304 @@
 # routes/flux_aging.py
 
-from fastapi import APIRouter, File, UploadFile, Form
-import requests
+from fastapi import APIRouter, File, UploadFile, Form, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import List, Optional
+from datetime import datetime
+import httpx
 import os
+import json
+import uuid
+import asyncio
 from dotenv import load_dotenv
 import base64
-from PIL import Image
-import io
-from datetime import datetime
+import logging
+from azure.core.exceptions import ResourceNotFoundError
+from azure.storage.blob import ContentSettings
+
+from config.blob_config import container_client
+from utils.image_preprocess import content_hash, preprocess_image
+from utils.aging_cache import aging_cache_key, get_cached_result, result_url, store_result
+from utils.job_queue import JobError, JobQueue, QueueFullError
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 TOGETHER_API_KEY = os.getenv("TOGETHER_API_KEY")
 TOGETHER_API_URL = "https://api.together.xyz/v1/images/generations"
-SAVE_DIR = os.path.join("static", "flux_results")
+FLUX_MODEL = "black-forest-labs/FLUX.1-schnell-Free"
+FLUX_TIMEOUT_SECONDS = float(os.getenv("FLUX_TIMEOUT_SECONDS", "120"))
+FLUX_WORKERS = int(os.getenv("FLUX_WORKERS", "4"))
+FLUX_PER_TENANT_LIMIT = int(os.getenv("FLUX_PER_TENANT_LIMIT", "2"))
+# Concurrent Together calls across jobs and timelines, and per timeline request
+FLUX_MAX_UPSTREAM = int(os.getenv("FLUX_MAX_UPSTREAM", str(FLUX_WORKERS)))
+TIMELINE_MAX_PARALLEL = int(os.getenv("FLUX_TIMELINE_MAX_PARALLEL", "3"))
+TIMELINE_MAX_AGES = 12
+COLLECTION_PREFIX = "aging_collections/"
 
-os.makedirs(SAVE_DIR, exist_ok=True)  # Ensure save folder exists
+_client: Optional[httpx.AsyncClient] = None
+_upstream_slots = asyncio.Semaphore(FLUX_MAX_UPSTREAM)
 
 
-def resize_image(file_bytes, max_size=(512, 512)):
-    """Resize the image to avoid 'Request Entity Too Large' errors."""
-    image = Image.open(io.BytesIO(file_bytes))
-    image.thumbnail(max_size)
-    output_buffer = io.BytesIO()
-    image.save(output_buffer, format=image.format or "PNG")
-    return output_buffer.getvalue()
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(timeout=httpx.Timeout(FLUX_TIMEOUT_SECONDS, connect=10.0))
+    return _client
 
 
-def save_image_to_static(image_bytes, prefix="flux_result"):
-    """Save image bytes to static/flux_results and return file path."""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"{prefix}_{timestamp}.png"
-    filepath = os.path.join(SAVE_DIR, filename)
-    with open(filepath, "wb") as f:
-        f.write(image_bytes)
-    return filepath
+async def _fetch_image(url: str) -> bytes:
+    """Downloads a generated image from its (pre-signed) upstream URL."""
+    response = await get_client().get(url)
+    response.raise_for_status()
+    return response.content
 
 
-@router.post("/age-transform/")
-async def age_transform(
-    file: UploadFile = File(...),
-    prompt: str = Form(...),
-    age: int = Form(...)
-):
-    """
-    Transform a face to a different age using Flux AI and return direct URL.
-    """
-    headers = {
-        "Authorization": f"Bearer {TOGETHER_API_KEY}",
-        "Content-Type": "application/json"
+def _completed(cache_key: str, base_url: str, cache_hit: bool) -> dict:
+    return {
+        "status": "completed",
+        "image_url": result_url(cache_key, base_url),
+        "cache_hit": cache_hit,
     }
 
-    img_bytes = await file.read()
-    resized_bytes = resize_image(img_bytes)
-    img_b64 = base64.b64encode(resized_bytes).decode("utf-8")
 
-    payload = {
-        "model": "black-forest-labs/FLUX.1-schnell-Free",
+async def _generate(img_b64: str, prompt: str, age: int, cache_key: str, base_url: str) -> dict:
+    """One Flux call for a preprocessed portrait; the image is stored in the aging result cache."""
+    request_body = {
+        "model": FLUX_MODEL,
         "prompt": f"{prompt}, make the person look {age} years old",
         "image": img_b64,
         "width": 512,
         "height": 512
     }
 
-    response = requests.post(TOGETHER_API_URL, headers=headers, json=payload)
+    async with _upstream_slots:
+        try:
+            response = await get_client().post(
+                TOGETHER_API_URL,
+                headers={"Authorization": f"Bearer {TOGETHER_API_KEY}"},
+                json=request_body,
+            )
+        except httpx.TimeoutException:
+            raise JobError("Transformation failed (timeout)", f"No response within {FLUX_TIMEOUT_SECONDS:.0f}s")
 
     if response.status_code != 200:
-        return {
-            "error": "Transformation failed (HTTP error)",
-            "details": response.json()
-        }
+        try:
+            details = response.json()
+        except ValueError:
+            details = response.text
+        raise JobError("Transformation failed (HTTP error)", details)
 
     data = response.json()
 
     if "error" in data:
-        return {
-            "error": "Transformation failed (API error)",
-            "details": data
-        }
+        raise JobError("Transformation failed (API error)", data)
 
-    # ✅ Always return direct URL if available
+    # Keep the image itself: upstream URLs expire, and the cache serves repeats instantly
     if "data" in data and data["data"]:
         result = data["data"][0]
+        image_bytes = None
+        if result.get("url"):
+            image_bytes = await _fetch_image(result["url"])
+        elif result.get("b64_json"):
+            image_bytes = base64.b64decode(result["b64_json"])
 
-        if "url" in result and result["url"]:
-            return {
-                "status": "completed",
-                "image_url": result["url"]
-            }
+        if image_bytes:
+            await asyncio.to_thread(store_result, cache_key, image_bytes)
+            return _completed(cache_key, base_url, cache_hit=False)
 
-        elif "b64_json" in result and result["b64_json"]:
-            # Save locally too
-            image_bytes = base64.b64decode(result["b64_json"])
-            saved_path = save_image_to_static(image_bytes)
-            return {
-                "status": "completed",
-                "saved_path": saved_path,
-                "image_base64": result["b64_json"]
-            }
+    raise JobError("No image returned from Flux AI", data)
 
-    return {
-        "error": "No image returned from Flux AI",
-        "details": data
-    }
+
+async def _preprocessed_b64(image: bytes) -> str:
+    try:
+        resized = await preprocess_image(image, max_side=512)
+    except ValueError as e:
+        raise JobError("Invalid image file", str(e))
+    return base64.b64encode(resized["data"]).decode("utf-8")
+
+
+async def run_age_transform(payload: dict) -> dict:
+    """Job handler: preprocess the portrait, call Flux and return the cached result's URL."""
+    img_b64 = await _preprocessed_b64(payload["image"])
+    return await _generate(img_b64, payload["prompt"], payload["age"], payload["cache_key"], payload["base_url"])
+
+
+aging_jobs = JobQueue(
+    "flux-aging",
+    run_age_transform,
+    workers=FLUX_WORKERS,
+    per_tenant_limit=FLUX_PER_TENANT_LIMIT,
+)
+
+
+async def shutdown():
+    await aging_jobs.stop()
+    if _client is not None:
+        await _client.aclose()
+
+
+@router.post("/age-transform/")
+async def age_transform(
+    request: Request,
+    file: UploadFile = File(...),
+    prompt: str = Form(...),
+    age: int = Form(...),
+    profile_id: Optional[str] = Form(None),
+):
+    """
+    Queue a Flux AI age transformation and return its job id immediately.
+    Poll /flux/age-transform/status/{job_id} or subscribe to /flux/age-transform/events/{job_id}.
+    """
+    image = await file.read()
+    cache_key = aging_cache_key(content_hash(image), age=age, prompt=prompt, model=FLUX_MODEL)
+    base_url = str(request.base_url)
+    if await asyncio.to_thread(get_cached_result, cache_key):
+        # Same portrait and parameters as an earlier run: no job needed
+        return {"job_id": None, "status": "completed", "result": _completed(cache_key, base_url, cache_hit=True)}
+
+    tenant = profile_id or (request.client.host if request.client else "anonymous")
+    payload = {"image": image, "prompt": prompt, "age": age, "cache_key": cache_key, "base_url": base_url}
+    try:
+        job = await aging_jobs.submit(tenant, payload)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+    return JSONResponse(
+        {
+            "job_id": job.job_id,
+            "status": job.status,
+            "status_url": f"/flux/age-transform/status/{job.job_id}",
+            "events_url": f"/flux/age-transform/events/{job.job_id}",
+        },
+        status_code=202,
+    )
+
+
+@router.get("/age-transform/status/{job_id}")
+async def age_transform_status(job_id: str):
+    """Check an age transformation job; `result` holds the image once completed."""
+    job = aging_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {**job.to_dict(), "queue_position": aging_jobs.queue_position(job)}
+
+
+@router.get("/age-transform/events/{job_id}")
+async def age_transform_events(job_id: str):
+    """Server-sent events with the job state on every change; the stream ends when the job finishes."""
+    if aging_jobs.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        async for state in aging_jobs.subscribe(job_id):
+            yield f"event: {state['status']}\ndata: {json.dumps(state)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+def _parse_ages(ages: str) -> List[int]:
+    """Accepts "20,40,60" or a JSON list; keeps order and drops duplicates."""
+    try:
+        values = json.loads(ages) if ages.strip().startswith("[") else ages.split(",")
+        parsed = [int(str(v).strip()) for v in values if str(v).strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ages must be a comma-separated list of numbers")
+    parsed = list(dict.fromkeys(parsed))
+    if not parsed or len(parsed) > TIMELINE_MAX_AGES:
+        raise HTTPException(status_code=400, detail=f"Provide between 1 and {TIMELINE_MAX_AGES} ages")
+    if any(age < 1 or age > 120 for age in parsed):
+        raise HTTPException(status_code=400, detail="ages must be between 1 and 120")
+    return parsed
+
+
+def _store_collection(collection: dict):
+    container_client.get_blob_client(f"{COLLECTION_PREFIX}{collection['collection_id']}.json").upload_blob(
+        json.dumps(collection, ensure_ascii=False),
+        overwrite=True,
+        content_settings=ContentSettings(content_type="application/json"),
+    )
+
+
+@router.post("/age-timeline/")
+async def age_timeline(
+    request: Request,
+    file: UploadFile = File(...),
+    prompt: str = Form(...),
+    ages: str = Form(..., description="Target ages, e.g. 20,40,60,80"),
+    profile_id: Optional[str] = Form(None),
+):
+    """
+    Generates one portrait at several ages. The image is preprocessed once, the ages
+    are generated concurrently (cached ones are returned at once), and each result is
+    streamed as a server-sent event as soon as it is ready. The final `collection`
+    event carries the id of the stored set.
+    """
+    target_ages = _parse_ages(ages)
+    image = await file.read()
+    image_hash = content_hash(image)
+    base_url = str(request.base_url)
+    try:
+        img_b64 = await _preprocessed_b64(image)
+    except JobError as e:
+        raise HTTPException(status_code=400, detail=f"{e}: {e.details}")
+
+    slots = asyncio.Semaphore(TIMELINE_MAX_PARALLEL)
+
+    async def generate_age(age: int) -> dict:
+        cache_key = aging_cache_key(image_hash, age=age, prompt=prompt, model=FLUX_MODEL)
+        try:
+            if await asyncio.to_thread(get_cached_result, cache_key):
+                result = _completed(cache_key, base_url, cache_hit=True)
+            else:
+                async with slots:
+                    result = await _generate(img_b64, prompt, age, cache_key, base_url)
+        except JobError as e:
+            return {"age": age, "status": "failed", "error": str(e), "details": e.details}
+        except Exception as e:
+            return {"age": age, "status": "failed", "error": str(e)}
+        return {"age": age, "cache_key": cache_key, **result}
+
+    async def events():
+        tasks = [asyncio.create_task(generate_age(age)) for age in target_ages]
+        items = []
+        try:
+            for finished in asyncio.as_completed(tasks):
+                item = await finished
+                items.append(item)
+                yield f"event: result\ndata: {json.dumps(item)}\n\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        collection = {
+            "collection_id": uuid.uuid4().hex,
+            "profile_id": profile_id,
+            "source_hash": image_hash,
+            "prompt": prompt,
+            "model": FLUX_MODEL,
+            "created_at": datetime.utcnow().isoformat() + "Z",
+            "items": sorted(items, key=lambda i: target_ages.index(i["age"])),
+        }
+        try:
+            await asyncio.to_thread(_store_collection, collection)
+            collection["stored"] = True
+        except Exception as e:
+            logger.warning(f"[age-timeline] Storing collection failed: {e}")
+            collection["stored"] = False
+        yield f"event: collection\ndata: {json.dumps(collection)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@router.get("/age-timeline/{collection_id}")
+async def get_age_timeline(collection_id: str):
+    """Returns a stored age-timeline collection."""
+    blob_client = container_client.get_blob_client(f"{COLLECTION_PREFIX}{collection_id}.json")
+    try:
+        data = await asyncio.to_thread(lambda: blob_client.download_blob().readall())
+    except ResourceNotFoundError:
+        raise HTTPException(status_code=404, detail="Collection not found")
+    return json.loads(data)
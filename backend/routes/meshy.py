@@ -1,71 +1,316 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException
+from fastapi import APIRouter, File, Form, UploadFile, HTTPException
+from fastapi.responses import StreamingResponse
+from typing import Dict, Optional
 import httpx
 from dotenv import load_dotenv
 import os
+import json
+import uuid
+import asyncio
+import datetime
+import logging
+from azure.storage.blob import ContentSettings
+
+from config.blob_config import container_client
+from utils.blob_sas import generate_read_sas_url
+from utils.image_preprocess import content_hash, perceptual_hash
+from utils.memory_manifest import add_to_memory_manifest
+from utils.meshy_dedup import MeshyImageIndex
+from utils.meshy_tracker import MeshyTaskTracker, TaskNotFoundError, UpstreamRetry
+from utils.model_lod import generate_lods
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 MESHY_API_KEY = os.getenv("MESHY_API_KEY")
 MESHY_API_URL = "https://api.meshy.ai/v1/"
+MODEL_URL_EXPIRY = datetime.timedelta(hours=24)
 
 if not MESHY_API_KEY:
     raise RuntimeError("MESHY_API_KEY is not set in environment variables.")
 
-@router.post("/generate-3d/")
-async def generate_3d_model(file: UploadFile = File(...)):
-    """Start Meshy image-to-3D conversion and return the task ID immediately."""
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """One pooled client for submissions, the tracker's polls and model downloads."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(timeout=httpx.Timeout(60.0, connect=10.0))
+    return _client
+
+
+def _auth_headers() -> dict:
+    # Sent per API call only, never to the CDN the models are downloaded from
+    return {"Authorization": f"Bearer {MESHY_API_KEY}"}
+
+
+def _error_details(response: httpx.Response):
     try:
-        contents = await file.read()
-        files = {
-            "image_file": (file.filename, contents, file.content_type)
-        }
-        headers = {"Authorization": f"Bearer {MESHY_API_KEY}"}
+        return response.json()
+    except ValueError:
+        return response.text
+
+
+async def fetch_task(task_id: str) -> dict:
+    """Tracker fetch function: one status call to Meshy."""
+    try:
+        response = await get_client().get(MESHY_API_URL + f"tasks/{task_id}", headers=_auth_headers(), timeout=30)
+    except httpx.TransportError as e:
+        raise UpstreamRetry(f"Meshy unreachable ({type(e).__name__})")
+    if response.status_code == 404:
+        raise TaskNotFoundError(task_id)
+    if response.status_code == 429 or response.status_code >= 500:
+        retry_after = response.headers.get("Retry-After")
+        raise UpstreamRetry(
+            f"Meshy returned {response.status_code}",
+            float(retry_after) if retry_after and retry_after.isdigit() else None,
+        )
+    if response.status_code != 200:
+        raise RuntimeError(f"Meshy returned {response.status_code}: {_error_details(response)}")
+    return response.json()
+
+
+def _model_prefix(record: dict) -> str:
+    if record.get("profile_id"):
+        return f"profiles/{record['profile_id']}/models/{record['task_id']}/"
+    return f"meshy_models/{record['task_id']}/"
+
+
+def _upload(blob_name: str, data: bytes, content_type: str):
+    container_client.get_blob_client(blob_name).upload_blob(
+        data,
+        overwrite=True,
+        content_settings=ContentSettings(content_type=content_type, cache_control="public, max-age=31536000"),
+    )
+
+
+def _register_model_memory(record: dict, lods: list) -> str:
+    """Adds the model to the profile's memories so it can be placed in VR rooms."""
+    memory_id = f"mem_{uuid.uuid4().hex[:8]}"
+    metadata = {
+        "memory_id": memory_id,
+        "profile_id": record["profile_id"],
+        "title": record.get("title") or "3D model",
+        "description": "",
+        "file_type": "model",
+        "file_path": record["model_path"],
+        "upload_date": datetime.datetime.utcnow().isoformat(),
+        "tags": [],
+        "meshy_task_id": record["task_id"],
+        "preview_path": record.get("preview_path"),
+        "lods": lods,
+    }
+    container_client.get_blob_client(f"profiles/{record['profile_id']}/metadata/{memory_id}.json").upload_blob(
+        json.dumps(metadata, indent=2).encode("utf-8"),
+        overwrite=True,
+    )
+    add_to_memory_manifest(record["profile_id"], metadata, container_client)
+    return memory_id
+
+
+async def mirror_model(record: dict) -> dict:
+    """
+    Tracker completion hook: copies the GLB and preview off Meshy's (expiring) CDN
+    into storage and adds decimated LOD variants next to them. Returns the fields
+    merged into the task record.
+    """
+    if not record.get("model_url") or record.get("model_path"):
+        return {}
+    prefix = _model_prefix(record)
+    response = await get_client().get(record["model_url"])
+    response.raise_for_status()
+    glb = response.content
+
+    model_path = f"{prefix}lod0.glb"
+    await asyncio.to_thread(_upload, model_path, glb, "model/gltf-binary")
+    lods = [{"level": "lod0", "path": model_path, "bytes": len(glb)}]
+    fields = {"model_path": model_path}
+
+    if record.get("preview"):
+        try:
+            preview = await get_client().get(record["preview"])
+            preview.raise_for_status()
+            fields["preview_path"] = f"{prefix}preview.png"
+            await asyncio.to_thread(_upload, fields["preview_path"], preview.content, preview.headers.get("content-type", "image/png"))
+        except httpx.HTTPError as e:
+            logger.warning(f"[Meshy] Preview download for {record['task_id']} failed: {e}")
+
+    try:
+        variants = await generate_lods(glb)
+    except Exception as e:
+        logger.warning(f"[Meshy] LOD generation for {record['task_id']} failed: {e}")
+        variants = {}
+    for level, variant in variants.items():
+        path = f"{prefix}{level}.glb"
+        await asyncio.to_thread(_upload, path, variant["data"], "model/gltf-binary")
+        lods.append({"level": level, "path": path, "bytes": len(variant["data"]), "faces": variant["faces"]})
+    fields["lods"] = lods
+
+    if record.get("profile_id"):
+        fields["memory_id"] = await asyncio.to_thread(_register_model_memory, {**record, **fields}, lods)
+    logger.info(f"[Meshy] Mirrored {record['task_id']} to {prefix} ({', '.join(l['level'] for l in lods)})")
+    return fields
+
+
+tracker = MeshyTaskTracker(fetch_task, container_client, on_complete=mirror_model)
+image_index = MeshyImageIndex(container_client)
+_submissions: Dict[str, asyncio.Future] = {}
+
 
-        async with httpx.AsyncClient(timeout=60) as client:
-            response = await client.post(MESHY_API_URL + "image-to-3d", headers=headers, files=files)
+async def resume_tracking():
+    await tracker.resume()
 
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail=response.json())
 
-        data = response.json()
-        task_id = data.get("task_id")
-        if not task_id:
-            raise HTTPException(status_code=500, detail="No task_id returned by Meshy API")
+async def shutdown():
+    await tracker.stop()
+    if _client is not None:
+        await _client.aclose()
 
+
+def _status_response(record: dict) -> dict:
+    if record["status"] == "completed":
+        if record.get("model_path"):
+            # Serve the stored copy; Meshy's CDN links expire
+            response = {
+                "status": "completed",
+                "model_url": generate_read_sas_url(record["model_path"], MODEL_URL_EXPIRY),
+                "preview": generate_read_sas_url(record["preview_path"], MODEL_URL_EXPIRY) if record.get("preview_path") else record.get("preview"),
+                "lods": [
+                    {**lod, "url": generate_read_sas_url(lod["path"], MODEL_URL_EXPIRY)}
+                    for lod in sorted(record.get("lods") or [], key=lambda lod: lod["bytes"])
+                ],
+                "task_id": record["task_id"],
+            }
+            if record.get("memory_id"):
+                response["memory_id"] = record["memory_id"]
+            return response
         return {
-            "message": "3D model generation started",
-            "task_id": task_id
+            "status": "completed",
+            "model_url": record.get("model_url"),
+            "preview": record.get("preview"),
+            "task_id": record["task_id"],
         }
+    elif record["status"] == "failed":
+        return {"status": "failed", "error": record.get("error") or "Meshy generation failed", "task_id": record["task_id"]}
+    else:
+        return {"status": record["status"], "progress": record.get("progress"), "task_id": record["task_id"]}
+
+
+async def _submit(filename: str, contents: bytes, content_type: Optional[str]) -> str:
+    files = {
+        "image_file": (filename, contents, content_type)
+    }
+
+    response = await get_client().post(MESHY_API_URL + "image-to-3d", headers=_auth_headers(), files=files)
+
+    if response.status_code not in (200, 202):
+        raise HTTPException(status_code=response.status_code, detail=_error_details(response))
+
+    data = response.json()
+    task_id = data.get("task_id") or data.get("result")
+    if not task_id:
+        raise HTTPException(status_code=500, detail="No task_id returned by Meshy API")
+    return task_id
+
+
+def _started_response(task_id: str, record: Optional[dict] = None) -> dict:
+    response = {
+        "message": "Reusing existing 3D model generation" if record else "3D model generation started",
+        "task_id": task_id,
+        "status_url": f"/meshy/generate-3d/status/{task_id}",
+        "events_url": f"/meshy/generate-3d/events/{task_id}",
+        "deduplicated": record is not None,
+    }
+    if record is not None:
+        response.update(_status_response(record))
+    return response
+
+
+@router.post("/generate-3d/")
+async def generate_3d_model(
+    file: UploadFile = File(...),
+    profile_id: Optional[str] = Form(None),
+    title: Optional[str] = Form(None),
+):
+    """
+    Start Meshy image-to-3D conversion and return the task ID immediately.
+    The server tracks the task from then on; poll /meshy/generate-3d/status/{task_id}
+    or subscribe to /meshy/generate-3d/events/{task_id}. With a profile_id the
+    finished model (and its LODs) is stored under the profile as a "model" memory.
+
+    A photo this profile already submitted (same bytes, or a re-encode with a
+    near-identical perceptual hash) is not sent again: the response carries the
+    existing task, including the stored model if it has finished.
+    """
+    try:
+        contents = await file.read()
+        image_hash = content_hash(contents)
+        phash = await asyncio.to_thread(perceptual_hash, contents)
+
+        existing = await image_index.find(profile_id, image_hash, phash)
+        if existing:
+            record = await tracker.get(existing)
+            if record is not None and record["status"] != "failed":
+                return _started_response(existing, record)
+            await image_index.forget(profile_id, existing)
+
+        # Identical uploads arriving together share one submission
+        key = f"{profile_id or ''}:{image_hash}"
+        pending = _submissions.get(key)
+        if pending is not None:
+            task_id = await asyncio.shield(pending)
+            return _started_response(task_id, await tracker.get(task_id))
+
+        async def start() -> str:
+            task_id = await _submit(file.filename, contents, file.content_type)
+            tracker.track(task_id, profile_id=profile_id, title=title or file.filename)
+            await image_index.add(profile_id, image_hash, phash, task_id)
+            return task_id
+
+        _submissions[key] = asyncio.ensure_future(start())
+        try:
+            task_id = await asyncio.shield(_submissions[key])
+        finally:
+            _submissions.pop(key, None)
+        return _started_response(task_id)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _get_record(task_id: str) -> Dict:
+    """Tracker record for the task, or the HTTP error for an unknown id Meshy can't confirm."""
+    try:
+        record = await tracker.get(task_id)
+    except UpstreamRetry as e:
+        headers = {"Retry-After": str(int(e.retry_after))} if e.retry_after else None
+        raise HTTPException(status_code=503, detail=str(e), headers=headers)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    if record is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return record
+
+
 @router.get("/generate-3d/status/{task_id}")
 async def check_generation_status(task_id: str):
-    """Check Meshy 3D generation task status."""
-    try:
-        headers = {"Authorization": f"Bearer {MESHY_API_KEY}"}
-        async with httpx.AsyncClient(timeout=30) as client:
-            poll = await client.get(MESHY_API_URL + f"tasks/{task_id}", headers=headers)
+    """Meshy 3D generation task status, as last seen by the tracker (finished tasks never go upstream)."""
+    return _status_response(await _get_record(task_id))
 
-        if poll.status_code != 200:
-            raise HTTPException(status_code=poll.status_code, detail=poll.json())
 
-        data = poll.json()
-        status = data.get("status")
+@router.get("/generate-3d/events/{task_id}")
+async def generation_events(task_id: str):
+    """Server-sent events with the task status on every change; the stream ends when the task finishes."""
+    await _get_record(task_id)
 
-        if status == "completed":
-            return {
-                "status": "completed",
-                "model_url": data["result"].get("glb_url"),
-                "preview": data["result"].get("thumbnail_url"),
-                "task_id": task_id
-            }
-        elif status == "failed":
-            return {"status": "failed", "error": "Meshy generation failed"}
-        else:
-            return {"status": status}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    async def events():
+        async for record in tracker.subscribe(task_id):
+            state = _status_response(record)
+            yield f"event: {state['status']}\ndata: {json.dumps(state)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
@@ -0,0 +1,21 @@
+# backend/routes/traces.py
+
+from typing import Optional
+
+from fastapi import APIRouter, Query
+
+from utils.tracing import export_traces, summarize_traces
+
+router = APIRouter()
+
+
+@router.get("/traces")
+async def get_traces(limit: int = Query(100, ge=1, le=1000), name: Optional[str] = None):
+    """Recent stage-level traces (newest first), e.g. name=voice_chat_once."""
+    return {"traces": export_traces(limit=limit, name=name)}
+
+
+@router.get("/traces/summary")
+async def get_trace_summary(name: Optional[str] = None):
+    """p50/p95/p99 latency per stage over the buffered traces."""
+    return summarize_traces(name=name)
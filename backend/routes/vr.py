@@ -1,54 +1,111 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 import datetime
+import asyncio
 import json
-import os
+import re
 
-from azure.storage.blob import (
-    BlobServiceClient,
-    generate_blob_sas,
-    BlobSasPermissions,
-    ContentSettings,
-)
+from azure.core.exceptions import ResourceExistsError
+from azure.storage.blob import ContentSettings
 
-router = APIRouter()
-
-# Load environment variables for Azure Storage
-AZURE_CONNECTION_STRING = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
-CONTAINER_NAME = os.getenv("AZURE_CONTAINER_NAME")
+from config.blob_config import container_client
+from utils.blob_sas import generate_read_sas_url
+from utils.room_layout import DEFAULT_LAYOUT_STYLE, LAYOUT_STYLES, apply_layout, room_layout
+from utils.room_store import InvalidPatchError, RoomConflictError, RoomNotFoundError, RoomStore
+from utils.vr_room import room_items, sign_items
 
-blob_service_client = BlobServiceClient.from_connection_string(AZURE_CONNECTION_STRING)
-container_client = blob_service_client.get_container_client(CONTAINER_NAME)
+router = APIRouter()
 
 
 class MemorySelection(BaseModel):
     profile_id: str
     selected_memory_ids: List[str]
+    room_id: Optional[str] = None
+    name: Optional[str] = None
+    layout: str = DEFAULT_LAYOUT_STYLE
+
+
+class RoomCreate(BaseModel):
+    selected_memory_ids: List[str]
+    room_id: Optional[str] = None
+    name: Optional[str] = None
+    layout: str = DEFAULT_LAYOUT_STYLE
 
 
-def get_account_key():
-    parts = AZURE_CONNECTION_STRING.split(";")
-    for part in parts:
-        if part.lower().startswith("accountkey="):
-            return part.split("=", 1)[1]
-    raise RuntimeError("Could not find account key in connection string")
+class RoomPatch(BaseModel):
+    ops: List[Dict[str, Any]]
+    base_version: Optional[int] = None
 
 
-account_name = blob_service_client.account_name
-account_key = get_account_key()
+room_store = RoomStore(container_client)
 
 
 def generate_sas_url(blob_name: str, expiry_hours: int = 105) -> str:
-    sas_token = generate_blob_sas(
-        account_name=account_name,
-        container_name=CONTAINER_NAME,
-        blob_name=blob_name,
-        account_key=account_key,
-        permission=BlobSasPermissions(read=True),
-        expiry=datetime.datetime.utcnow() + datetime.timedelta(hours=expiry_hours),
+    return generate_read_sas_url(blob_name, datetime.timedelta(hours=expiry_hours))
+
+
+def _layout(room: dict, style: Optional[str] = None) -> dict:
+    try:
+        return room_layout(room, style)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _signed_room(room: dict, style: Optional[str] = None) -> dict:
+    """
+    Room as served: items get fresh SAS URLs and their precomputed transforms, and
+    are listed in load order (`load_priority` 0 first). The change history stays internal.
+    """
+    layout = _layout(room, style)
+    served = {k: v for k, v in room.items() if k != "changes"}
+    served["items"] = apply_layout(sign_items(room["items"]), layout)
+    served["layout"] = {"style": layout["style"], "load_order": layout["load_order"]}
+    # Older headset builds read `memories`
+    served["memories"] = served["items"]
+    return served
+
+
+def _signed_changes(changes: List[dict]) -> List[dict]:
+    added = sign_items([c["item"] for c in changes if c["op"] == "add"])
+    signed = {item["id"]: item for item in added}
+    return [{**c, "item": signed[c["item"]["id"]]} if c["op"] == "add" else c for c in changes]
+
+
+def _etag(room: dict, style: Optional[str] = None) -> str:
+    return f'"{room["room_id"]}-v{room["version"]}-{style or room.get("layout_style") or DEFAULT_LAYOUT_STYLE}"'
+
+
+def write_active_room(room: dict) -> str:
+    """Per-profile pointer to the most recently built room, for headsets that load a fixed file."""
+    blob_path = f"profiles/{room['profile_id']}/active_room.json"
+    container_client.get_blob_client(blob_path).upload_blob(
+        json.dumps(_signed_room(room), indent=2),
+        overwrite=True,
+        content_settings=ContentSettings(content_type="application/json"),
     )
-    return f"https://{account_name}.blob.core.windows.net/{CONTAINER_NAME}/{blob_name}?{sas_token}"
+    return blob_path
+
+
+async def create_room(
+    profile_id: str,
+    memory_ids: List[str],
+    room_id: Optional[str] = None,
+    name: Optional[str] = None,
+    layout: str = DEFAULT_LAYOUT_STYLE,
+):
+    """Resolves the memories and stores a new room at version 1. Returns (room, missing_ids)."""
+    if layout not in LAYOUT_STYLES:
+        raise HTTPException(status_code=400, detail=f"layout must be one of {', '.join(LAYOUT_STYLES)}")
+    items, missing_ids = await asyncio.to_thread(room_items, profile_id, memory_ids, container_client)
+    if not items:
+        raise HTTPException(status_code=404, detail="No matching memories found")
+    try:
+        room = await asyncio.to_thread(room_store.create, profile_id, items, room_id, name, layout)
+    except ResourceExistsError:
+        raise HTTPException(status_code=409, detail=f"Room {room_id} already exists")
+    return room, missing_ids
 
 
 @router.post("/create-vr-room/")
@@ -57,94 +114,122 @@ async def create_vr_room(selection: MemorySelection):
     if not selection.profile_id or not selection.selected_memory_ids:
         raise HTTPException(status_code=400, detail="profile_id and selected_memory_ids are required")
 
-    possible_locations = {
-        "image": ("images", [".jpg", ".jpeg", ".png", ".webp"]),
-        "video": ("videos", [".mp4", ".mov", ".webm"]),
-        "audio": ("voice_samples", [".mp3", ".wav", ".m4a"]),
-        "text": ("documents", [".txt", ".json", ".pdf"]),
-    }
-
-    memories = []
-    missing_ids = []
-
-    for mem_id in selection.selected_memory_ids:
-        found = False
-        print(f"[INFO] Checking memory ID: {mem_id}")
-        for mem_type, (folder, exts) in possible_locations.items():
-            for ext in exts:
-                blob_name = f"profiles/{selection.profile_id}/{folder}/{mem_id}{ext}"
-                blob_client = container_client.get_blob_client(blob_name)
-                try:
-                    blob_exists = blob_client.exists()
-                except Exception as e:
-                    print(f"[ERROR] Exception checking blob {blob_name}: {e}")
-                    blob_exists = False
-
-                print(f"[DEBUG] Path: {blob_name} | Exists: {blob_exists}")
-
-                if blob_exists:
-                    try:
-                        url = generate_sas_url(blob_name)
-                        memories.append({
-                            "id": mem_id,
-                            "type": mem_type,
-                            "url": url,
-                            "title": f"{mem_id}{ext}",
-                            "position": None,
-                            "rotation": None,
-                            "scale": None,
-                        })
-                        print(f"[SUCCESS] Added memory: {mem_id} @ {blob_name}")
-                    except Exception as err:
-                        print(f"[ERROR] Failed to generate SAS for {blob_name}: {err}")
-                        continue
-                    found = True
-                    break
-            if found:
-                break
-        if not found:
-            missing_ids.append(mem_id)
-            print(f"[WARNING] No blob found for memory ID: {mem_id}")
-
-    if not memories:
-        print(f"[ERROR] No matching blobs found for any of the selected IDs: {selection.selected_memory_ids}")
-        raise HTTPException(status_code=404, detail="No matching memories found")
-
+    room, missing_ids = await create_room(
+        selection.profile_id, selection.selected_memory_ids, selection.room_id, selection.name, selection.layout
+    )
     if missing_ids:
         print(f"[INFO] These memory IDs did not have matching blobs: {missing_ids}")
 
-    # Here is the change: overwrite single fixed active_room.json for all profiles at 'yash_me' folder
-    active_room = {
-        "room_id": f"room_{datetime.datetime.utcnow().strftime('%Y%m%d%H%M%S')}",
-        "profile_id": selection.profile_id,
-        "memories": memories,
-    }
-
-    active_room_json = json.dumps(active_room, indent=2)
-
-    # Fixed blob path for shared JSON file
-    fixed_blob_path = "profiles/yash_me/active_room.json"
-    blob_client = container_client.get_blob_client(fixed_blob_path)
-
     try:
-        blob_client.upload_blob(
-            active_room_json,
-            overwrite=True,
-            content_settings=ContentSettings(content_type="application/json"),
-        )
-        print(f"[SUCCESS] Active room JSON uploaded to {fixed_blob_path}")
+        active_room_path = await asyncio.to_thread(write_active_room, room)
     except Exception as e:
         print(f"[ERROR] Failed to upload active_room.json to blob storage: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to upload active_room.json: {str(e)}")
 
-    response = {
+    active_room = _signed_room(room)
+    return {
         "ok": True,
         "profile_id": selection.profile_id,
-        "memories_count": len(memories),
+        "room_id": room["room_id"],
+        "version": room["version"],
+        "memories_count": len(room["items"]),
         "missing_memory_ids": missing_ids,
         "active_room": active_room,
-        # Return SAS URL for the fixed shared file only
-        "active_room_url": generate_sas_url(fixed_blob_path),
+        "active_room_url": generate_sas_url(active_room_path),
     }
-    print(f"[INFO] VR room creation response: {response}")
-    return response
+
+
+@router.get("/rooms/{profile_id}")
+async def list_rooms(profile_id: str):
+    return {"profile_id": profile_id, "rooms": await asyncio.to_thread(room_store.list, profile_id)}
+
+
+@router.post("/rooms/{profile_id}", status_code=201)
+async def create_room_endpoint(profile_id: str, body: RoomCreate):
+    room, missing_ids = await create_room(profile_id, body.selected_memory_ids, body.room_id, body.name, body.layout)
+    return JSONResponse(
+        {**_signed_room(room), "missing_memory_ids": missing_ids},
+        status_code=201,
+        headers={"ETag": _etag(room)},
+    )
+
+
+@router.get("/rooms/{profile_id}/{room_id}")
+async def get_room(
+    profile_id: str,
+    room_id: str,
+    request: Request,
+    since: Optional[int] = None,
+    layout: Optional[str] = None,
+):
+    """
+    The room at its current version (ETag `"<room>-v<version>-<layout>"`; If-None-Match gives 304),
+    laid out in the room's style or `layout` (gallery/spiral).
+    With `since`, only the changes after that version plus the (small) updated
+    layout, unless the changes are no longer all in the history, in which case
+    the full room is returned (`full: true`).
+    """
+    try:
+        room = await asyncio.to_thread(room_store.get, profile_id, room_id)
+    except RoomNotFoundError:
+        raise HTTPException(status_code=404, detail="Room not found")
+    headers = {"ETag": _etag(room, layout)}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+
+    if since is not None:
+        changes = RoomStore.changes_since(room, since)
+        if changes is not None:
+            return JSONResponse(
+                {
+                    "room_id": room_id,
+                    "version": room["version"],
+                    "since": since,
+                    "full": False,
+                    "changes": _signed_changes(changes),
+                    "layout": _layout(room, layout),
+                },
+                headers=headers,
+            )
+    return JSONResponse({**_signed_room(room, layout), "full": True}, headers=headers)
+
+
+@router.patch("/rooms/{profile_id}/{room_id}")
+async def patch_room(profile_id: str, room_id: str, body: RoomPatch, request: Request):
+    """
+    Applies add/remove/move ops as one new version:
+      {"op": "add", "memory_id": "..."}, {"op": "remove", "id": "..."},
+      {"op": "move", "id": "...", "position": [x, y, z], "rotation": [...], "scale": [...]}
+    `base_version` (or an If-Match ETag) makes the patch fail with 409 if someone
+    else changed the room first. Returns the changes this patch made.
+    """
+    expected_version = body.base_version
+    if_match = request.headers.get("if-match")
+    if expected_version is None and if_match:
+        try:
+            expected_version = int(re.search(r"-v(\d+)-\w+\"?$", if_match).group(1))
+        except AttributeError:
+            raise HTTPException(status_code=400, detail="Malformed If-Match header")
+
+    added_ids = [op.get("memory_id") for op in body.ops if op.get("op") == "add"]
+    new_items = {}
+    if added_ids:
+        items, _ = await asyncio.to_thread(room_items, profile_id, added_ids, container_client)
+        new_items = {item["id"]: item for item in items}
+
+    try:
+        room = await asyncio.to_thread(room_store.patch, profile_id, room_id, body.ops, expected_version, new_items)
+    except RoomNotFoundError:
+        raise HTTPException(status_code=404, detail="Room not found")
+    except RoomConflictError as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "current_version": e.current_version})
+    except InvalidPatchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    changes = RoomStore.changes_since(room, expected_version) if expected_version is not None else None
+    if changes is None:
+        changes = [c for c in room.get("changes", []) if c["version"] == room["version"]]
+    return JSONResponse(
+        {"room_id": room_id, "version": room["version"], "changes": _signed_changes(changes), "layout": _layout(room)},
+        headers={"ETag": _etag(room)},
+    )
@@ -0,0 +1,60 @@
+# backend/utils/aging_cache.py
+
+import os
+import json
+import hashlib
+from typing import Optional
+
+from utils.disk_cache import DiskLRUCache
+
+AGING_CACHE_DIR = os.getenv("AGING_CACHE_DIR", os.path.join("cache", "aging"))
+AGING_CACHE_MAX_BYTES = int(os.getenv("AGING_CACHE_MAX_MB", "1024")) * 1024 * 1024
+AGING_CACHE_MAX_AGE_SECONDS = int(os.getenv("AGING_CACHE_MAX_AGE_DAYS", "30")) * 24 * 3600
+# Set e.g. "cache/aging" to mirror results to blob, so every worker can serve a
+# result any of them generated (copies expire with AGING_CACHE_MAX_AGE_DAYS)
+AGING_CACHE_BLOB_PREFIX = os.getenv("AGING_CACHE_BLOB_PREFIX") or None
+
+RESULTS_ROUTE = "/age-transform/results"
+
+aging_result_cache = DiskLRUCache(
+    AGING_CACHE_DIR,
+    AGING_CACHE_MAX_BYTES,
+    max_age_seconds=AGING_CACHE_MAX_AGE_SECONDS,
+    blob_prefix=AGING_CACHE_BLOB_PREFIX,
+    name="aging_results",
+)
+
+
+def aging_cache_key(image_hash: str, **params) -> str:
+    """
+    Key for one aging result: sha256 over the input image hash and every parameter
+    that changes the output (direction/age, years, strength, prompt, model).
+    """
+    payload = json.dumps([image_hash, sorted(params.items())], ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get_cached_result(key: str) -> Optional[str]:
+    """Local path of a cached result (pulled from the blob mirror if only another worker has it)."""
+    return aging_result_cache.get_path(key)
+
+
+def store_result(key: str, image_bytes: bytes) -> str:
+    return aging_result_cache.put(key, image_bytes)
+
+
+def media_type_for(path: str) -> str:
+    """Results are stored without an extension (the upstream format varies), so sniff it."""
+    with open(path, "rb") as f:
+        head = f.read(12)
+    if head.startswith(b"\x89PNG"):
+        return "image/png"
+    if head.startswith(b"\xff\xd8"):
+        return "image/jpeg"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+def result_url(key: str, base_url: str = "") -> str:
+    return f"{base_url.rstrip('/')}{RESULTS_ROUTE}/{key}"
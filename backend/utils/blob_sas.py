@@ -0,0 +1,203 @@
+# backend/utils/blob_sas.py
+
+import os
+import asyncio
+import datetime
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from azure.storage.blob import BlobSasPermissions, BlobServiceClient, UserDelegationKey, generate_blob_sas
+
+from config.blob_config import blob_service_client, connection_string, container_name
+
+try:
+    from azure.identity import DefaultAzureCredential
+except ImportError:  # optional: only needed for user-delegation signing
+    DefaultAzureCredential = None
+
+logger = logging.getLogger(__name__)
+
+# Sign with an Entra ID user-delegation key instead of the account key
+SAS_USE_USER_DELEGATION = os.getenv("AZURE_SAS_USE_USER_DELEGATION", "false").lower() in ("1", "true", "yes")
+DELEGATION_KEY_HOURS = int(os.getenv("AZURE_SAS_DELEGATION_KEY_HOURS", "24"))
+# The key is replaced once it has less than this left
+DELEGATION_KEY_REFRESH_MARGIN = datetime.timedelta(hours=2)
+SAS_CACHE_MAX_ENTRIES = int(os.getenv("SAS_CACHE_MAX_ENTRIES", "20000"))
+# Cached tokens are reused while at least this share of the lifetime a new token would get is left
+SAS_REUSE_FRACTION = 0.5
+# Tolerates clock skew between this server and Azure
+SAS_CLOCK_SKEW = datetime.timedelta(minutes=5)
+# A user-delegation token can't outlive its key, so under delegation the default
+# is capped at the key lifetime (raise AZURE_SAS_DELEGATION_KEY_HOURS, max 168, for longer links)
+DEFAULT_SAS_EXPIRY = datetime.timedelta(hours=min(105, DELEGATION_KEY_HOURS) if SAS_USE_USER_DELEGATION else 105)
+
+
+def _get_account_key() -> str:
+    credential = getattr(blob_service_client, "credential", None)
+    if getattr(credential, "account_key", None):
+        return credential.account_key
+    for part in connection_string.split(";"):
+        if part.lower().startswith("accountkey="):
+            return part.split("=", 1)[1]
+    raise RuntimeError("Could not find account key in connection string")
+
+
+class SasService:
+    """
+    Mints read/write SAS URLs for blobs in the app container.
+
+    Tokens are cached per blob and permission and handed out again while enough of
+    their lifetime is left, so building a room or gallery twice doesn't sign twice.
+    With user delegation enabled, tokens are signed with a user-delegation key that
+    `run_delegation_key_refresher` renews in the background; otherwise with the
+    account key, parsed once.
+    """
+
+    def __init__(self):
+        self.account_name = blob_service_client.account_name
+        self._account_key: Optional[str] = None
+        self._delegation_key: Optional[UserDelegationKey] = None
+        self._delegation_key_expiry: Optional[datetime.datetime] = None
+        self._delegation_client: Optional[BlobServiceClient] = None
+        self._cache: "OrderedDict[Tuple[str, str], Tuple[str, datetime.datetime]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # ----------------- Signing keys -----------------
+    @property
+    def uses_user_delegation(self) -> bool:
+        return SAS_USE_USER_DELEGATION and DefaultAzureCredential is not None
+
+    def refresh_delegation_key(self, force: bool = False):
+        """Fetches a new user-delegation key if the current one is missing or close to expiry."""
+        now = datetime.datetime.utcnow()
+        if not force and self._delegation_key_expiry and self._delegation_key_expiry - now > DELEGATION_KEY_REFRESH_MARGIN:
+            return
+        if self._delegation_client is None:
+            self._delegation_client = BlobServiceClient(
+                f"https://{self.account_name}.blob.core.windows.net", credential=DefaultAzureCredential()
+            )
+        expiry = now + datetime.timedelta(hours=DELEGATION_KEY_HOURS)
+        key = self._delegation_client.get_user_delegation_key(now - SAS_CLOCK_SKEW, expiry)
+        with self._lock:
+            self._delegation_key, self._delegation_key_expiry = key, expiry
+        logger.info(f"[SAS] User-delegation key refreshed, valid until {expiry.isoformat()}Z")
+
+    def _signing_args(self, expiry: datetime.datetime) -> Tuple[Dict, datetime.datetime]:
+        if self.uses_user_delegation:
+            if self._delegation_key is None or self._delegation_key_expiry <= datetime.datetime.utcnow():
+                self.refresh_delegation_key(force=True)
+            # A token can't outlive the key that signed it
+            return {"user_delegation_key": self._delegation_key}, min(expiry, self._delegation_key_expiry)
+        if self._account_key is None:
+            self._account_key = _get_account_key()
+        return {"account_key": self._account_key}, expiry
+
+    def _issuable_lifetime(self, expiry: datetime.timedelta, now: datetime.datetime) -> datetime.timedelta:
+        """`expiry`, capped at what the current user-delegation key has left."""
+        if self.uses_user_delegation and self._delegation_key_expiry is not None:
+            return max(datetime.timedelta(0), min(expiry, self._delegation_key_expiry - now))
+        return expiry
+
+    # ----------------- Minting -----------------
+    def _mint(self, blob_name: str, permission: str, expiry: datetime.datetime) -> Tuple[str, datetime.datetime]:
+        credentials, expiry = self._signing_args(expiry)
+        token = generate_blob_sas(
+            account_name=self.account_name,
+            container_name=container_name,
+            blob_name=blob_name,
+            permission=BlobSasPermissions.from_string(permission),
+            start=datetime.datetime.utcnow() - SAS_CLOCK_SKEW,
+            expiry=expiry,
+            **credentials,
+        )
+        url = f"https://{self.account_name}.blob.core.windows.net/{container_name}/{blob_name}?{token}"
+        return url, expiry
+
+    def sign(
+        self,
+        blob_name: str,
+        permission: str = "r",
+        expiry: datetime.timedelta = DEFAULT_SAS_EXPIRY,
+    ) -> Tuple[str, datetime.datetime]:
+        """
+        (url, expires_at) for one blob, reusing a cached token when one is still fresh
+        enough. Under user delegation, expires_at is capped at the signing key's expiry,
+        so it may be sooner than `expiry` asks for.
+        """
+        now = datetime.datetime.utcnow()
+        key = (blob_name, permission)
+        with self._lock:
+            cached = self._cache.get(key)
+            # Compare with the lifetime a new token would actually get: a capped token
+            # could never have half of the requested lifetime left
+            if cached and cached[1] - now >= self._issuable_lifetime(expiry, now) * SAS_REUSE_FRACTION:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        minted = self._mint(blob_name, permission, now + expiry)
+        with self._lock:
+            self._cache[key] = minted
+            self._cache.move_to_end(key)
+            while len(self._cache) > SAS_CACHE_MAX_ENTRIES:
+                self._cache.popitem(last=False)
+        return minted
+
+    def sign_many(
+        self,
+        blob_names: Iterable[str],
+        permission: str = "r",
+        expiry: datetime.timedelta = DEFAULT_SAS_EXPIRY,
+    ) -> Dict[str, str]:
+        """{blob_name: url} for a whole room or gallery in one call."""
+        return {name: self.sign(name, permission, expiry)[0] for name in dict.fromkeys(blob_names)}
+
+    def invalidate(self, blob_name: str):
+        """Forget cached tokens for a blob (e.g. after it was deleted)."""
+        with self._lock:
+            for key in [k for k in self._cache if k[0] == blob_name]:
+                del self._cache[key]
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "user_delegation": self.uses_user_delegation,
+            "delegation_key_expiry": self._delegation_key_expiry.isoformat() + "Z" if self._delegation_key_expiry else None,
+        }
+
+
+sas_service = SasService()
+
+
+async def run_delegation_key_refresher(interval: int = 600):
+    """Keeps the user-delegation key fresh so no request waits on fetching one. No-op with account keys."""
+    if SAS_USE_USER_DELEGATION and DefaultAzureCredential is None:
+        logger.warning("[SAS] AZURE_SAS_USE_USER_DELEGATION is set but azure-identity is not installed; using the account key")
+    if not sas_service.uses_user_delegation:
+        return
+    while True:
+        try:
+            await asyncio.to_thread(sas_service.refresh_delegation_key)
+        except Exception as e:
+            logger.warning(f"[SAS] User-delegation key refresh failed: {e}")
+        await asyncio.sleep(interval)
+
+
+def generate_read_sas_url(blob_name: str, expiry: datetime.timedelta = DEFAULT_SAS_EXPIRY) -> str:
+    """
+    Returns a read-only SAS URL for a blob in the app container, valid for at least
+    half of `expiry` (tokens are reused from the cache while that much is left), or
+    half of the signing key's remaining lifetime under user delegation.
+    """
+    return sas_service.sign(blob_name, "r", expiry)[0]
+
+
+def sign_read_urls(blob_names: Iterable[str], expiry: datetime.timedelta = DEFAULT_SAS_EXPIRY) -> Dict[str, str]:
+    return sas_service.sign_many(blob_names, "r", expiry)
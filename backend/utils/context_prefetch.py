@@ -0,0 +1,94 @@
+# backend/utils/context_prefetch.py
+
+import time
+import contextvars
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Dict, Optional
+
+from azure.storage.blob import ContainerClient
+
+from utils.conversation_utils import get_conversation_history, save_conversation_turn
+from utils.voice_context import get_voice_context
+from utils.tracing import span
+
+PREFETCH_MAX_AGE_SECONDS = 30
+
+_read_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="context-prefetch")
+# Separate pool: loads block on these, so sharing _read_executor could deadlock it
+_voice_context_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="voice-context")
+# One writer so history saves from consecutive turns never interleave
+_write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-writer")
+_pending_writes: Dict[str, Future] = {}
+
+
+class ContextPrefetcher:
+    """
+    Loads a profile's persona context and conversation history in the background,
+    typically kicked off by the recognizer's first partial result, so the data is
+    ready by the time the final transcript arrives.
+    """
+
+    def __init__(self, profile_id: str, container_client: ContainerClient):
+        self.profile_id = profile_id
+        self.container_client = container_client
+        self._lock = threading.Lock()
+        self._future: Optional[Future] = None
+        self._loaded_at = 0.0
+
+    def _load(self) -> Dict:
+        pending_write = _pending_writes.get(self.profile_id)
+        if pending_write is not None:
+            # Don't read history back before the previous turn has been written
+            wait([pending_write])
+        voice_context = _voice_context_executor.submit(get_voice_context, self.profile_id)
+        history = get_conversation_history(self.profile_id, self.container_client)
+        return {"voice_context": voice_context.result(), "history": history}
+
+    def trigger(self, *_args):
+        """Starts a background load unless a fresh or in-flight one exists. Safe to call on every partial."""
+        with self._lock:
+            if self._future is not None:
+                in_flight = not self._future.done()
+                fresh = time.monotonic() - self._loaded_at < PREFETCH_MAX_AGE_SECONDS
+                if in_flight or (fresh and self._future.exception() is None):
+                    return
+            self._loaded_at = time.monotonic()
+            self._future = _read_executor.submit(self._load)
+
+    def is_ready(self) -> bool:
+        """True if a load has already finished, i.e. get() won't block."""
+        with self._lock:
+            return self._future is not None and self._future.done()
+
+    def get(self) -> Dict:
+        """Returns the prefetched context, waiting for an in-flight load or loading now if needed."""
+        self.trigger()
+        with self._lock:
+            future = self._future
+        return future.result()
+
+    def record_turn(self, user_message: Dict, bot_message: Dict, source: str):
+        """
+        Appends the turn to the cached history right away and persists it in the
+        background, so the next turn neither waits for the write nor re-reads it.
+        """
+        with self._lock:
+            future = self._future
+        if future is not None and future.done() and future.exception() is None:
+            history = future.result()["history"]
+            history.append({**user_message, "source": source})
+            history.append({**bot_message, "source": source})
+
+        # Run the write in a copy of this context so its span lands on the current trace
+        _pending_writes[self.profile_id] = _write_executor.submit(
+            contextvars.copy_context().run,
+            self._save_turn,
+            user_message,
+            bot_message,
+            source,
+        )
+
+    def _save_turn(self, user_message: Dict, bot_message: Dict, source: str):
+        with span("history_write"):
+            save_conversation_turn(self.profile_id, user_message, bot_message, self.container_client, source=source)
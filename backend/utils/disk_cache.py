@@ -0,0 +1,313 @@
+# backend/utils/disk_cache.py
+
+import os
+import re
+import time
+import asyncio
+import logging
+import datetime
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_SAFE_KEY = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+CACHE_SWEEP_INTERVAL_SECONDS = int(os.getenv("CACHE_SWEEP_INTERVAL_SECONDS", "600"))
+
+# Named caches, swept in the background and listed by the artifacts endpoint
+_registry: Dict[str, "DiskLRUCache"] = {}
+
+
+class DiskLRUCache:
+    """
+    Content-addressed file cache on local disk.
+
+    Entries are plain files named after their key, so they can be streamed or
+    served directly. Total size is bounded by `max_bytes` (least recently used
+    entries go first) and optionally by `max_age_seconds`. When `blob_prefix`
+    is given, entries are mirrored to Azure Blob Storage and local misses fall
+    back to the blob copy, so other workers can reuse them.
+
+    Eviction runs on every write; caches created with a `name` are also swept
+    periodically by `run_cache_sweeper`, so entries past `max_age_seconds`
+    are removed even when nothing new is written. Each sweep rebuilds the index
+    from the directory, so files written by other workers sharing it count
+    towards the quota too, and deletes blob copies older than `max_age_seconds`
+    (which are also never pulled back down).
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int,
+        max_age_seconds: Optional[int] = None,
+        blob_prefix: Optional[str] = None,
+        name: Optional[str] = None,
+    ):
+        self.name = name
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.blob_prefix = blob_prefix.rstrip("/") + "/" if blob_prefix else None
+        self._lock = threading.Lock()
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+        os.makedirs(directory, exist_ok=True)
+        self.rescan()
+        if name:
+            _registry[name] = self
+
+    # ----------------- Index -----------------
+    def rescan(self):
+        """Rebuild the index and LRU order from the files on disk and their modification times."""
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(".tmp"):
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                # Removed by another worker meanwhile
+                continue
+            if os.path.isfile(path):
+                entries.append((st.st_mtime, name, st.st_size))
+        index: "OrderedDict[str, int]" = OrderedDict()
+        for _, name, size in sorted(entries):
+            index[name] = size
+        with self._lock:
+            self._index = index
+            self._total = sum(index.values())
+
+    def path_for(self, key: str) -> str:
+        if not _SAFE_KEY.match(key):
+            raise ValueError(f"Invalid cache key: {key!r}")
+        return os.path.join(self.directory, key)
+
+    def _touch(self, key: str):
+        self._index.move_to_end(key)
+        try:
+            os.utime(self.path_for(key))
+        except OSError:
+            pass
+
+    def _forget(self, key: str):
+        size = self._index.pop(key, None)
+        if size is not None:
+            self._total -= size
+
+    def _expired(self, path: str) -> bool:
+        if not self.max_age_seconds:
+            return False
+        try:
+            return time.time() - os.path.getmtime(path) > self.max_age_seconds
+        except OSError:
+            return True
+
+    # ----------------- Reads -----------------
+    def get_path(self, key: str) -> Optional[str]:
+        """Returns the local file path for `key` if cached, marking it recently used."""
+        path = self.path_for(key)
+        with self._lock:
+            if key not in self._index and os.path.isfile(path):
+                # Written by another worker sharing the directory
+                self._index[key] = os.path.getsize(path)
+                self._total += self._index[key]
+            if key in self._index:
+                if os.path.exists(path) and not self._expired(path):
+                    self._touch(key)
+                    return path
+                self._forget(key)
+        if self.blob_prefix and self._download_from_blob(key):
+            return path
+        return None
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self.get_path(key)
+        if not path:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def iter_chunks(self, key: str, chunk_size: int = 64 * 1024) -> Optional[Iterator[bytes]]:
+        """Returns an iterator over the cached file in chunks, or None on a miss."""
+        path = self.get_path(key)
+        if not path:
+            return None
+
+        def _reader():
+            with open(path, "rb") as f:
+                while True:
+                    chunk = f.read(chunk_size)
+                    if not chunk:
+                        break
+                    yield chunk
+
+        return _reader()
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._index
+
+    # ----------------- Writes -----------------
+    def put(self, key: str, data: bytes, mirror: bool = True) -> str:
+        """Atomically writes `data` under `key` and returns the file path."""
+        path = self.path_for(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._forget(key)
+            self._index[key] = len(data)
+            self._total += len(data)
+        self.evict()
+
+        if mirror and self.blob_prefix:
+            self._upload_to_blob(key, data)
+        return path
+
+    def put_file(self, key: str, src_path: str, mirror: bool = True) -> str:
+        with open(src_path, "rb") as f:
+            return self.put(key, f.read(), mirror=mirror)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._forget(key)
+        try:
+            os.remove(self.path_for(key))
+        except OSError:
+            pass
+
+    def evict(self) -> int:
+        """Drops expired entries, then least recently used ones until under `max_bytes`."""
+        removed = []
+        with self._lock:
+            if self.max_age_seconds:
+                for key in list(self._index):
+                    if self._expired(self.path_for(key)):
+                        self._forget(key)
+                        removed.append(key)
+            while self._total > self.max_bytes and self._index:
+                key, size = self._index.popitem(last=False)
+                self._total -= size
+                removed.append(key)
+
+        for key in removed:
+            try:
+                os.remove(self.path_for(key))
+            except OSError:
+                pass
+        if removed:
+            logger.info(f"[DiskLRUCache] Evicted {len(removed)} entries from {self.directory}")
+        return len(removed)
+
+    def entries(self, limit: Optional[int] = None) -> List[dict]:
+        """The index: cached keys with size and last use, most recently used first."""
+        with self._lock:
+            items = list(reversed(self._index.items()))
+        if limit is not None:
+            items = items[:limit]
+        entries = []
+        for key, size in items:
+            try:
+                mtime = os.path.getmtime(self.path_for(key))
+            except OSError:
+                continue
+            entries.append({
+                "key": key,
+                "size": size,
+                "last_used": datetime.datetime.utcfromtimestamp(mtime).isoformat() + "Z",
+            })
+        return entries
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "name": self.name,
+                "directory": self.directory,
+                "entries": len(self._index),
+                "total_bytes": self._total,
+                "max_bytes": self.max_bytes,
+                "max_age_seconds": self.max_age_seconds,
+            }
+
+    # ----------------- Blob mirror -----------------
+    def _upload_to_blob(self, key: str, data: bytes):
+        try:
+            from config.blob_config import container_client
+            container_client.get_blob_client(self.blob_prefix + key).upload_blob(data, overwrite=True)
+        except Exception as e:
+            logger.warning(f"[DiskLRUCache] Blob mirror upload failed for {key}: {e}")
+
+    def _download_from_blob(self, key: str) -> bool:
+        try:
+            from azure.core.exceptions import ResourceNotFoundError
+            from config.blob_config import container_client
+            try:
+                downloader = container_client.get_blob_client(self.blob_prefix + key).download_blob()
+            except ResourceNotFoundError:
+                return False
+            modified = downloader.properties.last_modified.timestamp()
+            if self.max_age_seconds and time.time() - modified > self.max_age_seconds:
+                # Expired remotely too; the sweep deletes it
+                return False
+            data = downloader.readall()
+        except Exception as e:
+            logger.warning(f"[DiskLRUCache] Blob mirror download failed for {key}: {e}")
+            return False
+        path = self.put(key, data, mirror=False)
+        # Keep the blob's age, so a re-hydrated copy doesn't outlive it
+        try:
+            os.utime(path, (modified, modified))
+        except OSError:
+            pass
+        return True
+
+    def sweep_blob_mirror(self) -> int:
+        """Deletes blob copies older than `max_age_seconds`. Returns how many were removed."""
+        if not self.blob_prefix or not self.max_age_seconds:
+            return 0
+        from azure.core.exceptions import ResourceNotFoundError
+        from config.blob_config import container_client
+        cutoff = time.time() - self.max_age_seconds
+        removed = 0
+        for blob in container_client.list_blobs(name_starts_with=self.blob_prefix):
+            if blob.last_modified.timestamp() >= cutoff:
+                continue
+            try:
+                container_client.delete_blob(blob.name)
+                removed += 1
+            except ResourceNotFoundError:
+                # Another worker's sweep got there first
+                pass
+        if removed:
+            logger.info(f"[DiskLRUCache] Deleted {removed} expired blob copies under {self.blob_prefix}")
+        return removed
+
+
+def registered_caches() -> Dict[str, DiskLRUCache]:
+    return dict(_registry)
+
+
+async def run_cache_sweeper(interval: int = CACHE_SWEEP_INTERVAL_SECONDS):
+    """
+    Periodically applies age and size limits to every named cache, re-reading the
+    directory first so the quota covers files written by every worker, and expires
+    their blob copies.
+    """
+    while True:
+        for name, cache in registered_caches().items():
+            try:
+                await asyncio.to_thread(cache.rescan)
+                await asyncio.to_thread(cache.evict)
+                await asyncio.to_thread(cache.sweep_blob_mirror)
+            except Exception as e:
+                logger.warning(f"[DiskLRUCache] Sweep of {name} failed: {e}")
+        await asyncio.sleep(interval)
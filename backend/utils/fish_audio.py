@@ -0,0 +1,113 @@
+# backend/utils/fish_audio.py
+
+import os
+import asyncio
+from typing import AsyncIterator, Optional
+
+import httpx
+from dotenv import load_dotenv
+from fastapi import UploadFile
+
+from utils.speech.long_form import LONG_FORM_MIN_CHARS, LONG_FORM_MAX_PARALLEL, split_for_synthesis
+
+load_dotenv()
+
+FISH_AUDIO_API_KEY = os.getenv("FISH_AUDIO_API_KEY")
+FISH_AUDIO_BASE_URL = "https://api.fish.audio/v1"
+# Fish Audio returns MP3 unless asked otherwise
+FISH_OUTPUT_FORMAT = "fish-mp3"
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Shared keep-alive client, so repeated calls skip the connection + TLS setup."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=FISH_AUDIO_BASE_URL,
+            headers={"Authorization": f"Bearer {FISH_AUDIO_API_KEY}"},
+            timeout=httpx.Timeout(60.0, connect=10.0),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60),
+        )
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def clone_voice(audio: UploadFile, language: str) -> dict:
+    """
+    Sends a voice sample to the clone endpoint. The upload's spooled file is passed
+    through as-is, so the sample is streamed rather than read into memory first.
+    """
+    files = {"audio": (audio.filename, audio.file, audio.content_type or "application/octet-stream")}
+    response = await get_client().post("/voice/clone", files=files, data={"language": language})
+    response.raise_for_status()
+    return response.json()
+
+
+async def _open_tts_response(voice_id: str, text: str, language: str) -> httpx.Response:
+    client = get_client()
+    request = client.build_request("POST", "/tts", json={"voice_id": voice_id, "text": text, "language": language})
+    response = await client.send(request, stream=True)
+    if response.is_error:
+        await response.aread()
+        await response.aclose()
+        response.raise_for_status()
+    return response
+
+
+async def _iter_response(response: httpx.Response) -> AsyncIterator[bytes]:
+    try:
+        async for chunk in response.aiter_bytes():
+            yield chunk
+    finally:
+        await response.aclose()
+
+
+async def tts_bytes(voice_id: str, text: str, language: str) -> bytes:
+    response = await get_client().post("/tts", json={"voice_id": voice_id, "text": text, "language": language})
+    response.raise_for_status()
+    return response.content
+
+
+async def _iter_long_form(tasks) -> AsyncIterator[bytes]:
+    try:
+        for task in tasks:
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def open_tts_stream(voice_id: str, text: str, language: str) -> AsyncIterator[bytes]:
+    """
+    Starts TTS and returns an async iterator of MP3 bytes as they arrive.
+    Upstream errors are raised here, before any bytes reach the client.
+
+    Long text is split into sentence chunks that are synthesized concurrently and
+    yielded in order, so the first sentence plays while the rest are generated.
+    """
+    if len(text) < LONG_FORM_MIN_CHARS:
+        return _iter_response(await _open_tts_response(voice_id, text, language))
+
+    semaphore = asyncio.Semaphore(LONG_FORM_MAX_PARALLEL)
+
+    async def synthesize_chunk(chunk: str) -> bytes:
+        async with semaphore:
+            return await tts_bytes(voice_id, chunk, language)
+
+    tasks = [asyncio.create_task(synthesize_chunk(chunk)) for chunk in split_for_synthesis(text)]
+    try:
+        await asyncio.wait({tasks[0]})
+        tasks[0].result()
+    except Exception:
+        for task in tasks:
+            task.cancel()
+        raise
+    return _iter_long_form(tasks)
@@ -0,0 +1,217 @@
+# backend/utils/image_preprocess.py
+
+import io
+import os
+import asyncio
+import hashlib
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from utils.disk_cache import DiskLRUCache
+
+logger = logging.getLogger(__name__)
+
+IMAGE_PREPROCESS_WORKERS = int(os.getenv("IMAGE_PREPROCESS_WORKERS", str(min(4, os.cpu_count() or 1))))
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", os.path.join("cache", "images"))
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_MB", "256")) * 1024 * 1024
+IMAGE_CACHE_MAX_AGE_SECONDS = int(os.getenv("IMAGE_CACHE_MAX_AGE_DAYS", "7")) * 24 * 3600
+# Upper bound on the encoded size; quality is stepped down until the image fits
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_PREPROCESS_MAX_KB", "1024")) * 1024
+
+DEFAULT_MAX_SIDE = 512
+QUALITY_STEPS = (85, 75, 65, 55, 45)
+OUTPUT_FORMATS = {
+    "jpeg": {"pil_format": "JPEG", "extension": "jpg", "media_type": "image/jpeg"},
+    "webp": {"pil_format": "WEBP", "extension": "webp", "media_type": "image/webp"},
+}
+
+image_cache = DiskLRUCache(
+    IMAGE_CACHE_DIR,
+    IMAGE_CACHE_MAX_BYTES,
+    max_age_seconds=IMAGE_CACHE_MAX_AGE_SECONDS,
+    name="preprocessed_images",
+)
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=IMAGE_PREPROCESS_WORKERS)
+    return _executor
+
+
+def shutdown_image_workers():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def perceptual_hash(data: bytes) -> Optional[str]:
+    """
+    64-bit difference hash (dHash) as 16 hex digits: re-encodes, resizes and small
+    crops of the same photo land within a few bits of each other. None if the data
+    isn't a readable image.
+    """
+    try:
+        image = Image.open(io.BytesIO(data))
+        if image.format == "JPEG":
+            image.draft("L", (64, 64))
+        image = ImageOps.exif_transpose(image).convert("L").resize((9, 8), Image.LANCZOS)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        return None
+    pixels = list(image.getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return f"{bits:016x}"
+
+
+def hamming_distance(a: str, b: str) -> int:
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+def _encode(image: Image.Image, output_format: str, max_bytes: int) -> bytes:
+    fmt = OUTPUT_FORMATS[output_format]
+    for quality in QUALITY_STEPS:
+        buffer = io.BytesIO()
+        if output_format == "jpeg":
+            image.save(buffer, format=fmt["pil_format"], quality=quality, optimize=True, progressive=True)
+        else:
+            image.save(buffer, format=fmt["pil_format"], quality=quality, method=4)
+        if buffer.tell() <= max_bytes:
+            break
+    return buffer.getvalue()
+
+
+def _preprocess(data: bytes, max_side: int, output_format: str, max_bytes: int) -> bytes:
+    """
+    Runs in a worker process: decode once, fix orientation, downscale and re-encode.
+    For JPEG input, `draft` lets the decoder scale by 1/2..1/8 while decoding,
+    which is much cheaper than decoding full size and resizing afterwards.
+    """
+    try:
+        image = Image.open(io.BytesIO(data))
+        if image.format == "JPEG":
+            image.draft("RGB", (max_side, max_side))
+        image = ImageOps.exif_transpose(image)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise ValueError(f"Invalid image file: {e}")
+
+    has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    if output_format == "webp" and has_alpha:
+        image = image.convert("RGBA")
+    elif has_alpha:
+        # JPEG has no alpha; flatten onto white rather than letting transparent areas turn black
+        rgba = image.convert("RGBA")
+        image = Image.new("RGB", rgba.size, (255, 255, 255))
+        image.paste(rgba, mask=rgba.getchannel("A"))
+    else:
+        image = image.convert("RGB")
+
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    return _encode(image, output_format, max_bytes)
+
+
+def _render_variants(data: bytes, specs: Dict[str, int], output_format: str, max_bytes: Dict[str, int]) -> Dict[str, dict]:
+    """
+    Runs in a worker process: decodes once (JPEG draft at the largest requested size)
+    and derives every variant from that, largest first. Variants larger than the
+    source are skipped, except the smallest one that covers it.
+    """
+    largest = max(specs.values())
+    try:
+        image = Image.open(io.BytesIO(data))
+        if image.format == "JPEG":
+            image.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("RGBA" if output_format == "webp" and "A" in image.getbands() else "RGB")
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise ValueError(f"Invalid image file: {e}")
+
+    source_side = max(image.size)
+    chosen = []
+    for name, max_side in sorted(specs.items(), key=lambda item: item[1]):
+        chosen.append((name, max_side))
+        if max_side >= source_side:
+            break
+
+    variants = {}
+    current = image
+    for name, max_side in sorted(chosen, key=lambda item: -item[1]):
+        current = current.copy()
+        current.thumbnail((max_side, max_side), Image.LANCZOS)
+        variants[name] = {
+            "data": _encode(current, output_format, max_bytes.get(name, IMAGE_MAX_BYTES)),
+            "width": current.width,
+            "height": current.height,
+        }
+    return variants
+
+
+async def render_variants(
+    data: bytes,
+    specs: Dict[str, int],
+    output_format: str = "webp",
+    max_bytes: Optional[Dict[str, int]] = None,
+) -> Dict[str, dict]:
+    """
+    Produces several downscaled copies of one image (e.g. thumb/medium/full) in the
+    process pool. Returns {name: {"data", "width", "height"}}; raises ValueError for unreadable input.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_executor(), _render_variants, data, specs, output_format, max_bytes or {}
+    )
+
+
+def _cache_key(source_hash: str, max_side: int, output_format: str, max_bytes: int) -> str:
+    return f"{source_hash}_{max_side}_{max_bytes}.{OUTPUT_FORMATS[output_format]['extension']}"
+
+
+async def preprocess_image(
+    data: bytes,
+    max_side: int = DEFAULT_MAX_SIDE,
+    output_format: str = "jpeg",
+    max_bytes: int = IMAGE_MAX_BYTES,
+) -> dict:
+    """
+    Normalizes an uploaded image (EXIF orientation applied, longest side <= max_side,
+    JPEG/WebP under max_bytes) in the process pool, off the event loop.
+
+    Results are cached by the hash of the original bytes plus the parameters, so a
+    retry or a sweep over ages with the same portrait is decoded only once.
+    Raises ValueError if the data is not a readable image.
+    """
+    source_hash = content_hash(data)
+    key = _cache_key(source_hash, max_side, output_format, max_bytes)
+    cached = await asyncio.to_thread(image_cache.get, key)
+    if cached is not None:
+        return _result(cached, source_hash, output_format, True)
+
+    loop = asyncio.get_running_loop()
+    processed = await loop.run_in_executor(_get_executor(), _preprocess, data, max_side, output_format, max_bytes)
+    await asyncio.to_thread(image_cache.put, key, processed, False)
+    logger.info(f"[ImagePreprocess] {len(data)} -> {len(processed)} bytes ({output_format}, {max_side}px)")
+    return _result(processed, source_hash, output_format, False)
+
+
+def _result(data: bytes, source_hash: str, output_format: str, cache_hit: bool) -> dict:
+    return {
+        "data": data,
+        "source_hash": source_hash,
+        "format": output_format,
+        "extension": OUTPUT_FORMATS[output_format]["extension"],
+        "media_type": OUTPUT_FORMATS[output_format]["media_type"],
+        "cache_hit": cache_hit,
+    }
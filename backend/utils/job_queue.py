@@ -0,0 +1,216 @@
+# backend/utils/job_queue.py
+
+import time
+import uuid
+import asyncio
+import logging
+import datetime
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = {"completed", "failed"}
+
+
+class JobError(Exception):
+    """Raised by a job handler to fail the job with a client-facing message and details."""
+
+    def __init__(self, message: str, details: Any = None):
+        super().__init__(message)
+        self.details = details
+
+
+class QueueFullError(Exception):
+    """The tenant already has the maximum number of unfinished jobs."""
+
+
+class Job:
+    def __init__(self, tenant: str, payload: Dict):
+        self.job_id = uuid.uuid4().hex
+        self.tenant = tenant
+        self.payload = payload
+        self.status = "queued"
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.details: Any = None
+        self.created_at = datetime.datetime.utcnow().isoformat() + "Z"
+        self.updated_at = self.created_at
+        self.finished_monotonic: Optional[float] = None
+        self._subscribers: List[asyncio.Queue] = []
+
+    @property
+    def done(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    def to_dict(self) -> Dict:
+        data = {
+            "job_id": self.job_id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+        if self.result is not None:
+            data["result"] = self.result
+        if self.error is not None:
+            data["error"] = self.error
+            data["details"] = self.details
+        return data
+
+
+class JobQueue:
+    """
+    In-process job queue: `submit` returns at once, a fixed number of worker tasks
+    run the handler, and no tenant has more than `per_tenant_limit` jobs running.
+    Tenants are served round-robin, so one tenant's backlog can't starve the others.
+
+    Clients poll `get(job_id)` or `subscribe(job_id)` for updates (e.g. over SSE).
+    Finished jobs are kept for `retention_seconds`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[Dict], Awaitable[Dict]],
+        workers: int = 4,
+        per_tenant_limit: int = 2,
+        max_pending_per_tenant: int = 20,
+        retention_seconds: int = 3600,
+    ):
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.per_tenant_limit = per_tenant_limit
+        self.max_pending_per_tenant = max_pending_per_tenant
+        self.retention_seconds = retention_seconds
+        self._jobs: Dict[str, Job] = {}
+        self._pending: "OrderedDict[str, Deque[Job]]" = OrderedDict()
+        self._running: Dict[str, int] = {}
+        self._condition: Optional[asyncio.Condition] = None
+        self._tasks: List[asyncio.Task] = []
+
+    # ----------------- Lifecycle -----------------
+    def _ensure_started(self):
+        if self._tasks:
+            return
+        self._condition = asyncio.Condition()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # ----------------- Public API -----------------
+    async def submit(self, tenant: str, payload: Dict) -> Job:
+        self._ensure_started()
+        self._prune()
+        unfinished = sum(1 for j in self._jobs.values() if j.tenant == tenant and not j.done)
+        if unfinished >= self.max_pending_per_tenant:
+            raise QueueFullError(f"Too many unfinished {self.name} jobs for this user")
+
+        job = Job(tenant, payload)
+        self._jobs[job.job_id] = job
+        async with self._condition:
+            self._pending.setdefault(tenant, deque()).append(job)
+            self._condition.notify()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def queue_position(self, job: Job) -> Optional[int]:
+        """1-based position among the tenant's queued jobs, or None once started."""
+        pending = self._pending.get(job.tenant)
+        if job.status != "queued" or not pending or job not in pending:
+            return None
+        return list(pending).index(job) + 1
+
+    async def subscribe(self, job_id: str) -> AsyncIterator[Dict]:
+        """Yields the job's state now and after every change, ending once it is finished."""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        updates: asyncio.Queue = asyncio.Queue()
+        job._subscribers.append(updates)
+        try:
+            snapshot = job.to_dict()
+            yield snapshot
+            # Follow the snapshots, not the live job: it may finish while the
+            # consumer is still busy, and the terminal snapshot must still be sent
+            while snapshot["status"] not in TERMINAL_STATUSES:
+                snapshot = await updates.get()
+                yield snapshot
+        finally:
+            job._subscribers.remove(updates)
+
+    def stats(self) -> Dict:
+        return {
+            "jobs": len(self._jobs),
+            "queued": sum(len(q) for q in self._pending.values()),
+            "running": sum(self._running.values()),
+            "workers": len(self._tasks),
+        }
+
+    # ----------------- Internals -----------------
+    def _next_job(self) -> Optional[Job]:
+        for tenant in list(self._pending):
+            if self._running.get(tenant, 0) >= self.per_tenant_limit:
+                continue
+            jobs = self._pending.pop(tenant)
+            job = jobs.popleft()
+            if jobs:
+                # Re-insert at the end so the next pick starts with another tenant
+                self._pending[tenant] = jobs
+            self._running[tenant] = self._running.get(tenant, 0) + 1
+            return job
+        return None
+
+    def _update(self, job: Job, status: str, **fields):
+        job.status = status
+        for key, value in fields.items():
+            setattr(job, key, value)
+        job.updated_at = datetime.datetime.utcnow().isoformat() + "Z"
+        if job.done:
+            job.finished_monotonic = time.monotonic()
+        snapshot = job.to_dict()
+        for updates in job._subscribers:
+            updates.put_nowait(snapshot)
+
+    async def _worker(self, index: int):
+        while True:
+            async with self._condition:
+                job = self._next_job()
+                while job is None:
+                    await self._condition.wait()
+                    job = self._next_job()
+
+            self._update(job, "running")
+            try:
+                result = await self.handler(job.payload)
+                self._update(job, "completed", result=result)
+            except JobError as e:
+                self._update(job, "failed", error=str(e), details=e.details)
+            except asyncio.CancelledError:
+                self._update(job, "failed", error="Job cancelled")
+                raise
+            except Exception as e:
+                logger.exception(f"[JobQueue:{self.name}] Job {job.job_id} failed")
+                self._update(job, "failed", error=str(e))
+            finally:
+                job.payload = {}
+                async with self._condition:
+                    self._running[job.tenant] -= 1
+                    if not self._running[job.tenant]:
+                        del self._running[job.tenant]
+                    self._condition.notify_all()
+
+    def _prune(self):
+        cutoff = time.monotonic() - self.retention_seconds
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_monotonic is not None and job.finished_monotonic < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
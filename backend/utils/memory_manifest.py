@@ -0,0 +1,113 @@
+# backend/utils/memory_manifest.py
+
+import json
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+from azure.storage.blob import ContainerClient, ContentSettings
+
+from utils.memory_reader import get_all_memory_metadata
+
+logger = logging.getLogger(__name__)
+
+# Fields copied from each memory's metadata JSON into the per-profile manifest
+MANIFEST_FIELDS = (
+    "memory_id", "title", "description", "file_type", "file_path", "emotion", "tags", "upload_date", "renditions",
+    "lods",
+)
+MANIFEST_WRITE_RETRIES = 5
+
+
+def _get_manifest_blob_name(profile_id: str) -> str:
+    """
+    Returns the blob path of the compact index of all memories for a profile.
+    """
+    return f"profiles/{profile_id}/memory_manifest.json"
+
+
+def _manifest_entry(metadata: Dict) -> Dict:
+    return {field: metadata.get(field) for field in MANIFEST_FIELDS if field in metadata}
+
+
+def _save_manifest(
+    profile_id: str,
+    entries: List[Dict],
+    container_client: ContainerClient,
+    etag: Optional[str] = None,
+):
+    """
+    Uploads the manifest if the blob still has `etag`, or only if it doesn't exist
+    yet when etag is None. Raises ResourceModifiedError / ResourceExistsError otherwise.
+    """
+    kwargs = {"etag": etag, "match_condition": MatchConditions.IfNotModified} if etag else {}
+    container_client.get_blob_client(_get_manifest_blob_name(profile_id)).upload_blob(
+        json.dumps(entries, ensure_ascii=False, indent=2),
+        overwrite=etag is not None,
+        content_settings=ContentSettings(content_type="application/json"),
+        **kwargs,
+    )
+
+
+def _read_manifest(profile_id: str, container_client: ContainerClient) -> Tuple[Optional[List[Dict]], Optional[str]]:
+    """(entries, etag); entries is None when the manifest is missing or unreadable."""
+    blob_client = container_client.get_blob_client(_get_manifest_blob_name(profile_id))
+    try:
+        downloader = blob_client.download_blob()
+        data = downloader.readall()
+    except ResourceNotFoundError:
+        return None, None
+    try:
+        return json.loads(data), downloader.properties.etag
+    except json.JSONDecodeError:
+        return None, downloader.properties.etag
+
+
+def rebuild_memory_manifest(
+    profile_id: str,
+    container_client: ContainerClient,
+    etag: Optional[str] = None,
+) -> List[Dict]:
+    """
+    Rebuilds the manifest from the per-memory metadata blobs (one listing + one read per memory).
+    Only needed once for profiles created before the manifest existed. If another
+    writer saves a manifest meanwhile, theirs is kept.
+    """
+    entries = [_manifest_entry(m) for m in get_all_memory_metadata(profile_id, container_client)]
+    try:
+        _save_manifest(profile_id, entries, container_client, etag)
+    except (ResourceExistsError, ResourceModifiedError):
+        logger.info(f"[Manifest] {profile_id} manifest was written during rebuild; keeping it")
+    return entries
+
+
+def get_memory_manifest(profile_id: str, container_client: ContainerClient) -> List[Dict]:
+    """
+    Returns the list of memory entries for a profile in a single blob read,
+    building the manifest on first use.
+    """
+    entries, etag = _read_manifest(profile_id, container_client)
+    if entries is None:
+        return rebuild_memory_manifest(profile_id, container_client, etag)
+    return entries
+
+
+def add_to_memory_manifest(profile_id: str, metadata: Dict, container_client: ContainerClient):
+    """
+    Adds or replaces a memory's entry in the profile manifest. The write is guarded
+    by the blob ETag; if another upload changed the manifest meanwhile, the entry is
+    re-applied on the fresh copy.
+    """
+    for _ in range(MANIFEST_WRITE_RETRIES):
+        entries, etag = _read_manifest(profile_id, container_client)
+        if entries is None:
+            entries = [_manifest_entry(m) for m in get_all_memory_metadata(profile_id, container_client)]
+        entries = [e for e in entries if e.get("memory_id") != metadata.get("memory_id")]
+        entries.append(_manifest_entry(metadata))
+        try:
+            _save_manifest(profile_id, entries, container_client, etag)
+            return
+        except (ResourceExistsError, ResourceModifiedError):
+            logger.info(f"[Manifest] {profile_id} manifest changed during write; retrying")
+    raise RuntimeError(f"Could not update the memory manifest for {profile_id} after {MANIFEST_WRITE_RETRIES} attempts")
@@ -0,0 +1,144 @@
+# backend/utils/meshy_dedup.py
+
+import os
+import json
+import asyncio
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from azure.core import MatchConditions
+from azure.core.exceptions import (
+    ResourceExistsError,
+    ResourceModifiedError,
+    ResourceNotFoundError,
+    ResourceNotModifiedError,
+)
+from azure.storage.blob import ContainerClient, ContentSettings
+
+from utils.image_preprocess import hamming_distance
+
+logger = logging.getLogger(__name__)
+
+# One index blob per profile; kept apart from meshy_tasks/, which the tracker scans
+MESHY_INDEX_PREFIX = "meshy_index/"
+# dHash bits that may differ for two uploads to count as the same photo
+MESHY_DHASH_MAX_DISTANCE = int(os.getenv("MESHY_DHASH_MAX_DISTANCE", "5"))
+# Newest submissions kept per profile; older photos are simply generated afresh
+MESHY_INDEX_MAX_ENTRIES = int(os.getenv("MESHY_INDEX_MAX_ENTRIES", "500"))
+MESHY_INDEX_WRITE_RETRIES = 5
+
+
+def index_blob_name(profile_id: Optional[str]) -> str:
+    return f"{MESHY_INDEX_PREFIX}{profile_id or '_anonymous'}.json"
+
+
+class MeshyImageIndex:
+    """
+    Maps submitted images to the Meshy task generated from them, so uploading the
+    same photo again reuses that task instead of paying for a new one.
+
+    Exact matches go by sha256 of the uploaded bytes; re-encoded or resized copies
+    are matched by perceptual hash (dHash) within MESHY_DHASH_MAX_DISTANCE bits.
+    Each profile has its own index blob, so one user never receives another user's
+    model and a lookup only scans that profile's (bounded) entries. Reads are
+    conditional on the cached ETag; writes are guarded by it and re-applied on a
+    fresh copy when another worker got there first.
+    """
+
+    def __init__(self, container_client: ContainerClient):
+        self.container_client = container_client
+        self._cache: Dict[str, Tuple[List[Dict], Optional[str]]] = {}
+        self._lock = threading.Lock()
+
+    # ----------------- Storage -----------------
+    def _read(self, profile_id: Optional[str]) -> Tuple[List[Dict], Optional[str]]:
+        """(entries, etag); etag is None when the profile has no index yet."""
+        blob_name = index_blob_name(profile_id)
+        blob_client = self.container_client.get_blob_client(blob_name)
+        with self._lock:
+            cached = self._cache.get(blob_name)
+        try:
+            if cached and cached[1]:
+                downloader = blob_client.download_blob(etag=cached[1], match_condition=MatchConditions.IfModified)
+            else:
+                downloader = blob_client.download_blob()
+            data = downloader.readall()
+            etag = downloader.properties.etag
+        except ResourceNotModifiedError:
+            return cached
+        except ResourceNotFoundError:
+            entries, etag = [], None
+        else:
+            try:
+                entries = json.loads(data).get("entries", [])
+            except (json.JSONDecodeError, AttributeError):
+                logger.warning(f"[MeshyIndex] {blob_name} is corrupt; starting empty")
+                entries = []
+        with self._lock:
+            self._cache[blob_name] = (entries, etag)
+        return entries, etag
+
+    def _write(self, profile_id: Optional[str], entries: List[Dict], etag: Optional[str]):
+        """Uploads the index if the blob still has `etag` (or doesn't exist yet when etag is None)."""
+        blob_name = index_blob_name(profile_id)
+        kwargs = {"etag": etag, "match_condition": MatchConditions.IfNotModified} if etag else {}
+        result = self.container_client.get_blob_client(blob_name).upload_blob(
+            json.dumps({"entries": entries}),
+            overwrite=etag is not None,
+            content_settings=ContentSettings(content_type="application/json"),
+            **kwargs,
+        )
+        with self._lock:
+            self._cache[blob_name] = (entries, result["etag"])
+
+    def _modify(self, profile_id: Optional[str], change: Callable[[List[Dict]], Optional[List[Dict]]]):
+        """Applies `change` to the latest entries; None from `change` means nothing to write."""
+        for _ in range(MESHY_INDEX_WRITE_RETRIES):
+            entries, etag = self._read(profile_id)
+            updated = change(list(entries))
+            if updated is None:
+                return
+            try:
+                self._write(profile_id, updated, etag)
+                return
+            except (ResourceModifiedError, ResourceExistsError):
+                logger.info(f"[MeshyIndex] {index_blob_name(profile_id)} changed during write; retrying")
+        logger.warning(f"[MeshyIndex] Gave up updating {index_blob_name(profile_id)} after {MESHY_INDEX_WRITE_RETRIES} attempts")
+
+    # ----------------- Public API -----------------
+    def _find(self, profile_id: Optional[str], image_hash: str, phash: Optional[str]) -> Optional[str]:
+        entries, _ = self._read(profile_id)
+        best = None
+        for entry in entries:
+            if entry["sha256"] == image_hash:
+                return entry["task_id"]
+            if not phash or not entry.get("phash"):
+                continue
+            distance = hamming_distance(phash, entry["phash"])
+            if distance <= MESHY_DHASH_MAX_DISTANCE and (best is None or distance < best[0]):
+                best = (distance, entry["task_id"])
+        if best:
+            logger.info(f"[MeshyIndex] Perceptual match {best[1]} ({best[0]} bits apart)")
+            return best[1]
+        return None
+
+    async def find(self, profile_id: Optional[str], image_hash: str, phash: Optional[str]) -> Optional[str]:
+        """Task id for this image (exact, else nearest perceptual match), or None."""
+        return await asyncio.to_thread(self._find, profile_id, image_hash, phash)
+
+    async def add(self, profile_id: Optional[str], image_hash: str, phash: Optional[str], task_id: str):
+        def change(entries: List[Dict]) -> List[Dict]:
+            entries = [e for e in entries if e["sha256"] != image_hash]
+            entries.append({"sha256": image_hash, "phash": phash, "task_id": task_id})
+            return entries[-MESHY_INDEX_MAX_ENTRIES:]
+
+        await asyncio.to_thread(self._modify, profile_id, change)
+
+    async def forget(self, profile_id: Optional[str], task_id: str):
+        """Drops a task (e.g. one that failed) so its image is generated afresh next time."""
+        def change(entries: List[Dict]) -> Optional[List[Dict]]:
+            kept = [e for e in entries if e["task_id"] != task_id]
+            return kept if len(kept) != len(entries) else None
+
+        await asyncio.to_thread(self._modify, profile_id, change)
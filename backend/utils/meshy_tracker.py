@@ -0,0 +1,353 @@
+# backend/utils/meshy_tracker.py
+
+import os
+import json
+import time
+import asyncio
+import logging
+import datetime
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+
+from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
+from azure.storage.blob import ContainerClient, ContentSettings
+
+logger = logging.getLogger(__name__)
+
+MESHY_POLL_MIN_SECONDS = float(os.getenv("MESHY_POLL_MIN_SECONDS", "2"))
+MESHY_POLL_MAX_SECONDS = float(os.getenv("MESHY_POLL_MAX_SECONDS", "30"))
+MESHY_POLL_BACKOFF = 1.6
+MESHY_MAX_CONCURRENT_POLLS = int(os.getenv("MESHY_MAX_CONCURRENT_POLLS", "4"))
+# Tasks still unfinished after this long are marked failed and no longer polled
+MESHY_TRACK_TIMEOUT_SECONDS = int(os.getenv("MESHY_TRACK_TIMEOUT_SECONDS", "3600"))
+MESHY_TASK_PREFIX = "meshy_tasks/"
+# Finished records kept in memory; older ones are re-read from blob on demand
+MESHY_FINISHED_IN_MEMORY = 1000
+
+TERMINAL_STATUSES = {"completed", "failed"}
+# Meshy reports upper-case statuses (and older responses used "completed"/"failed")
+_STATUS_MAP = {
+    "succeeded": "completed",
+    "completed": "completed",
+    "failed": "failed",
+    "expired": "failed",
+    "canceled": "failed",
+    "pending": "pending",
+    "in_progress": "in_progress",
+}
+
+
+class UpstreamRetry(Exception):
+    """Raised by the fetch function for transient upstream errors (429/5xx); the task is polled again later."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TaskNotFoundError(Exception):
+    """Raised by the fetch function when Meshy doesn't know the task id."""
+
+
+def _now() -> str:
+    return datetime.datetime.utcnow().isoformat() + "Z"
+
+
+def normalize_task(task_id: str, data: Dict) -> Dict:
+    """Maps a Meshy task response onto the record the status endpoint returns."""
+    status = _STATUS_MAP.get(str(data.get("status", "")).lower(), "in_progress")
+    result = data.get("result") or {}
+    record = {"task_id": task_id, "status": status, "progress": data.get("progress")}
+    if status == "completed":
+        record["model_url"] = (data.get("model_urls") or {}).get("glb") or result.get("glb_url")
+        record["preview"] = data.get("thumbnail_url") or result.get("thumbnail_url")
+        record["progress"] = 100
+    elif status == "failed":
+        error = data.get("task_error") or {}
+        record["error"] = error.get("message") or "Meshy generation failed"
+    return record
+
+
+class MeshyTaskTracker:
+    """
+    Polls Meshy for every in-flight task from one background loop, so clients don't
+    have to. Each task has its own interval: it drops back to the minimum whenever
+    progress moves and grows by MESHY_POLL_BACKOFF while it doesn't (or as long as
+    Meshy asks via Retry-After).
+
+    With an `on_complete` hook, a task Meshy reports as done is "processing" until
+    the hook (e.g. mirroring the model) has finished, then "completed".
+
+    Status changes are persisted to blob (`meshy_tasks/{task_id}.json`) and pushed
+    to `subscribe` listeners. Finished tasks are served from memory or blob and
+    never polled again.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str], Awaitable[Dict]],
+        container_client: ContainerClient,
+        on_complete: Optional[Callable[[Dict], Awaitable[Optional[Dict]]]] = None,
+    ):
+        self.fetch = fetch
+        self.container_client = container_client
+        self.on_complete = on_complete
+        self._records: Dict[str, Dict] = {}
+        self._schedule: Dict[str, Dict] = {}
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._finishing: Dict[str, asyncio.Task] = {}
+        self._saving: Set[asyncio.Task] = set()
+        self._poll_slots = asyncio.Semaphore(MESHY_MAX_CONCURRENT_POLLS)
+
+    # ----------------- Lifecycle -----------------
+    def _ensure_started(self):
+        if self._task is not None and not self._task.done():
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def resume(self):
+        """Picks up tasks that were still in flight when the server last stopped."""
+        def list_active():
+            return [
+                blob.name[len(MESHY_TASK_PREFIX):-len(".json")]
+                for blob in self.container_client.list_blobs(name_starts_with=MESHY_TASK_PREFIX, include=["metadata"])
+                if blob.name.endswith(".json") and (blob.metadata or {}).get("status") not in TERMINAL_STATUSES
+            ]
+
+        try:
+            task_ids = await asyncio.to_thread(list_active)
+        except Exception as e:
+            logger.warning(f"[MeshyTracker] Could not list tracked tasks: {e}")
+            return
+        for task_id in task_ids:
+            record = await asyncio.to_thread(self._load, task_id)
+            if record and record.get("status") not in TERMINAL_STATUSES:
+                self.track(task_id, record)
+        if task_ids:
+            logger.info(f"[MeshyTracker] Resumed {len(task_ids)} in-flight task(s)")
+
+    async def stop(self):
+        # Let pending record saves land before shutting down
+        await asyncio.gather(*self._saving, return_exceptions=True)
+        tasks = list(self._finishing.values())
+        if self._task is not None:
+            tasks.append(self._task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+
+    # ----------------- Public API -----------------
+    def track(self, task_id: str, record: Optional[Dict] = None, persist: bool = True, **extra) -> Dict:
+        """
+        Starts polling a task (no-op if it is already tracked or finished). A new
+        record is saved right away (in the background) unless `persist` is False,
+        so `resume` finds the task even if the server stops before its first change.
+        """
+        if task_id in self._records:
+            return self._records[task_id]
+        is_new = record is None
+        record = record or {"task_id": task_id, "status": "pending", "progress": 0, "created_at": _now()}
+        record.update(extra)
+        record.setdefault("updated_at", record.get("created_at", _now()))
+        self._records[task_id] = record
+        if is_new and persist:
+            # Create-only, so it can never overwrite a later status change
+            save = asyncio.create_task(self._persist(task_id, dict(record), overwrite=False))
+            self._saving.add(save)
+            save.add_done_callback(self._saving.discard)
+        if record["status"] not in TERMINAL_STATUSES:
+            self._schedule[task_id] = {
+                "interval": MESHY_POLL_MIN_SECONDS,
+                "next_poll": time.monotonic(),
+                "deadline": time.monotonic() + MESHY_TRACK_TIMEOUT_SECONDS,
+            }
+            self._ensure_started()
+            self._wakeup.set()
+        return record
+
+    async def get(self, task_id: str) -> Optional[Dict]:
+        """
+        Current record for a task. Unknown ids are looked up in blob and, failing
+        that, fetched from Meshy once and tracked from then on. Returns None if
+        Meshy doesn't know the id; if Meshy can't answer (UpstreamRetry or another
+        error), the id is not tracked and the error is raised.
+        """
+        record = self._records.get(task_id)
+        if record is not None:
+            return record
+        record = await asyncio.to_thread(self._load, task_id)
+        if record is not None:
+            return self.track(task_id, record)
+        self.track(task_id, persist=False)
+        # Poll here rather than from the loop, so the caller gets a real status
+        self._schedule[task_id]["next_poll"] = time.monotonic() + MESHY_POLL_MIN_SECONDS
+        await self._poll(task_id, probe=True)
+        return self._records.get(task_id)
+
+    async def subscribe(self, task_id: str) -> AsyncIterator[Dict]:
+        """Yields the task's record now and after every change, ending once it is finished."""
+        record = await self.get(task_id)
+        if record is None:
+            return
+        updates: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(task_id, []).append(updates)
+        try:
+            yield record
+            while record["status"] not in TERMINAL_STATUSES:
+                record = await updates.get()
+                yield record
+        finally:
+            listeners = self._subscribers.get(task_id, [])
+            listeners.remove(updates)
+            if not listeners:
+                self._subscribers.pop(task_id, None)
+
+    def stats(self) -> Dict:
+        return {
+            "tracked": len(self._records),
+            "polling": len(self._schedule),
+            "subscribers": sum(len(q) for q in self._subscribers.values()),
+        }
+
+    # ----------------- Persistence -----------------
+    def _blob_name(self, task_id: str) -> str:
+        return f"{MESHY_TASK_PREFIX}{task_id}.json"
+
+    def _load(self, task_id: str) -> Optional[Dict]:
+        try:
+            data = self.container_client.get_blob_client(self._blob_name(task_id)).download_blob().readall()
+        except ResourceNotFoundError:
+            return None
+        try:
+            record = json.loads(data)
+        except json.JSONDecodeError:
+            return None
+        # Anything else stored under the prefix is not a task record
+        if not isinstance(record, dict) or "status" not in record:
+            return None
+        return record
+
+    def _save(self, record: Dict, overwrite: bool = True):
+        self.container_client.get_blob_client(self._blob_name(record["task_id"])).upload_blob(
+            json.dumps(record, ensure_ascii=False),
+            overwrite=overwrite,
+            metadata={"status": record["status"]},
+            content_settings=ContentSettings(content_type="application/json"),
+        )
+
+    # ----------------- Polling -----------------
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            now = time.monotonic()
+            due = [task_id for task_id, s in self._schedule.items() if s["next_poll"] <= now]
+            if due:
+                await asyncio.gather(*(self._poll(task_id) for task_id in due))
+                continue
+            if self._schedule:
+                delay = min(s["next_poll"] for s in self._schedule.values()) - now
+            else:
+                delay = None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _poll(self, task_id: str, probe: bool = False):
+        """
+        One status call. With `probe` (first look at an id from `get`), only a real
+        status keeps the id tracked: upstream errors untrack it and are raised.
+        """
+        schedule = self._schedule.get(task_id)
+        if schedule is None:
+            return
+        previous = self._records[task_id]
+        try:
+            async with self._poll_slots:
+                data = await self.fetch(task_id)
+        except UpstreamRetry as e:
+            if probe:
+                self._untrack(task_id)
+                raise
+            schedule["interval"] = min(schedule["interval"] * MESHY_POLL_BACKOFF, MESHY_POLL_MAX_SECONDS)
+            schedule["next_poll"] = time.monotonic() + max(schedule["interval"], e.retry_after or 0)
+            logger.info(f"[MeshyTracker] {task_id}: {e}; retrying in {schedule['next_poll'] - time.monotonic():.0f}s")
+            return
+        except TaskNotFoundError:
+            self._untrack(task_id)
+            for updates in self._subscribers.get(task_id, []):
+                updates.put_nowait({**previous, "status": "failed", "error": "Task not found"})
+            return
+        except Exception as e:
+            if probe:
+                self._untrack(task_id)
+                raise
+            # Unknown task, bad key, ...: retrying won't help
+            await self._update(task_id, {**previous, "status": "failed", "error": str(e)})
+            return
+
+        record = {**previous, **normalize_task(task_id, data)}
+        if record["status"] not in TERMINAL_STATUSES and time.monotonic() > schedule["deadline"]:
+            record.update(status="failed", error="Timed out waiting for Meshy")
+
+        if record["status"] == "completed" and self.on_complete is not None:
+            # Post-processing can take minutes; run it outside the poll loop
+            record["status"] = "processing"
+            self._schedule.pop(task_id, None)
+            self._finishing[task_id] = asyncio.create_task(self._finish(task_id))
+            await self._update(task_id, record)
+            return
+
+        if record.get("progress") != previous.get("progress"):
+            schedule["interval"] = MESHY_POLL_MIN_SECONDS
+        else:
+            schedule["interval"] = min(schedule["interval"] * MESHY_POLL_BACKOFF, MESHY_POLL_MAX_SECONDS)
+        schedule["next_poll"] = time.monotonic() + schedule["interval"]
+
+        status_changed = record["status"] != previous["status"]
+        if probe or status_changed or record.get("progress") != previous.get("progress"):
+            # A probed id is confirmed real now, so save its first record
+            await self._update(task_id, record, persist=probe or status_changed)
+
+    def _untrack(self, task_id: str):
+        self._schedule.pop(task_id, None)
+        self._records.pop(task_id, None)
+
+    async def _finish(self, task_id: str):
+        record = dict(self._records[task_id])
+        try:
+            record.update(await self.on_complete(record) or {})
+        except Exception as e:
+            logger.warning(f"[MeshyTracker] Post-processing {task_id} failed: {e}")
+        finally:
+            self._finishing.pop(task_id, None)
+        record["status"] = "completed"
+        await self._update(task_id, record)
+
+    async def _update(self, task_id: str, record: Dict, persist: bool = True):
+        record["updated_at"] = _now()
+        self._records[task_id] = record
+        if record["status"] in TERMINAL_STATUSES:
+            self._schedule.pop(task_id, None)
+            self._evict_finished()
+        if persist:
+            await self._persist(task_id, record)
+        for updates in self._subscribers.get(task_id, []):
+            updates.put_nowait(record)
+
+    async def _persist(self, task_id: str, record: Dict, overwrite: bool = True):
+        try:
+            await asyncio.to_thread(self._save, record, overwrite)
+        except ResourceExistsError:
+            pass
+        except Exception as e:
+            logger.warning(f"[MeshyTracker] Persisting {task_id} failed: {e}")
+
+    def _evict_finished(self):
+        finished = [task_id for task_id, r in self._records.items() if r["status"] in TERMINAL_STATUSES]
+        for task_id in finished[:max(0, len(finished) - MESHY_FINISHED_IN_MEMORY)]:
+            if task_id not in self._subscribers:
+                del self._records[task_id]
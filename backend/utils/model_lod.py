@@ -0,0 +1,118 @@
+# backend/utils/model_lod.py
+
+import io
+import os
+import copy
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+try:
+    import trimesh
+    from trimesh.visual import TextureVisuals
+except ImportError:  # optional: without it models are mirrored but get no LOD variants
+    trimesh = None
+
+logger = logging.getLogger(__name__)
+
+# name -> (fraction of faces kept, longest texture side); lod0 is the original model
+MODEL_LODS = {"lod1": (0.25, 1024), "lod2": (0.06, 512)}
+MIN_FACES = 500
+MODEL_LOD_WORKERS = int(os.getenv("MODEL_LOD_WORKERS", "1"))
+TEXTURE_ATTRIBUTES = (
+    "baseColorTexture", "normalTexture", "metallicRoughnessTexture", "emissiveTexture", "occlusionTexture", "image",
+)
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=MODEL_LOD_WORKERS)
+    return _executor
+
+
+def shutdown_model_workers():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _downscale_material(material, max_side: int):
+    material = copy.copy(material)
+    for attribute in TEXTURE_ATTRIBUTES:
+        image = getattr(material, attribute, None)
+        if image is not None and hasattr(image, "thumbnail") and max(image.size) > max_side:
+            image = image.copy()
+            image.thumbnail((max_side, max_side))
+            setattr(material, attribute, image)
+    return material
+
+
+def _simplify(mesh, ratio: float, max_texture_side: int):
+    target = max(MIN_FACES, int(len(mesh.faces) * ratio))
+    visual = mesh.visual if isinstance(mesh.visual, TextureVisuals) else None
+    simplified = mesh
+    if len(mesh.faces) > target:
+        try:
+            simplified = mesh.simplify_quadric_decimation(face_count=target)
+        except Exception as e:
+            logger.warning(f"[ModelLOD] Decimation failed, keeping full geometry: {e}")
+    if visual is None or visual.material is None:
+        return simplified
+    uv = visual.uv
+    if uv is not None and simplified is not mesh:
+        # Decimation drops UVs; take each new vertex's UV from the nearest original vertex
+        _, nearest = mesh.kdtree.query(simplified.vertices)
+        uv = uv[nearest]
+    simplified.visual = TextureVisuals(uv=uv, material=_downscale_material(visual.material, max_texture_side))
+    return simplified
+
+
+def _build_lods(glb: bytes, lods: Dict[str, tuple]) -> Dict[str, dict]:
+    """Runs in a worker process: loads the GLB once and exports one decimated copy per level."""
+    scene = trimesh.load(io.BytesIO(glb), file_type="glb", force="scene")
+    variants = {}
+    for name, (ratio, max_texture_side) in lods.items():
+        lod = scene.copy()
+        for geometry_name, mesh in list(lod.geometry.items()):
+            lod.geometry[geometry_name] = _simplify(mesh, ratio, max_texture_side)
+        variants[name] = {
+            "data": lod.export(file_type="glb"),
+            "faces": sum(len(m.faces) for m in lod.geometry.values()),
+        }
+    return variants
+
+
+async def generate_lods(glb: bytes, lods: Optional[Dict[str, tuple]] = None) -> Dict[str, dict]:
+    """
+    Decimated, texture-downscaled variants of a GLB model in the process pool.
+    Returns {name: {"data", "faces"}}; empty when trimesh isn't installed.
+    """
+    if trimesh is None:
+        logger.info("[ModelLOD] trimesh not installed; skipping LOD generation")
+        return {}
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), _build_lods, glb, lods or MODEL_LODS)
+
+
+def vr_model_item(entry: Dict) -> Dict:
+    """
+    VR room item for a mirrored 3D model, with blob paths (signed when the room is served).
+    `lods` is ordered smallest first, so a headset can show the coarsest level at
+    once and swap in detail as it streams.
+    """
+    lods: List[Dict] = sorted(entry.get("lods") or [], key=lambda lod: lod.get("bytes") or 0)
+    return {
+        "id": entry["memory_id"],
+        "type": "model",
+        "path": entry["file_path"],
+        "title": entry.get("title") or entry["memory_id"],
+        "lods": [dict(lod) for lod in lods],
+        "position": None,
+        "rotation": None,
+        "scale": None,
+    }
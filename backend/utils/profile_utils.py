@@ -3,6 +3,7 @@ import json
 from azure.core.exceptions import ResourceExistsError
 from azure.storage.blob import BlobServiceClient
 from config.blob_config import blob_service_client, container_name, container_client
+from utils.voice_context import invalidate_voice_context
 
 def get_profile_info(profile_id: str):
     """
@@ -65,6 +66,7 @@ def create_profile_in_storage(profile_id: str,
 
         user_facts_blob = cont_client.get_blob_client(f"profiles/{profile_id}/user_facts.json")
         user_facts_blob.upload_blob(io.BytesIO(json.dumps(user_facts, indent=2).encode("utf-8")), overwrite=True)
+        invalidate_voice_context(profile_id)
 
         return {"message": f"Profile '{name}' created successfully ✅"}
 
@@ -114,10 +116,12 @@ def delete_profile_and_data(profile_id: str):
         # Delete persona & user facts
         for meta in [
             f"profiles/{profile_id}/profile.json",
-            f"profiles/{profile_id}/user_facts.json"
+            f"profiles/{profile_id}/user_facts.json",
+            f"profiles/{profile_id}/memory_manifest.json",
         ]:
             if cont_client.get_blob_client(meta).exists():
                 cont_client.delete_blob(meta)
+        invalidate_voice_context(profile_id)
 
         return {"message": f"Profile '{profile_id}' and all data deleted ✅"}
 
@@ -153,6 +157,7 @@ def save_user_fact(profile_id: str, key: str, value: str):
     try:
         facts_json = json.dumps(facts, indent=2).encode("utf-8")
         blob_client.upload_blob(io.BytesIO(facts_json), overwrite=True)
+        invalidate_voice_context(profile_id)
         print(f"[save_user_fact] Saved fact '{key}': '{value}' for {profile_id}")
     except Exception as e:
         print(f"[save_user_fact] Error: {e}")
@@ -0,0 +1,145 @@
+# backend/utils/renditions.py
+
+import os
+import json
+import shutil
+import asyncio
+import logging
+import tempfile
+from typing import Dict, Optional
+
+from azure.storage.blob import ContainerClient, ContentSettings
+
+from utils.image_preprocess import OUTPUT_FORMATS, render_variants
+from utils.memory_manifest import add_to_memory_manifest
+
+logger = logging.getLogger(__name__)
+
+# Longest side in pixels per rendition
+IMAGE_RENDITIONS = {"thumb": 320, "medium": 1280, "full": 2560}
+VIDEO_POSTER_RENDITIONS = {"thumb": 320, "poster": 1280}
+RENDITION_MAX_BYTES = {"thumb": 48 * 1024, "medium": 400 * 1024, "poster": 400 * 1024, "full": 2 * 1024 * 1024}
+# Longest side VR frames are rendered at
+VR_DISPLAY_SIZE = 1280
+RENDITION_FORMAT = os.getenv("RENDITION_FORMAT", "webp")
+POSTER_OFFSET_SECONDS = os.getenv("RENDITION_POSTER_OFFSET_SECONDS", "1")
+FFMPEG_TIMEOUT_SECONDS = 60
+
+
+def rendition_blob_name(file_path: str, name: str, extension: str) -> str:
+    """Renditions sit next to the original: profiles/p/image/mem_1.jpg -> profiles/p/image/mem_1_thumb.webp"""
+    base, _ = os.path.splitext(file_path)
+    return f"{base}_{name}.{extension}"
+
+
+async def extract_video_poster(video: bytes, extension: str) -> Optional[bytes]:
+    """Grabs one frame as PNG with ffmpeg; returns None when ffmpeg is missing or fails."""
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        logger.info("[Renditions] ffmpeg not found; skipping video poster")
+        return None
+
+    fd, path = tempfile.mkstemp(suffix=f".{extension}")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(video)
+        for offset in (POSTER_OFFSET_SECONDS, "0"):
+            # Very short clips have no frame at the offset; fall back to the first frame
+            process = await asyncio.create_subprocess_exec(
+                ffmpeg, "-v", "error", "-ss", offset, "-i", path,
+                "-frames:v", "1", "-f", "image2pipe", "-vcodec", "png", "-",
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(), FFMPEG_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                process.kill()
+                logger.warning("[Renditions] ffmpeg timed out extracting a poster")
+                return None
+            if process.returncode == 0 and stdout:
+                return stdout
+        logger.warning(f"[Renditions] ffmpeg could not extract a poster: {stderr.decode(errors='ignore')[:200]}")
+        return None
+    finally:
+        os.remove(path)
+
+
+async def generate_renditions(
+    profile_id: str,
+    metadata: Dict,
+    content: bytes,
+    container_client: ContainerClient,
+) -> Optional[Dict]:
+    """
+    Background step after an upload: builds the image renditions (or video posters),
+    uploads them next to the original and records them in the memory's metadata and
+    the profile manifest. Returns the renditions, or None if nothing was generated.
+    """
+    file_type = metadata.get("file_type")
+    file_path = metadata["file_path"]
+    if file_type == "image":
+        source, specs = content, IMAGE_RENDITIONS
+    elif file_type == "video":
+        source = await extract_video_poster(content, os.path.splitext(file_path)[1].lstrip(".") or "mp4")
+        specs = VIDEO_POSTER_RENDITIONS
+    else:
+        return None
+    if not source:
+        return None
+
+    try:
+        variants = await render_variants(source, specs, RENDITION_FORMAT, RENDITION_MAX_BYTES)
+    except ValueError as e:
+        logger.warning(f"[Renditions] Skipping {metadata.get('memory_id')}: {e}")
+        return None
+
+    fmt = OUTPUT_FORMATS[RENDITION_FORMAT]
+    renditions = {}
+    for name, variant in variants.items():
+        blob_name = rendition_blob_name(file_path, name, fmt["extension"])
+        await asyncio.to_thread(
+            container_client.get_blob_client(blob_name).upload_blob,
+            variant["data"],
+            overwrite=True,
+            content_settings=ContentSettings(content_type=fmt["media_type"], cache_control="public, max-age=31536000"),
+        )
+        renditions[name] = {
+            "path": blob_name,
+            "width": variant["width"],
+            "height": variant["height"],
+            "bytes": len(variant["data"]),
+            "media_type": fmt["media_type"],
+        }
+
+    updated = {**metadata, "renditions": renditions}
+    metadata_blob = f"profiles/{profile_id}/metadata/{metadata['memory_id']}.json"
+    await asyncio.to_thread(
+        container_client.get_blob_client(metadata_blob).upload_blob,
+        json.dumps(updated, indent=2).encode("utf-8"),
+        overwrite=True,
+    )
+    await asyncio.to_thread(add_to_memory_manifest, profile_id, updated, container_client)
+    logger.info(f"[Renditions] {metadata['memory_id']}: {', '.join(renditions)}")
+    return renditions
+
+
+def pick_rendition_info(memory: Dict, max_side: int) -> Optional[Dict]:
+    """
+    The smallest rendition whose longest side is at least `max_side` (or the largest
+    one if none is that big), with its path, size and dimensions. None if the memory has no renditions.
+    """
+    renditions = memory.get("renditions") or {}
+    if not renditions:
+        return None
+    ordered = sorted(renditions.values(), key=lambda r: max(r["width"], r["height"]))
+    for rendition in ordered:
+        if max(rendition["width"], rendition["height"]) >= max_side:
+            return rendition
+    return ordered[-1]
+
+
+def pick_rendition(memory: Dict, max_side: int) -> Optional[str]:
+    """Blob path of the rendition `pick_rendition_info` chooses, or None."""
+    rendition = pick_rendition_info(memory, max_side)
+    return rendition["path"] if rendition else None
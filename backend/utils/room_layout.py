@@ -0,0 +1,174 @@
+# backend/utils/room_layout.py
+
+import math
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from utils.room_store import assign_slots
+
+LAYOUT_STYLES = ("gallery", "spiral")
+DEFAULT_LAYOUT_STYLE = "gallery"
+
+# Metres; the headset spawns at the origin looking down -z
+SPAWN_POINT = (0.0, 0.0, 0.0)
+EYE_HEIGHT = 1.6
+FRAME_MAX_WIDTH = 1.4
+FRAME_MAX_HEIGHT = 1.2
+SMALL_ITEM_SIZE = 0.6
+# Gallery: rings of four walls, the first at GALLERY_FIRST_WALL m from spawn
+GALLERY_FIRST_WALL = 3.0
+GALLERY_RING_STEP = 2.0
+GALLERY_SLOT_WIDTH = 1.8
+# Spiral: golden-angle spacing keeps neighbours apart at any count
+SPIRAL_START_RADIUS = 2.0
+SPIRAL_GROWTH = 0.8
+GOLDEN_ANGLE = math.pi * (3 - math.sqrt(5))
+
+# Load priority: metres of distance one MB of download is worth, and the penalty
+# (in metres) for an item directly behind the spawn direction
+PRIORITY_METRES_PER_MB = 1.5
+PRIORITY_BEHIND_PENALTY = 6.0
+# Assumed download size when an item doesn't record one
+DEFAULT_ITEM_BYTES = {"image": 2_000_000, "video": 20_000_000, "audio": 3_000_000, "text": 100_000, "model": 10_000_000}
+
+LAYOUT_CACHE_SIZE = 256
+
+_cache: "OrderedDict[Tuple, Dict]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def _frame_scale(item: Dict) -> List[float]:
+    if item.get("type") == "model":
+        return [1.0, 1.0, 1.0]
+    if item.get("type") not in ("image", "video"):
+        return [SMALL_ITEM_SIZE, SMALL_ITEM_SIZE, 1.0]
+    aspect = (item.get("width") or 4) / (item.get("height") or 3)
+    width = min(FRAME_MAX_WIDTH, FRAME_MAX_HEIGHT * aspect)
+    return [round(width, 3), round(width / aspect, 3), 1.0]
+
+
+def _facing_spawn(x: float, z: float) -> List[float]:
+    """Yaw (degrees) that turns an item at (x, z) to face the spawn point."""
+    return [0.0, round(math.degrees(math.atan2(-x, -z)) % 360, 2), 0.0]
+
+
+def _gallery_slot(index: int) -> Tuple[float, float]:
+    """
+    Centre of the index-th wall slot: the front wall first, then the side walls,
+    then the back wall, ring after ring. Slots only depend on the index, so adding
+    items never moves the ones already placed.
+    """
+    ring = 0
+    while True:
+        half = GALLERY_FIRST_WALL + ring * GALLERY_RING_STEP
+        per_wall = max(1, int((2 * half - 1) // GALLERY_SLOT_WIDTH))
+        if index < 4 * per_wall:
+            break
+        index -= 4 * per_wall
+        ring += 1
+    wall, slot = divmod(index, per_wall)
+    # Alternate outwards from the wall's centre so small rooms stay balanced
+    if per_wall % 2:
+        offset = ((slot + 1) // 2) * GALLERY_SLOT_WIDTH * (1 if slot % 2 else -1)
+    else:
+        offset = (slot // 2 + 0.5) * GALLERY_SLOT_WIDTH * (-1 if slot % 2 else 1)
+    return {
+        0: (offset, -half),   # front
+        1: (half, offset),    # right
+        2: (-half, offset),   # left
+        3: (offset, half),    # back
+    }[wall]
+
+
+def _spiral_slot(index: int) -> Tuple[float, float]:
+    radius = SPIRAL_START_RADIUS + SPIRAL_GROWTH * math.sqrt(index)
+    # Start straight ahead of the spawn point
+    angle = index * GOLDEN_ANGLE
+    return radius * math.sin(angle), -radius * math.cos(angle)
+
+
+def _place(item: Dict, index: int, style: str) -> Dict:
+    x, z = _gallery_slot(index) if style == "gallery" else _spiral_slot(index)
+    if item.get("type") == "model":
+        # Models stand on the floor, a step in from the wall
+        length = math.hypot(x, z) or 1.0
+        x, z, y = x * (length - 1.0) / length, z * (length - 1.0) / length, 0.0
+    else:
+        y = EYE_HEIGHT
+    return {
+        "position": [round(x, 3), y, round(z, 3)],
+        "rotation": _facing_spawn(x, z),
+        "scale": _frame_scale(item),
+    }
+
+
+def _item_bytes(item: Dict) -> int:
+    if item.get("lods"):
+        # Headsets start with the smallest level of detail
+        return min(lod.get("bytes") or 0 for lod in item["lods"]) or DEFAULT_ITEM_BYTES["model"]
+    return item.get("bytes") or DEFAULT_ITEM_BYTES.get(item.get("type"), DEFAULT_ITEM_BYTES["image"])
+
+
+def _priority_score(position: List[float], size: int) -> float:
+    dx, dz = position[0] - SPAWN_POINT[0], position[2] - SPAWN_POINT[2]
+    distance = math.hypot(dx, dz)
+    # 0 straight ahead (-z), 1 directly behind
+    off_axis = math.acos(max(-1.0, min(1.0, -dz / distance))) / math.pi if distance else 0.0
+    return distance + PRIORITY_BEHIND_PENALTY * off_axis + PRIORITY_METRES_PER_MB * size / 1_000_000
+
+
+def compute_layout(items: List[Dict], style: str = DEFAULT_LAYOUT_STYLE) -> Dict:
+    """
+    Deterministic placement for a room's items: {"style", "transforms": {id: {position,
+    rotation, scale}}, "load_order": [ids]}. Items that already carry a position
+    (moved by hand) keep their transform; the others go to the `slot` they were
+    given when added to the room, so moving or removing an item never shifts the
+    rest. `load_order` puts what is close to and in front of the spawn point, and
+    cheap to download, first.
+    """
+    if style not in LAYOUT_STYLES:
+        raise ValueError(f"Unknown layout style {style!r}; expected one of {', '.join(LAYOUT_STYLES)}")
+    # Rooms saved before slots were stored: number their items in order
+    items = assign_slots(items)
+    transforms = {}
+    for item in items:
+        if item.get("position") is not None:
+            transforms[item["id"]] = {
+                "position": item["position"],
+                "rotation": item.get("rotation") or [0.0, 0.0, 0.0],
+                "scale": item.get("scale") or _frame_scale(item),
+            }
+            continue
+        transforms[item["id"]] = _place(item, item["slot"], style)
+
+    scores = {item["id"]: _priority_score(transforms[item["id"]]["position"], _item_bytes(item)) for item in items}
+    return {
+        "style": style,
+        "transforms": transforms,
+        "load_order": sorted(scores, key=lambda item_id: (scores[item_id], item_id)),
+    }
+
+
+def room_layout(room: Dict, style: Optional[str] = None) -> Dict:
+    """`compute_layout` for a stored room, cached per room version and style."""
+    style = style or room.get("layout_style") or DEFAULT_LAYOUT_STYLE
+    key = (room["profile_id"], room["room_id"], room["version"], style)
+    with _lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+            return cached
+    layout = compute_layout(room["items"], style)
+    with _lock:
+        _cache[key] = layout
+        while len(_cache) > LAYOUT_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return layout
+
+
+def apply_layout(items: List[Dict], layout: Dict) -> List[Dict]:
+    """Items with their transforms and `load_priority` (0 loads first) filled in, in load order."""
+    rank = {item_id: i for i, item_id in enumerate(layout["load_order"])}
+    placed = [{**item, **layout["transforms"][item["id"]], "load_priority": rank[item["id"]]} for item in items]
+    return sorted(placed, key=lambda item: item["load_priority"])
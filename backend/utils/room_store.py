@@ -0,0 +1,258 @@
+# backend/utils/room_store.py
+
+import json
+import uuid
+import logging
+import datetime
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from azure.core import MatchConditions
+from azure.core.exceptions import (
+    ResourceModifiedError,
+    ResourceNotFoundError,
+    ResourceNotModifiedError,
+)
+from azure.storage.blob import ContainerClient, ContentSettings
+
+logger = logging.getLogger(__name__)
+
+# Changes kept per room for delta fetches; older clients get the full room
+ROOM_HISTORY_LIMIT = 500
+ROOM_WRITE_RETRIES = 5
+ITEM_TRANSFORM_FIELDS = ("position", "rotation", "scale")
+
+
+class RoomNotFoundError(Exception):
+    pass
+
+
+class RoomConflictError(Exception):
+    """The room changed since the version the client based its edit on."""
+
+    def __init__(self, current_version: int):
+        super().__init__(f"Room is at version {current_version}")
+        self.current_version = current_version
+
+
+class InvalidPatchError(ValueError):
+    pass
+
+
+def _now() -> str:
+    return datetime.datetime.utcnow().isoformat() + "Z"
+
+
+def room_blob_name(profile_id: str, room_id: str) -> str:
+    return f"profiles/{profile_id}/rooms/{room_id}.json"
+
+
+def _free_slots(taken):
+    """Layout slots not in `taken`, lowest first."""
+    slot = 0
+    while True:
+        if slot not in taken:
+            yield slot
+        slot += 1
+
+
+def assign_slots(items: List[Dict], existing: List[Dict] = ()) -> List[Dict]:
+    """
+    Copies of `items`, each given the lowest layout slot not used by `existing`
+    or an earlier item. An item keeps its slot for as long as it is in the room,
+    so moving or removing another item never shifts it.
+    """
+    taken = {item["slot"] for item in existing if item.get("slot") is not None}
+    taken.update(item["slot"] for item in items if item.get("slot") is not None)
+    free = _free_slots(taken)
+    return [item if item.get("slot") is not None else {**item, "slot": next(free)} for item in items]
+
+
+def _trim_history(changes: List[Dict], version: int) -> Tuple[List[Dict], int]:
+    """
+    The newest changes within ROOM_HISTORY_LIMIT, cut only between versions, and
+    the oldest version whose changes are all kept (version + 1 if none are).
+    """
+    kept = changes[-ROOM_HISTORY_LIMIT:] if len(changes) > ROOM_HISTORY_LIMIT else changes
+    if len(kept) < len(changes) and kept and changes[-len(kept) - 1]["version"] == kept[0]["version"]:
+        # The cut fell inside a version: drop the rest of it too
+        split = kept[0]["version"]
+        kept = [c for c in kept if c["version"] != split]
+    return kept, kept[0]["version"] if kept else version + 1
+
+
+class RoomStore:
+    """
+    Versioned VR rooms, one blob per profile and room.
+
+    Every write bumps `version` and appends the applied operations to `changes`
+    (bounded by ROOM_HISTORY_LIMIT, trimmed a whole version at a time, with
+    `history_from` the oldest version still complete), so a headset at version N
+    can fetch only what changed since. Writes are guarded by the blob ETag: a concurrent writer makes
+    the upload fail, and the patch is re-applied on the fresh copy. Reads are
+    conditional on the cached ETag, so an unchanged room costs no download.
+    """
+
+    def __init__(self, container_client: ContainerClient):
+        self.container_client = container_client
+        self._cache: Dict[str, Tuple[Dict, str]] = {}
+        self._lock = threading.Lock()
+
+    # ----------------- Storage -----------------
+    def _read(self, profile_id: str, room_id: str) -> Tuple[Dict, str]:
+        blob_name = room_blob_name(profile_id, room_id)
+        blob_client = self.container_client.get_blob_client(blob_name)
+        with self._lock:
+            cached = self._cache.get(blob_name)
+        try:
+            if cached:
+                downloader = blob_client.download_blob(etag=cached[1], match_condition=MatchConditions.IfModified)
+            else:
+                downloader = blob_client.download_blob()
+            room = json.loads(downloader.readall())
+            etag = downloader.properties.etag
+        except ResourceNotModifiedError:
+            return cached
+        except ResourceNotFoundError:
+            with self._lock:
+                self._cache.pop(blob_name, None)
+            raise RoomNotFoundError(f"Room {room_id} not found")
+        with self._lock:
+            self._cache[blob_name] = (room, etag)
+        return room, etag
+
+    def _write(self, room: Dict, etag: Optional[str]) -> str:
+        """Uploads the room if the blob still has `etag` (or doesn't exist yet when etag is None)."""
+        blob_name = room_blob_name(room["profile_id"], room["room_id"])
+        kwargs = {"etag": etag, "match_condition": MatchConditions.IfNotModified} if etag else {}
+        result = self.container_client.get_blob_client(blob_name).upload_blob(
+            json.dumps(room, ensure_ascii=False),
+            overwrite=etag is not None,
+            content_settings=ContentSettings(content_type="application/json"),
+            **kwargs,
+        )
+        with self._lock:
+            self._cache[blob_name] = (room, result["etag"])
+        return result["etag"]
+
+    # ----------------- Public API -----------------
+    def create(
+        self,
+        profile_id: str,
+        items: List[Dict],
+        room_id: Optional[str] = None,
+        name: Optional[str] = None,
+        layout_style: Optional[str] = None,
+    ) -> Dict:
+        """Creates a room at version 1. Raises ResourceExistsError if the room id is taken."""
+        items = assign_slots(items)
+        changes, history_from = _trim_history([{"version": 1, "op": "add", "item": item} for item in items], 1)
+        room = {
+            "room_id": room_id or f"room_{uuid.uuid4().hex[:10]}",
+            "profile_id": profile_id,
+            "name": name,
+            "layout_style": layout_style,
+            "version": 1,
+            "created_at": _now(),
+            "updated_at": _now(),
+            "items": items,
+            "changes": changes,
+            "history_from": history_from,
+        }
+        self._write(room, None)
+        return room
+
+    def get(self, profile_id: str, room_id: str) -> Dict:
+        return self._read(profile_id, room_id)[0]
+
+    def list(self, profile_id: str) -> List[Dict]:
+        prefix = f"profiles/{profile_id}/rooms/"
+        return [
+            {"room_id": blob.name[len(prefix):-len(".json")], "updated_at": blob.last_modified.isoformat()}
+            for blob in self.container_client.list_blobs(name_starts_with=prefix)
+            if blob.name.endswith(".json")
+        ]
+
+    def patch(
+        self,
+        profile_id: str,
+        room_id: str,
+        ops: List[Dict],
+        expected_version: Optional[int] = None,
+        new_items: Optional[Dict[str, Dict]] = None,
+    ) -> Dict:
+        """
+        Applies `ops` as one new version. Ops:
+          {"op": "add", "memory_id"}                   (item taken from `new_items`)
+          {"op": "remove", "id"}
+          {"op": "move", "id", "position"?, "rotation"?, "scale"?}
+        Raises RoomConflictError if `expected_version` is given and the room has moved on.
+        """
+        for _ in range(ROOM_WRITE_RETRIES):
+            room, etag = self._read(profile_id, room_id)
+            if expected_version is not None and room["version"] != expected_version:
+                raise RoomConflictError(room["version"])
+            updated = self._apply(room, ops, new_items or {})
+            if updated is room:
+                return room
+            try:
+                self._write(updated, etag)
+                return updated
+            except ResourceModifiedError:
+                logger.info(f"[RoomStore] {room_id} changed during write; retrying")
+        raise RoomConflictError(self._read(profile_id, room_id)[0]["version"])
+
+    @staticmethod
+    def _apply(room: Dict, ops: List[Dict], new_items: Dict[str, Dict]) -> Dict:
+        version = room["version"] + 1
+        items = {item["id"]: dict(item) for item in room["items"]}
+        changes = []
+        for op in ops:
+            kind = op.get("op")
+            if kind == "add":
+                item = new_items.get(op.get("memory_id"))
+                if item is None:
+                    raise InvalidPatchError(f"Memory {op.get('memory_id')} not found")
+                if item["id"] in items:
+                    continue
+                item = assign_slots([item], list(items.values()))[0]
+                items[item["id"]] = item
+                changes.append({"version": version, "op": "add", "item": item})
+            elif kind == "remove":
+                if items.pop(op.get("id"), None) is not None:
+                    changes.append({"version": version, "op": "remove", "id": op["id"]})
+            elif kind == "move":
+                item = items.get(op.get("id"))
+                if item is None:
+                    raise InvalidPatchError(f"Item {op.get('id')} is not in the room")
+                transform = {field: op[field] for field in ITEM_TRANSFORM_FIELDS if field in op}
+                item.update(transform)
+                changes.append({"version": version, "op": "move", "id": op["id"], **transform})
+            else:
+                raise InvalidPatchError(f"Unknown op {kind!r}")
+
+        if not changes:
+            return room
+        history, history_from = _trim_history(room.get("changes", []) + changes, version)
+        return {
+            **room,
+            "version": version,
+            "updated_at": _now(),
+            "items": list(items.values()),
+            "changes": history,
+            "history_from": history_from,
+        }
+
+    @staticmethod
+    def changes_since(room: Dict, since: int) -> Optional[List[Dict]]:
+        """Changes after version `since`, or None if they are no longer all in the history."""
+        if since >= room["version"]:
+            return []
+        history = room.get("changes", [])
+        history_from = room.get("history_from")
+        if history_from is None:
+            # Saved before history_from was stored: the oldest version may have been cut
+            history_from = history[0]["version"] + (len(history) >= ROOM_HISTORY_LIMIT) if history else room["version"] + 1
+        if since + 1 < history_from:
+            return None
+        return [c for c in history if c["version"] > since]
@@ -0,0 +1,79 @@
+# backend/utils/speech/audio_formats.py
+
+from typing import Iterator, Optional
+
+import azure.cognitiveservices.speech as speechsdk
+
+# Formats we can return to clients, in server preference order when the client accepts several
+AUDIO_FORMATS = {
+    "ogg": {
+        "media_type": "audio/ogg",
+        "extension": "ogg",
+        "sdk_format": speechsdk.SpeechSynthesisOutputFormat.Ogg24Khz16BitMonoOpus,
+    },
+    "mp3": {
+        "media_type": "audio/mpeg",
+        "extension": "mp3",
+        "sdk_format": speechsdk.SpeechSynthesisOutputFormat.Audio24Khz48KBitRateMonoMp3,
+    },
+    "wav": {
+        "media_type": "audio/wav",
+        "extension": "wav",
+        "sdk_format": speechsdk.SpeechSynthesisOutputFormat.Riff24Khz16BitMonoPcm,
+    },
+}
+
+_MEDIA_TYPE_ALIASES = {
+    "audio/ogg": "ogg",
+    "audio/opus": "ogg",
+    "audio/ogg; codecs=opus": "ogg",
+    "audio/mpeg": "mp3",
+    "audio/mp3": "mp3",
+    "audio/wav": "wav",
+    "audio/wave": "wav",
+    "audio/x-wav": "wav",
+}
+
+
+def negotiate_audio_format(accept: Optional[str], default: str = "wav") -> str:
+    """
+    Picks "ogg", "mp3" or "wav" from an HTTP Accept header, honouring q-values.
+    Missing headers and wildcards get `default`.
+    """
+    if not accept:
+        return default
+
+    best, best_q = None, 0.0
+    for item in accept.split(","):
+        parts = [p.strip() for p in item.split(";")]
+        media_type = parts[0].lower()
+        q = 1.0
+        params = []
+        for param in parts[1:]:
+            if param.lower().startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+            else:
+                params.append(param.lower())
+
+        if media_type in ("audio/*", "*/*"):
+            fmt = default
+        else:
+            fmt = _MEDIA_TYPE_ALIASES.get("; ".join([media_type] + params)) or _MEDIA_TYPE_ALIASES.get(media_type)
+        if fmt and q > best_q:
+            best, best_q = fmt, q
+    return best or default
+
+
+def accepts_audio(accept: Optional[str]) -> bool:
+    """True when the client explicitly asked for an audio media type."""
+    return bool(accept) and any(
+        item.split(";")[0].strip().lower().startswith("audio/") for item in accept.split(",")
+    )
+
+
+def iter_audio_chunks(data: bytes, chunk_size: int = 32 * 1024) -> Iterator[bytes]:
+    for i in range(0, len(data), chunk_size):
+        yield data[i:i + chunk_size]
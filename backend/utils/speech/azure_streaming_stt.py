@@ -1,14 +1,8 @@
 import azure.cognitiveservices.speech as speechsdk
-import os
-from dotenv import load_dotenv
 
-load_dotenv()
+from utils.speech.engine_pool import speech_pool
 
 def create_speech_recognizer_from_mic():
-    speech_config = speechsdk.SpeechConfig(
-        subscription=os.getenv("AZURE_SPEECH_KEY"),
-        region=os.getenv("AZURE_SPEECH_REGION")
-    )
     audio_config = speechsdk.audio.AudioConfig(use_default_microphone=True)
-    recognizer = speechsdk.SpeechRecognizer(speech_config=speech_config, audio_config=audio_config)
+    recognizer = speechsdk.SpeechRecognizer(speech_config=speech_pool.speech_config(), audio_config=audio_config)
     return recognizer
@@ -1,20 +1,11 @@
-import os
 import azure.cognitiveservices.speech as speechsdk
-from dotenv import load_dotenv
 
-load_dotenv()
-
-AZURE_SPEECH_KEY = os.getenv("AZURE_SPEECH_KEY")
-AZURE_REGION = os.getenv("AZURE_REGION")
+from utils.speech.engine_pool import speech_pool
 
 def recognize_speech():
-    speech_config = speechsdk.SpeechConfig(subscription=AZURE_SPEECH_KEY, region=AZURE_REGION)
-    audio_config = speechsdk.AudioConfig(use_default_microphone=True)
-    speech_recognizer = speechsdk.SpeechRecognizer(speech_config=speech_config, audio_config=audio_config)
-
     print("Speak into your microphone...")
 
-    result = speech_recognizer.recognize_once()
+    result = speech_pool.recognize_microphone()
     if result.reason == speechsdk.ResultReason.RecognizedSpeech:
         return result.text
     elif result.reason == speechsdk.ResultReason.NoMatch:
@@ -1,28 +1,19 @@
-import os
-from dotenv import load_dotenv
 import azure.cognitiveservices.speech as speechsdk
 
-load_dotenv()
+from utils.speech.engine_pool import speech_pool
 
-# Fetch environment variables once
-AZURE_SPEECH_KEY = os.getenv("AZURE_SPEECH_KEY")
-AZURE_REGION = os.getenv("AZURE_REGION")
+DEFAULT_VOICE = "en-IN-PrabhatNeural"
 
 def synthesize_speech(text: str, output_path: str) -> str | None:
     """Synthesizes speech from text to an output audio file.
     
     Returns the audio file path if successful, else None.
     """
-    speech_config = speechsdk.SpeechConfig(subscription=AZURE_SPEECH_KEY, region=AZURE_REGION)
-    # Optional: set voice name here
-    speech_config.speech_synthesis_voice_name = "en-IN-PrabhatNeural"
-
-    audio_config = speechsdk.audio.AudioOutputConfig(filename=output_path)
-
-    synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config, audio_config=audio_config)
-    result = synthesizer.speak_text_async(text).get()
+    result = speech_pool.synthesize(text, voice=DEFAULT_VOICE)
 
     if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
+        with open(output_path, "wb") as f:
+            f.write(result.audio_data)
         return output_path
     else:
         print(f"Synthesis failed: {result.reason}")
@@ -35,13 +26,7 @@ def synthesize_speech(text: str, output_path: str) -> str | None:
 
 def speak_text(text: str) -> None:
     """Synthesizes speech from text and plays on default speaker."""
-    speech_config = speechsdk.SpeechConfig(subscription=AZURE_SPEECH_KEY, region=AZURE_REGION)
-    speech_config.speech_synthesis_voice_name = "en-IN-PrabhatNeural"
-
-    audio_config = speechsdk.audio.AudioOutputConfig(use_default_speaker=True)
-
-    synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config, audio_config=audio_config)
-    result = synthesizer.speak_text_async(text).get()
+    result = speech_pool.synthesize(text, voice=DEFAULT_VOICE, speaker=True)
 
     if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
         print("Speech synthesized ✅")
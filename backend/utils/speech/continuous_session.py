@@ -0,0 +1,148 @@
+# backend/utils/speech/continuous_session.py
+
+import os
+import re
+import time
+import asyncio
+import logging
+import threading
+from typing import Callable, Optional
+
+import azure.cognitiveservices.speech as speechsdk
+
+from utils.speech.engine_pool import speech_pool, MIC_END_SILENCE_TIMEOUT_MS
+
+logger = logging.getLogger(__name__)
+
+# Silence that ends a phrase; lower = snappier turns, higher = fewer cut-off sentences
+SEGMENTATION_SILENCE_MS = int(os.getenv("STT_SEGMENTATION_SILENCE_MS", MIC_END_SILENCE_TIMEOUT_MS))
+# Partial transcripts shorter than this don't interrupt playback (coughs, "uh")
+BARGE_IN_MIN_CHARS = int(os.getenv("STT_BARGE_IN_MIN_CHARS", "4"))
+# Final phrases arriving this long after playback ended can still be speaker echo
+ECHO_GRACE_SECONDS = float(os.getenv("STT_ECHO_GRACE_SECONDS", "1.5"))
+RESTART_DELAY_SECONDS = 1.0
+
+_NON_WORD = re.compile(r"[^\w\s]")
+
+
+def _normalize(text: str) -> str:
+    return " ".join(_NON_WORD.sub(" ", text.lower()).split())
+
+
+class ContinuousRecognitionSession:
+    """
+    One long-lived continuous recognizer on the default microphone. Final phrases
+    are pushed onto an asyncio queue, so the assistant loop never pays per-turn
+    recognizer setup and can listen while it is speaking.
+
+    While a reply is playing, partial results that are not the reply itself coming
+    back through the microphone set the playback's interrupt event (barge-in).
+    """
+
+    def __init__(
+        self,
+        language: Optional[str] = None,
+        segmentation_silence_ms: int = SEGMENTATION_SILENCE_MS,
+        on_partial: Optional[Callable[[str], None]] = None,
+    ):
+        self.language = language
+        self.segmentation_silence_ms = segmentation_silence_ms
+        self.on_partial = on_partial
+        self._recognizer: Optional[speechsdk.SpeechRecognizer] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: "asyncio.Queue" = asyncio.Queue()
+        self._lock = threading.Lock()
+        self._playing_text = ""
+        self._playback_interrupt: Optional[threading.Event] = None
+        self._playback_ended_at = 0.0
+
+    # ----------------- Lifecycle -----------------
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        # A dedicated config: the segmentation timing is specific to this session
+        config = speechsdk.SpeechConfig(subscription=speech_pool.subscription, region=speech_pool.region)
+        if self.language:
+            config.speech_recognition_language = self.language
+        config.set_property(speechsdk.PropertyId.Speech_SegmentationSilenceTimeoutMs, str(self.segmentation_silence_ms))
+
+        recognizer = speechsdk.SpeechRecognizer(
+            speech_config=config,
+            audio_config=speechsdk.audio.AudioConfig(use_default_microphone=True),
+        )
+        recognizer.recognizing.connect(self._on_recognizing)
+        recognizer.recognized.connect(self._on_recognized)
+        recognizer.canceled.connect(self._on_canceled)
+        self._recognizer = recognizer
+        await asyncio.to_thread(lambda: recognizer.start_continuous_recognition_async().get())
+
+    async def stop(self):
+        recognizer, self._recognizer = self._recognizer, None
+        if recognizer is None:
+            return
+        try:
+            await asyncio.to_thread(lambda: recognizer.stop_continuous_recognition_async().get())
+        except Exception as e:
+            logger.info(f"[ContinuousSTT] Stopping recognition failed: {e}")
+        recognizer.recognizing.disconnect_all()
+        recognizer.recognized.disconnect_all()
+        recognizer.canceled.disconnect_all()
+
+    async def next_utterance(self) -> str:
+        """Waits for the next final phrase; restarts recognition if the service dropped the session."""
+        while True:
+            item = await self._queue.get()
+            if not isinstance(item, Exception):
+                return item
+            logger.warning(f"[ContinuousSTT] Recognition canceled, restarting: {item}")
+            await self.stop()
+            await asyncio.sleep(RESTART_DELAY_SECONDS)
+            await self.start()
+
+    # ----------------- Playback / barge-in -----------------
+    def begin_playback(self, text: str) -> threading.Event:
+        """Registers a reply that is about to play; returns the event that barge-in will set."""
+        interrupt = threading.Event()
+        with self._lock:
+            self._playing_text = _normalize(text)
+            self._playback_interrupt = interrupt
+        return interrupt
+
+    def end_playback(self):
+        with self._lock:
+            self._playback_interrupt = None
+            self._playback_ended_at = time.monotonic()
+
+    def _is_echo(self, text: str) -> bool:
+        with self._lock:
+            in_window = (
+                self._playback_interrupt is not None
+                or time.monotonic() - self._playback_ended_at < ECHO_GRACE_SECONDS
+            )
+            playing_text = self._playing_text
+        normalized = _normalize(text)
+        return bool(in_window and normalized and playing_text and normalized in playing_text)
+
+    # ----------------- SDK callbacks (SDK threads) -----------------
+    def _on_recognizing(self, evt: speechsdk.SpeechRecognitionEventArgs):
+        text = evt.result.text
+        if self._is_echo(text):
+            return
+        with self._lock:
+            interrupt = self._playback_interrupt
+        if interrupt is not None and len(text.strip()) >= BARGE_IN_MIN_CHARS:
+            interrupt.set()
+        if self.on_partial:
+            self.on_partial(text)
+
+    def _on_recognized(self, evt: speechsdk.SpeechRecognitionEventArgs):
+        if evt.result.reason != speechsdk.ResultReason.RecognizedSpeech:
+            return
+        text = evt.result.text.strip()
+        if not text or self._is_echo(text):
+            return
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, text)
+
+    def _on_canceled(self, evt: speechsdk.SpeechRecognitionCanceledEventArgs):
+        if evt.cancellation_details.reason == speechsdk.CancellationReason.Error:
+            error = RuntimeError(evt.cancellation_details.error_details)
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, error)
@@ -0,0 +1,293 @@
+# backend/utils/speech/engine_pool.py
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional, Tuple
+
+import azure.cognitiveservices.speech as speechsdk
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Older modules used different variable names for the same Speech resource
+SPEECH_KEY = os.getenv("AZURE_SPEECH_KEY") or os.getenv("SPEECH_KEY")
+SPEECH_REGION = os.getenv("AZURE_SPEECH_REGION") or os.getenv("AZURE_REGION") or os.getenv("SPEECH_REGION")
+
+POOL_MAX_PER_KEY = int(os.getenv("SPEECH_POOL_MAX_PER_KEY", "4"))
+POOL_MAX_KEYS = int(os.getenv("SPEECH_POOL_MAX_KEYS", "16"))
+# The service drops idle connections after a few minutes; re-open before reuse past this
+POOL_MAX_IDLE_SECONDS = int(os.getenv("SPEECH_POOL_MAX_IDLE_SECONDS", "240"))
+POOL_ACQUIRE_TIMEOUT_SECONDS = float(os.getenv("SPEECH_POOL_ACQUIRE_TIMEOUT_SECONDS", "30"))
+
+# Microphone recognition: give up quickly on silence instead of streaming it to the service
+MIC_INITIAL_SILENCE_TIMEOUT_MS = os.getenv("STT_INITIAL_SILENCE_TIMEOUT_MS", "5000")
+MIC_END_SILENCE_TIMEOUT_MS = os.getenv("STT_END_SILENCE_TIMEOUT_MS", "800")
+
+# (region, voice, language, output format, sink)
+EngineKey = Tuple[str, str, str, str, str]
+
+
+class _PooledEngine:
+    def __init__(self, engine, connection):
+        self.engine = engine
+        self.connection = connection
+        self.connected = True
+        self.broken = False
+        self.last_used = time.monotonic()
+        connection.disconnected.connect(self._on_disconnected)
+
+    def _on_disconnected(self, _evt):
+        self.connected = False
+
+
+class SpeechEnginePool:
+    """
+    Keeps warm SpeechSynthesizer / SpeechRecognizer instances with pre-opened
+    service connections, keyed by (region, voice, language, output format, sink).
+
+    Engines are handed out exclusively (the SDK objects are not safe to share
+    between concurrent calls) and returned after use. Each key holds at most
+    `max_per_key` engines and at most `max_keys` keys are kept alive; the least
+    recently used key is dropped beyond that.
+    """
+
+    def __init__(
+        self,
+        subscription: Optional[str] = SPEECH_KEY,
+        region: Optional[str] = SPEECH_REGION,
+        max_per_key: int = POOL_MAX_PER_KEY,
+        max_keys: int = POOL_MAX_KEYS,
+        max_idle_seconds: int = POOL_MAX_IDLE_SECONDS,
+    ):
+        self.subscription = subscription
+        self.region = region
+        self.max_per_key = max_per_key
+        self.max_keys = max_keys
+        self.max_idle_seconds = max_idle_seconds
+        self._lock = threading.Lock()
+        self._configs: "OrderedDict[EngineKey, speechsdk.SpeechConfig]" = OrderedDict()
+        self._idle = {}
+        self._slots = {}
+
+    # ----------------- Config -----------------
+    def _key(self, voice, language, output_format, sink) -> EngineKey:
+        fmt = output_format.name if output_format is not None else ""
+        return (self.region or "", voice or "", language or "", fmt, sink)
+
+    def speech_config(
+        self,
+        voice: Optional[str] = None,
+        language: Optional[str] = None,
+        output_format: Optional[speechsdk.SpeechSynthesisOutputFormat] = None,
+    ) -> speechsdk.SpeechConfig:
+        """Returns a cached SpeechConfig for the given voice/language/output format."""
+        return self._config_for(self._key(voice, language, output_format, "config"), voice, language, output_format)
+
+    def _config_for(self, key, voice, language, output_format) -> speechsdk.SpeechConfig:
+        evicted = []
+        with self._lock:
+            config = self._configs.get(key)
+            if config is not None:
+                self._configs.move_to_end(key)
+                return config
+
+            config = speechsdk.SpeechConfig(subscription=self.subscription, region=self.region)
+            if voice:
+                config.speech_synthesis_voice_name = voice
+            if language:
+                config.speech_recognition_language = language
+                config.speech_synthesis_language = language
+            if output_format is not None:
+                config.set_speech_synthesis_output_format(output_format)
+            self._configs[key] = config
+            self._slots[key] = threading.BoundedSemaphore(self.max_per_key)
+
+            while len(self._configs) > self.max_keys:
+                old_key, _ = self._configs.popitem(last=False)
+                self._slots.pop(old_key, None)
+                evicted.extend(self._idle.pop(old_key, []))
+
+        for entry in evicted:
+            self._close(entry)
+        return config
+
+    # ----------------- Engine lifecycle -----------------
+    def _create(self, key, voice, language, output_format) -> _PooledEngine:
+        config = self._config_for(key, voice, language, output_format)
+        sink = key[-1]
+        if sink == "microphone":
+            config.set_property(
+                speechsdk.PropertyId.SpeechServiceConnection_InitialSilenceTimeoutMs, MIC_INITIAL_SILENCE_TIMEOUT_MS
+            )
+            config.set_property(speechsdk.PropertyId.Speech_SegmentationSilenceTimeoutMs, MIC_END_SILENCE_TIMEOUT_MS)
+            engine = speechsdk.SpeechRecognizer(
+                speech_config=config,
+                audio_config=speechsdk.audio.AudioConfig(use_default_microphone=True),
+            )
+            connection = speechsdk.Connection.from_recognizer(engine)
+        else:
+            audio_config = speechsdk.audio.AudioOutputConfig(use_default_speaker=True) if sink == "speaker" else None
+            engine = speechsdk.SpeechSynthesizer(speech_config=config, audio_config=audio_config)
+            connection = speechsdk.Connection.from_speech_synthesizer(engine)
+        # Pay the connection setup + TLS handshake now rather than on the first request
+        connection.open(False)
+        return _PooledEngine(engine, connection)
+
+    def _is_healthy(self, entry: _PooledEngine) -> bool:
+        if entry.connected and time.monotonic() - entry.last_used < self.max_idle_seconds:
+            return True
+        try:
+            entry.connection.open(False)
+            entry.connected = True
+            return True
+        except Exception as e:
+            logger.info(f"[SpeechEnginePool] Discarding engine that failed to reconnect: {e}")
+            return False
+
+    def _close(self, entry: _PooledEngine):
+        try:
+            entry.connection.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def _lease(self, voice, language, output_format, sink):
+        key = self._key(voice, language, output_format, sink)
+        self._config_for(key, voice, language, output_format)
+        with self._lock:
+            slot = self._slots.setdefault(key, threading.BoundedSemaphore(self.max_per_key))
+        if not slot.acquire(timeout=POOL_ACQUIRE_TIMEOUT_SECONDS):
+            raise TimeoutError(f"No free speech engine for {key}")
+
+        try:
+            entry = None
+            while entry is None:
+                with self._lock:
+                    idle = self._idle.get(key)
+                    candidate = idle.pop() if idle else None
+                if candidate is None:
+                    entry = self._create(key, voice, language, output_format)
+                elif self._is_healthy(candidate):
+                    entry = candidate
+                else:
+                    self._close(candidate)
+
+            healthy = True
+            try:
+                yield entry
+            except Exception:
+                healthy = False
+                raise
+            finally:
+                entry.last_used = time.monotonic()
+                if healthy and not entry.broken:
+                    with self._lock:
+                        if key in self._configs:
+                            self._idle.setdefault(key, []).append(entry)
+                            entry = None
+                if entry is not None:
+                    self._close(entry)
+        finally:
+            slot.release()
+
+    # ----------------- Public API -----------------
+    def synthesize(
+        self,
+        text: str,
+        voice: Optional[str] = None,
+        language: Optional[str] = None,
+        output_format: Optional[speechsdk.SpeechSynthesisOutputFormat] = None,
+        speaker: bool = False,
+        ssml: bool = False,
+        interrupt: Optional[threading.Event] = None,
+    ) -> speechsdk.SpeechSynthesisResult:
+        """
+        Synthesizes `text` on a pooled synthesizer (in memory, or on the default speaker).
+        Setting `interrupt` while speaking stops synthesis and playback (barge-in).
+        """
+        with self._lease(voice, language, output_format, "speaker" if speaker else "memory") as entry:
+            done = threading.Event()
+            if interrupt is not None:
+                threading.Thread(target=self._stop_on, args=(entry.engine, interrupt, done), daemon=True).start()
+            try:
+                if ssml:
+                    result = entry.engine.speak_ssml_async(text).get()
+                else:
+                    result = entry.engine.speak_text_async(text).get()
+            finally:
+                done.set()
+            if result.reason == speechsdk.ResultReason.Canceled:
+                details = result.cancellation_details
+                if details.reason == speechsdk.CancellationReason.Error:
+                    logger.warning(f"[SpeechEnginePool] Synthesis error: {details.error_details}")
+                    entry.broken = True
+            return result
+
+    @staticmethod
+    def _stop_on(engine: speechsdk.SpeechSynthesizer, interrupt: threading.Event, done: threading.Event):
+        while not done.is_set():
+            if interrupt.wait(0.05):
+                if not done.is_set():
+                    engine.stop_speaking_async().get()
+                return
+
+    def synthesize_to_bytes(self, text: str, **kwargs) -> bytes:
+        result = self.synthesize(text, **kwargs)
+        if result.reason != speechsdk.ResultReason.SynthesizingAudioCompleted:
+            return b""
+        return result.audio_data
+
+    def recognize_microphone(self, language: Optional[str] = None) -> speechsdk.SpeechRecognitionResult:
+        """Runs a single recognition on a pooled default-microphone recognizer."""
+        with self._lease(None, language, None, "microphone") as entry:
+            return entry.engine.recognize_once_async().get()
+
+    def file_recognizer(self, file_path: str, language: Optional[str] = None) -> speechsdk.SpeechRecognizer:
+        """
+        Recognizers are bound to their audio source at construction, so file input
+        cannot reuse a pooled engine; this at least reuses the cached SpeechConfig.
+        """
+        return speechsdk.SpeechRecognizer(
+            speech_config=self.speech_config(language=language),
+            audio_config=speechsdk.audio.AudioConfig(filename=file_path),
+        )
+
+    def warm(
+        self,
+        voice: Optional[str] = None,
+        language: Optional[str] = None,
+        output_format: Optional[speechsdk.SpeechSynthesisOutputFormat] = None,
+        sink: str = "memory",
+    ):
+        """Pre-creates one engine for the key so the first request finds an open connection."""
+        try:
+            with self._lease(voice, language, output_format, sink):
+                pass
+        except Exception as e:
+            logger.warning(f"[SpeechEnginePool] Warm-up failed for {voice or 'default'} voice: {e}")
+
+    def close_all(self):
+        with self._lock:
+            entries = [e for idle in self._idle.values() for e in idle]
+            self._idle.clear()
+        for entry in entries:
+            self._close(entry)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "keys": len(self._configs),
+                "idle_engines": sum(len(v) for v in self._idle.values()),
+                "max_per_key": self.max_per_key,
+                "max_keys": self.max_keys,
+            }
+
+
+# Shared by the FastAPI routes and the standalone assistant loop
+speech_pool = SpeechEnginePool()
@@ -0,0 +1,170 @@
+# backend/utils/speech/long_form.py
+
+import io
+import os
+import re
+import wave
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List, Optional
+
+# Replies at least this long are split and synthesized in parallel
+LONG_FORM_MIN_CHARS = int(os.getenv("TTS_LONG_FORM_MIN_CHARS", "300"))
+LONG_FORM_CHUNK_CHARS = int(os.getenv("TTS_LONG_FORM_CHUNK_CHARS", "200"))
+LONG_FORM_MAX_PARALLEL = int(os.getenv("TTS_LONG_FORM_MAX_PARALLEL", "3"))
+# Formats whose chunks can be joined into one valid file. Ogg/Opus chunks would
+# form a chained stream that many players reject, so those replies are synthesized whole.
+LONG_FORM_FORMATS = (None, "wav", "mp3")
+_UNKNOWN_SIZE = 0xFFFFFFFF
+
+_SENTENCE_END = re.compile(r"(?<=[.!?…])[\"')\]]*\s+")
+_PROSODY_BREAK = re.compile(r"(?<=[,;:—–])\s+")
+
+
+def _split_long_sentence(sentence: str, max_chars: int) -> List[str]:
+    """Splits at commas/semicolons/dashes first, then at word boundaries."""
+    pieces = []
+    for clause in _PROSODY_BREAK.split(sentence):
+        while len(clause) > max_chars:
+            cut = clause.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            pieces.append(clause[:cut].strip())
+            clause = clause[cut:].strip()
+        if clause:
+            pieces.append(clause)
+    return pieces
+
+
+def split_for_synthesis(text: str, max_chars: int = LONG_FORM_CHUNK_CHARS) -> List[str]:
+    """
+    Splits text into chunks of whole sentences (or clauses, for very long sentences)
+    of at most `max_chars`, so each chunk ends on a natural pause.
+    """
+    chunks: List[str] = []
+    current = ""
+    for sentence in _SENTENCE_END.split(text.strip()):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        parts = [sentence] if len(sentence) <= max_chars else _split_long_sentence(sentence, max_chars)
+        for part in parts:
+            if current and len(current) + 1 + len(part) > max_chars:
+                chunks.append(current)
+                current = part
+            else:
+                current = f"{current} {part}" if current else part
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def synthesize_chunks(
+    chunks: List[str],
+    synthesize: Callable[[str], bytes],
+    max_parallel: int = LONG_FORM_MAX_PARALLEL,
+) -> Iterator[bytes]:
+    """
+    Synthesizes all chunks concurrently (at most `max_parallel` at once) and yields
+    their audio in order, each as soon as it and its predecessors are done.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel)) as executor:
+        futures = [executor.submit(synthesize, chunk) for chunk in chunks]
+        for future in futures:
+            yield future.result()
+
+
+def _wav_params_and_frames(data: bytes):
+    with wave.open(io.BytesIO(data), "rb") as wav:
+        return wav.getparams(), wav.readframes(wav.getnframes())
+
+
+def _streaming_wav_header(params) -> bytes:
+    """RIFF header with unknown (maximum) sizes, as used for streamed WAV."""
+    byte_rate = params.framerate * params.nchannels * params.sampwidth
+    block_align = params.nchannels * params.sampwidth
+    return (
+        b"RIFF" + struct.pack("<I", _UNKNOWN_SIZE) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, params.nchannels, params.framerate,
+                                byte_rate, block_align, params.sampwidth * 8)
+        + b"data" + struct.pack("<I", _UNKNOWN_SIZE)
+    )
+
+
+def finalize_streaming_wav(data: bytes) -> bytes:
+    """
+    Fills in the real RIFF and data sizes of a complete streamed WAV, so it can be
+    stored and served as a regular file. Other audio is returned unchanged.
+    """
+    if data[:4] != b"RIFF" or data[8:12] != b"WAVE" or struct.unpack_from("<I", data, 4)[0] != _UNKNOWN_SIZE:
+        return data
+    patched = bytearray(data)
+    struct.pack_into("<I", patched, 4, len(data) - 8)
+    offset = 12
+    while offset + 8 <= len(data):
+        chunk_id, size = data[offset:offset + 4], struct.unpack_from("<I", data, offset + 4)[0]
+        if chunk_id == b"data":
+            struct.pack_into("<I", patched, offset + 4, len(data) - offset - 8)
+            break
+        offset += 8 + size + (size & 1)
+    return bytes(patched)
+
+
+def iter_long_form(
+    text: str,
+    synthesize: Callable[[str], bytes],
+    audio_format: Optional[str] = None,
+) -> Iterator[bytes]:
+    """
+    Streams long-form audio: chunk 1 is yielded while chunks 2..n are still being
+    synthesized. WAV chunks are re-framed into one continuous PCM stream (with a
+    streaming header, see finalize_streaming_wav); MP3 frames are self-delimiting
+    and are passed through back to back. Other formats are synthesized whole.
+    Raises RuntimeError if a chunk comes back empty (failed or cancelled).
+    """
+    if audio_format not in LONG_FORM_FORMATS:
+        yield synthesize(text)
+        return
+    chunks = split_for_synthesis(text)
+    is_wav = audio_format in (None, "wav")
+    header_sent = False
+    for index, audio in enumerate(synthesize_chunks(chunks, synthesize)):
+        if not audio:
+            # Raise rather than skip, so a reply missing sentences is never cached
+            raise RuntimeError(f"Synthesis of chunk {index + 1}/{len(chunks)} failed")
+        if not is_wav:
+            yield audio
+            continue
+        params, frames = _wav_params_and_frames(audio)
+        if not header_sent:
+            yield _streaming_wav_header(params)
+            header_sent = True
+        yield frames
+
+
+def synthesize_long_form(
+    text: str,
+    synthesize: Callable[[str], bytes],
+    audio_format: Optional[str] = None,
+) -> bytes:
+    """
+    Synthesizes long text in parallel chunks and stitches the result into a single
+    file. WAV output gets one header over the concatenated PCM, so there are no gaps.
+    Formats outside LONG_FORM_FORMATS are synthesized in one request. Returns b""
+    if any chunk failed, so a reply missing sentences is never cached.
+    """
+    if audio_format not in LONG_FORM_FORMATS:
+        return synthesize(text)
+    chunks = split_for_synthesis(text)
+    parts = list(synthesize_chunks(chunks, synthesize))
+    if not parts or not all(parts):
+        return b""
+    if audio_format not in (None, "wav"):
+        return b"".join(parts)
+
+    params, _ = _wav_params_and_frames(parts[0])
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as out:
+        out.setparams(params)
+        for part in parts:
+            out.writeframes(_wav_params_and_frames(part)[1])
+    return buffer.getvalue()
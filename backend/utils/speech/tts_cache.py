@@ -0,0 +1,208 @@
+# backend/utils/speech/tts_cache.py
+
+import os
+import json
+import asyncio
+import shutil
+import threading
+import hashlib
+import logging
+import subprocess
+import wave
+from typing import AsyncIterable, AsyncIterator, Callable, Iterable, Iterator, Optional, Union
+
+from utils.disk_cache import DiskLRUCache
+from utils.speech.long_form import finalize_streaming_wav
+from utils.tracing import annotate
+
+logger = logging.getLogger(__name__)
+
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join("cache", "tts"))
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_MB", "512")) * 1024 * 1024
+# Set e.g. "cache/tts" to mirror cached audio into the blob container
+TTS_CACHE_BLOB_PREFIX = os.getenv("TTS_CACHE_BLOB_PREFIX") or None
+
+# Format label for audio produced with the Speech SDK's default output format
+DEFAULT_OUTPUT_FORMAT = "riff-default"
+
+# Phrases spoken on almost every session, synthesized ahead of time per profile
+DEFAULT_PREWARM_PHRASES = [
+    "Hello, how are you feeling today?",
+    "Goodbye for now.",
+    "Maybe you'll have to remind me.",
+]
+
+tts_cache = DiskLRUCache(TTS_CACHE_DIR, TTS_CACHE_MAX_BYTES, blob_prefix=TTS_CACHE_BLOB_PREFIX, name="tts")
+
+
+def _extension_for(output_format: str) -> str:
+    fmt = (output_format or "").lower()
+    if "mp3" in fmt:
+        return "mp3"
+    if "opus" in fmt or "ogg" in fmt:
+        return "ogg"
+    return "wav"
+
+
+def tts_cache_key(
+    voice_id: Optional[str],
+    language: Optional[str],
+    text: str,
+    output_format: str = DEFAULT_OUTPUT_FORMAT,
+    ssml: bool = False,
+) -> str:
+    """
+    Returns the cache key for a synthesized utterance:
+    sha256 over (voice_id, language, text/SSML, output format), plus a file extension.
+    """
+    payload = json.dumps(
+        [voice_id or "", language or "", "ssml" if ssml else "text", text, output_format or ""],
+        ensure_ascii=False,
+    )
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return f"{digest}.{_extension_for(output_format)}"
+
+
+def get_or_synthesize(
+    voice_id: Optional[str],
+    language: Optional[str],
+    text: str,
+    synthesize: Callable[[], Optional[bytes]],
+    output_format: str = DEFAULT_OUTPUT_FORMAT,
+    ssml: bool = False,
+) -> Optional[bytes]:
+    """Returns cached audio for the utterance, calling `synthesize()` and storing the result on a miss."""
+    key = tts_cache_key(voice_id, language, text, output_format, ssml)
+    audio = tts_cache.get(key)
+    annotate(tts_cache="hit" if audio is not None else "miss")
+    if audio is not None:
+        return audio
+
+    audio = synthesize()
+    if audio:
+        tts_cache.put(key, audio)
+    return audio
+
+
+def stream_tts(
+    voice_id: Optional[str],
+    language: Optional[str],
+    text: str,
+    synthesize: Callable[[], Union[bytes, Iterable[bytes], None]],
+    output_format: str = DEFAULT_OUTPUT_FORMAT,
+    chunk_size: int = 64 * 1024,
+) -> Iterator[bytes]:
+    """
+    Like get_or_synthesize, but yields the audio in chunks straight from the cache file.
+    `synthesize` may also return an iterator of audio chunks; they are passed through
+    as they arrive and stored once the stream completes.
+    """
+    key = tts_cache_key(voice_id, language, text, output_format)
+    chunks = tts_cache.iter_chunks(key, chunk_size)
+    annotate(tts_cache="hit" if chunks is not None else "miss")
+    if chunks is not None:
+        return chunks
+
+    audio = synthesize() or b""
+    if not isinstance(audio, (bytes, bytearray)):
+        # Streamed WAV carries placeholder sizes; cache it as a regular file
+        return tee_to_cache(key, audio, finalize_streaming_wav if key.endswith(".wav") else None)
+    if audio:
+        tts_cache.put(key, audio)
+    return (audio[i:i + chunk_size] for i in range(0, len(audio), chunk_size))
+
+
+def tee_to_cache(
+    key: str,
+    chunks: Iterable[bytes],
+    finalize: Optional[Callable[[bytes], bytes]] = None,
+) -> Iterator[bytes]:
+    """
+    Yields `chunks` unchanged and caches their concatenation if the stream completes,
+    passed through `finalize` first when given.
+    """
+    received = []
+    for chunk in chunks:
+        received.append(chunk)
+        yield chunk
+    audio = b"".join(received)
+    if audio and finalize is not None:
+        audio = finalize(audio)
+    if audio:
+        tts_cache.put(key, audio)
+
+
+async def atee_to_cache(key: str, chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    """Async variant of tee_to_cache for streams coming from async HTTP clients."""
+    received = []
+    async for chunk in chunks:
+        received.append(chunk)
+        yield chunk
+    audio = b"".join(received)
+    if audio:
+        await asyncio.to_thread(tts_cache.put, key, audio)
+
+
+def prewarm_phrases(
+    voice_id: Optional[str],
+    language: Optional[str],
+    synthesize: Callable[[str], Optional[bytes]],
+    phrases: Optional[Iterable[str]] = None,
+    output_format: str = DEFAULT_OUTPUT_FORMAT,
+) -> dict:
+    """Synthesizes any of `phrases` that are not cached yet. Returns counts of warmed/skipped/failed phrases."""
+    counts = {"warmed": 0, "skipped": 0, "failed": 0}
+    for phrase in phrases or DEFAULT_PREWARM_PHRASES:
+        phrase = phrase.strip()
+        if not phrase:
+            continue
+        key = tts_cache_key(voice_id, language, phrase, output_format)
+        if key in tts_cache:
+            counts["skipped"] += 1
+            continue
+        try:
+            audio = synthesize(phrase)
+        except Exception as e:
+            logger.warning(f"[TTSCache] Pre-warm failed for '{phrase}': {e}")
+            audio = None
+        if audio:
+            tts_cache.put(key, audio)
+            counts["warmed"] += 1
+        else:
+            counts["failed"] += 1
+    return counts
+
+
+def play_cached_audio(path: str, interrupt: Optional[threading.Event] = None) -> bool:
+    """
+    Plays a cached WAV file on the local speaker, stopping early if `interrupt` is set.
+    Returns False when no player is available so the caller can synthesize live instead.
+    """
+    if os.name == "nt":
+        import winsound
+        if interrupt is None:
+            winsound.PlaySound(path, winsound.SND_FILENAME)
+            return True
+        winsound.PlaySound(path, winsound.SND_FILENAME | winsound.SND_ASYNC)
+        interrupt.wait(_wav_duration(path))
+        if interrupt.is_set():
+            winsound.PlaySound(None, 0)
+        return True
+
+    for player in ("afplay", "paplay", "aplay"):
+        if shutil.which(player):
+            process = subprocess.Popen([player, path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            if interrupt is None:
+                return process.wait() == 0
+            while process.poll() is None:
+                if interrupt.wait(0.05):
+                    process.terminate()
+                    process.wait()
+                    return True
+            return process.returncode == 0
+    return False
+
+
+def _wav_duration(path: str) -> float:
+    with wave.open(path, "rb") as wav:
+        return wav.getnframes() / float(wav.getframerate() or 1)
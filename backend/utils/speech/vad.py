@@ -0,0 +1,163 @@
+# backend/utils/speech/vad.py
+
+import io
+import os
+import wave
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+FRAME_MS = 30
+# Speech must be this far above the estimated noise floor (dB)
+ENERGY_MARGIN_DB = float(os.getenv("VAD_ENERGY_MARGIN_DB", "10"))
+# Never treat anything quieter than this as speech, even in a silent room (dBFS)
+MIN_SPEECH_DBFS = float(os.getenv("VAD_MIN_SPEECH_DBFS", "-50"))
+# Kept around each speech region so word onsets/endings are not clipped
+PADDING_MS = int(os.getenv("VAD_PADDING_MS", "300"))
+# Shorter pauses than this stay inside one region
+MIN_SILENCE_MS = int(os.getenv("VAD_MIN_SILENCE_MS", "600"))
+MIN_SPEECH_MS = int(os.getenv("VAD_MIN_SPEECH_MS", "200"))
+MAX_SEGMENT_SECONDS = float(os.getenv("VAD_MAX_SEGMENT_SECONDS", "30"))
+
+
+def read_wav(data: bytes) -> Tuple[np.ndarray, int]:
+    """
+    Decodes 16-bit PCM WAV bytes into mono int16 samples.
+    Raises ValueError for anything else.
+    """
+    try:
+        with wave.open(io.BytesIO(data), "rb") as wav:
+            if wav.getsampwidth() != 2:
+                raise ValueError("Only 16-bit PCM WAV is supported")
+            channels = wav.getnchannels()
+            sample_rate = wav.getframerate()
+            frames = wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError) as e:
+        raise ValueError(f"Not a PCM WAV file: {e}")
+
+    samples = np.frombuffer(frames, dtype="<i2")
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    return samples, sample_rate
+
+
+def write_wav(samples: np.ndarray, sample_rate: int) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples.astype("<i2").tobytes())
+    return buffer.getvalue()
+
+
+def _frame_energies_db(samples: np.ndarray, frame_len: int) -> np.ndarray:
+    n_frames = len(samples) // frame_len
+    frames = samples[: n_frames * frame_len].astype(np.float64).reshape(n_frames, frame_len)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1.0) / 32768.0)
+
+
+def detect_speech(samples: np.ndarray, sample_rate: int) -> List[Tuple[int, int]]:
+    """
+    Frame-energy VAD. Returns (start, end) sample ranges that contain speech,
+    padded by PADDING_MS and with short pauses merged.
+    """
+    frame_len = max(1, sample_rate * FRAME_MS // 1000)
+    energies = _frame_energies_db(samples, frame_len)
+    if energies.size == 0:
+        return []
+
+    # The 10th percentile approximates the noise floor; clips that are almost all
+    # speech have no floor to find, so never set the bar within 20 dB of the peak
+    noise_floor = np.percentile(energies, 10)
+    threshold = max(min(noise_floor + ENERGY_MARGIN_DB, energies.max() - 20), MIN_SPEECH_DBFS)
+    voiced = energies > threshold
+
+    regions = []
+    start = None
+    for i, is_voiced in enumerate(voiced):
+        if is_voiced and start is None:
+            start = i
+        elif not is_voiced and start is not None:
+            regions.append([start, i])
+            start = None
+    if start is not None:
+        regions.append([start, len(voiced)])
+
+    pad = PADDING_MS // FRAME_MS
+    min_gap = MIN_SILENCE_MS // FRAME_MS
+    # [padded start, padded end, voiced start, voiced end]; the length check uses
+    # the voiced span, since padding is clamped at the clip edges
+    merged = []
+    for voiced_start, voiced_end in regions:
+        region_start = max(0, voiced_start - pad)
+        region_end = min(len(voiced), voiced_end + pad)
+        if merged and region_start - merged[-1][1] <= min_gap:
+            merged[-1][1] = max(merged[-1][1], region_end)
+            merged[-1][3] = voiced_end
+        else:
+            merged.append([region_start, region_end, voiced_start, voiced_end])
+
+    min_frames = MIN_SPEECH_MS // FRAME_MS
+    return [
+        (s * frame_len, min(len(samples), e * frame_len))
+        for s, e, voiced_start, voiced_end in merged
+        if voiced_end - voiced_start >= min_frames
+    ]
+
+
+def _group_segments(regions: List[Tuple[int, int]], sample_rate: int) -> List[Tuple[int, int]]:
+    """Packs neighbouring speech regions into segments of at most MAX_SEGMENT_SECONDS."""
+    max_len = int(MAX_SEGMENT_SECONDS * sample_rate)
+    segments = []
+    for start, end in regions:
+        while end - start > max_len:
+            segments.append((start, start + max_len))
+            start += max_len
+        if segments and end - segments[-1][0] <= max_len and start >= segments[-1][1]:
+            segments[-1] = (segments[-1][0], end)
+        else:
+            segments.append((start, end))
+    return segments
+
+
+def trim_silence(wav_bytes: bytes) -> Optional[dict]:
+    """
+    Removes leading/trailing silence and long pauses from a WAV clip and splits
+    long recordings into segments for recognition.
+
+    Returns None when the input is not 16-bit PCM WAV (caller should send it as is), else:
+    {"segments": [wav bytes, ...], "original_seconds", "speech_seconds", "seconds_saved"}.
+    An empty "segments" list means the clip contains no speech.
+    """
+    try:
+        samples, sample_rate = read_wav(wav_bytes)
+    except ValueError:
+        return None
+
+    original_seconds = len(samples) / sample_rate if sample_rate else 0.0
+    regions = detect_speech(samples, sample_rate)
+    pause = np.zeros(sample_rate * FRAME_MS * 4 // 1000, dtype=np.int16)
+
+    segments = []
+    speech_samples = 0
+    for seg_start, seg_end in _group_segments(regions, sample_rate):
+        parts = []
+        for start, end in regions:
+            start, end = max(start, seg_start), min(end, seg_end)
+            if start < end:
+                if parts:
+                    parts.append(pause)
+                parts.append(samples[start:end])
+        pcm = np.concatenate(parts)
+        speech_samples += len(pcm)
+        segments.append(write_wav(pcm, sample_rate))
+
+    speech_seconds = speech_samples / sample_rate if sample_rate else 0.0
+    return {
+        "segments": segments,
+        "original_seconds": round(original_seconds, 2),
+        "speech_seconds": round(speech_seconds, 2),
+        "seconds_saved": round(max(0.0, original_seconds - speech_seconds), 2),
+    }
@@ -0,0 +1,202 @@
+# backend/utils/tracing.py
+
+import os
+import math
+import time
+import uuid
+import datetime
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+# Completed and in-flight traces kept for export; oldest are dropped first
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "1000"))
+
+_traces: "deque[Trace]" = deque(maxlen=TRACE_BUFFER_SIZE)
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed stage of a trace (stt, context, llm, tts, ...) with free-form attributes."""
+
+    def __init__(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.offset_ms = 0.0
+        self.duration_ms: Optional[float] = None
+        self._start = time.perf_counter()
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def finish(self):
+        self.duration_ms = round((time.perf_counter() - self._start) * 1000, 2)
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "offset_ms": self.offset_ms,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+        }
+
+
+class Trace:
+    """All stage spans of one request or voice turn."""
+
+    def __init__(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.started_at = datetime.datetime.utcnow().isoformat() + "Z"
+        self.duration_ms: Optional[float] = None
+        self.spans: List[Span] = []
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add_span(self, span: Span):
+        span.offset_ms = round((span._start - self._start) * 1000, 2)
+        with self._lock:
+            self.spans.append(span)
+
+    def finish(self):
+        """Sets the total duration; may be called again when a streamed stage completes later."""
+        self.duration_ms = round((time.perf_counter() - self._start) * 1000, 2)
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            spans = [s.to_dict() for s in self.spans]
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+            "spans": spans,
+        }
+
+
+@contextmanager
+def trace(name: str, **attributes) -> Iterator[Trace]:
+    """
+    Starts a trace for the current request/turn. Spans opened inside it (also in
+    threads started with asyncio.to_thread, which copies the context) are attached to it.
+    """
+    current = Trace(name, attributes)
+    _traces.append(current)
+    token = _current_trace.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.set(error=type(e).__name__)
+        raise
+    finally:
+        current.finish()
+        _current_trace.reset(token)
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Span]:
+    """Times one stage. Outside of a trace the span is measured but not recorded."""
+    current = Span(name, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.set(error=type(e).__name__)
+        raise
+    finally:
+        current.finish()
+        _current_span.reset(token)
+        active = _current_trace.get()
+        if active is not None:
+            active.add_span(current)
+
+
+def annotate(**attributes):
+    """Adds attributes (e.g. cache hits) to the innermost open span, or to the trace itself."""
+    target = _current_span.get() or _current_trace.get()
+    if target is not None:
+        target.set(**attributes)
+
+
+def traced_stream(chunks: Iterable[bytes], name: str) -> Iterator[bytes]:
+    """
+    Wraps a response body so the stage that runs while it streams (e.g. TTS) is still
+    recorded on the request's trace, with time to first chunk and total bytes.
+    """
+    active = _current_trace.get()
+    stream_span = Span(name)
+
+    def generate():
+        first_chunk_ms = None
+        total = 0
+        try:
+            for chunk in chunks:
+                if first_chunk_ms is None:
+                    first_chunk_ms = round((time.perf_counter() - stream_span._start) * 1000, 2)
+                total += len(chunk)
+                yield chunk
+        finally:
+            stream_span.finish()
+            stream_span.set(first_chunk_ms=first_chunk_ms, bytes_out=total)
+            if active is not None:
+                active.add_span(stream_span)
+                active.finish()
+
+    return generate()
+
+
+def current_trace_id() -> Optional[str]:
+    active = _current_trace.get()
+    return active.trace_id if active else None
+
+
+def export_traces(limit: Optional[int] = None, name: Optional[str] = None) -> List[Dict]:
+    """Most recent traces first, as JSON-serializable dicts."""
+    traces = [t for t in reversed(_traces) if name is None or t.name == name]
+    if limit is not None:
+        traces = traces[:limit]
+    return [t.to_dict() for t in traces]
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    index = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def summarize_traces(name: Optional[str] = None) -> Dict[str, Dict[str, Dict]]:
+    """p50/p95/p99/max per stage (plus "total"), grouped by trace name, over the buffered traces."""
+    durations: Dict[str, Dict[str, List[float]]] = {}
+    for t in list(_traces):
+        if name is not None and t.name != name:
+            continue
+        stages = durations.setdefault(t.name, {})
+        if t.duration_ms is not None:
+            stages.setdefault("total", []).append(t.duration_ms)
+        with t._lock:
+            spans = list(t.spans)
+        for s in spans:
+            if s.duration_ms is not None:
+                stages.setdefault(s.name, []).append(s.duration_ms)
+
+    summary = {}
+    for trace_name, stages in durations.items():
+        summary[trace_name] = {}
+        for stage, values in stages.items():
+            values.sort()
+            summary[trace_name][stage] = {
+                "count": len(values),
+                "p50_ms": _percentile(values, 50),
+                "p95_ms": _percentile(values, 95),
+                "p99_ms": _percentile(values, 99),
+                "max_ms": values[-1],
+            }
+    return summary
@@ -0,0 +1,115 @@
+# backend/utils/voice_context.py
+
+import os
+import json
+import time
+import threading
+from typing import Dict
+
+from azure.core.exceptions import ResourceNotFoundError
+from azure.storage.blob import ContentSettings
+
+from config.blob_config import container_client
+from utils.memory_manifest import get_memory_manifest
+from utils.tracing import annotate
+
+VOICE_CONTEXT_TTL_SECONDS = int(os.getenv("VOICE_CONTEXT_TTL_SECONDS", "300"))
+MAX_CONTEXT_MEMORIES = int(os.getenv("VOICE_CONTEXT_MAX_MEMORIES", "30"))
+
+PERSONA_FIELDS = ("name", "relation", "personality", "style", "signature_phrases", "birthday", "favorites", "opinions")
+
+_cache: Dict[str, tuple] = {}
+_cache_lock = threading.Lock()
+
+
+def _get_voice_context_blob_name(profile_id: str) -> str:
+    """
+    Returns the blob path of the pre-assembled voice context summary for a profile.
+    """
+    return f"profiles/{profile_id}/voice_context.json"
+
+
+def _read_json_blob(blob_name: str, default):
+    try:
+        data = container_client.get_blob_client(blob_name).download_blob().readall()
+        return json.loads(data)
+    except (ResourceNotFoundError, json.JSONDecodeError):
+        return default
+
+
+def _assemble_voice_context(profile_id: str) -> Dict:
+    profile = _read_json_blob(f"profiles/{profile_id}/profile.json", {}) or {}
+    user_facts = _read_json_blob(f"profiles/{profile_id}/user_facts.json", {}) or {}
+    manifest = get_memory_manifest(profile_id, container_client)
+
+    memories = sorted(manifest, key=lambda m: m.get("upload_date") or "", reverse=True)[:MAX_CONTEXT_MEMORIES]
+    return {
+        "profile_id": profile_id,
+        "profile": {k: profile[k] for k in PERSONA_FIELDS if profile.get(k)},
+        "user_facts": user_facts,
+        "memories": [
+            {"title": m.get("title", ""), "description": m.get("description", "")} for m in memories
+        ],
+    }
+
+
+def get_voice_context(profile_id: str) -> Dict:
+    """
+    Returns the compact voice context (persona, user facts, recent memories) for one profile.
+
+    Served from memory while fresh; otherwise one read of the stored summary, and only
+    when that is missing a rebuild from profile.json, user_facts.json and the memory manifest.
+    """
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _cache.get(profile_id)
+        if cached and now - cached[0] < VOICE_CONTEXT_TTL_SECONDS:
+            annotate(voice_context_cache="memory")
+            return cached[1]
+
+    blob_name = _get_voice_context_blob_name(profile_id)
+    context = _read_json_blob(blob_name, None)
+    annotate(voice_context_cache="blob" if context is not None else "rebuilt")
+    if context is None:
+        context = _assemble_voice_context(profile_id)
+        container_client.get_blob_client(blob_name).upload_blob(
+            json.dumps(context, ensure_ascii=False),
+            overwrite=True,
+            content_settings=ContentSettings(content_type="application/json"),
+        )
+
+    with _cache_lock:
+        _cache[profile_id] = (now, context)
+    return context
+
+
+def invalidate_voice_context(profile_id: str):
+    """
+    Drops the cached context for a profile. Call after any write to its persona,
+    user facts or memories; other workers pick the change up within the TTL.
+    """
+    with _cache_lock:
+        _cache.pop(profile_id, None)
+    try:
+        container_client.get_blob_client(_get_voice_context_blob_name(profile_id)).delete_blob()
+    except ResourceNotFoundError:
+        pass
+    except Exception as e:
+        print(f"[invalidate_voice_context] Error: {e}")
+
+
+def format_voice_context(context: Dict) -> str:
+    """
+    Renders the context as plain text for a system prompt.
+    """
+    profile = context.get("profile", {})
+    lines = [f"{k}: {v}" for k, v in profile.items()]
+    facts = context.get("user_facts", {})
+    if facts:
+        lines.append("Known user facts:")
+        lines.extend(f"- {k}: {v}" for k, v in facts.items())
+    memories = context.get("memories", [])
+    if memories:
+        lines.append("Memories:")
+        lines.extend(f"• {m['title']}: {m['description']}" for m in memories)
+    return "\n".join(lines)
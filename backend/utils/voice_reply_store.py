@@ -0,0 +1,86 @@
+# backend/utils/voice_reply_store.py
+
+import os
+import uuid
+import asyncio
+import datetime
+import logging
+
+from azure.core.exceptions import ResourceNotFoundError
+from azure.storage.blob import ContentSettings
+
+from config.blob_config import container_client
+from utils.blob_sas import sas_service
+from utils.speech.audio_formats import AUDIO_FORMATS
+
+logger = logging.getLogger(__name__)
+
+VOICE_REPLY_PREFIX = "voice_replies/"
+VOICE_REPLY_URL_TTL_MINUTES = int(os.getenv("VOICE_REPLY_URL_TTL_MINUTES", "15"))
+VOICE_REPLY_MAX_AGE_HOURS = float(os.getenv("VOICE_REPLY_MAX_AGE_HOURS", "24"))
+VOICE_REPLY_MAX_TOTAL_MB = int(os.getenv("VOICE_REPLY_MAX_TOTAL_MB", "1024"))
+VOICE_REPLY_SWEEP_INTERVAL_SECONDS = int(os.getenv("VOICE_REPLY_SWEEP_INTERVAL_SECONDS", "900"))
+
+
+def store_voice_reply(profile_id: str, audio: bytes, audio_format: str) -> dict:
+    """
+    Uploads a generated reply to blob storage and returns a short-lived read URL,
+    so any worker (or the client directly) can fetch it.
+    """
+    fmt = AUDIO_FORMATS[audio_format]
+    blob_name = f"{VOICE_REPLY_PREFIX}{profile_id}/{uuid.uuid4().hex}.{fmt['extension']}"
+    container_client.get_blob_client(blob_name).upload_blob(
+        audio,
+        overwrite=True,
+        content_settings=ContentSettings(content_type=fmt["media_type"]),
+    )
+
+    audio_url, expires_at = sas_service.sign(blob_name, "r", datetime.timedelta(minutes=VOICE_REPLY_URL_TTL_MINUTES))
+    return {
+        "blob_name": blob_name,
+        "audio_url": audio_url,
+        "expires_at": expires_at.isoformat() + "Z",
+    }
+
+
+def sweep_voice_replies() -> int:
+    """
+    Deletes replies older than VOICE_REPLY_MAX_AGE_HOURS, then the oldest ones until
+    the total stays under VOICE_REPLY_MAX_TOTAL_MB. Returns the number deleted.
+    """
+    now = datetime.datetime.now(datetime.timezone.utc)
+    max_age = datetime.timedelta(hours=VOICE_REPLY_MAX_AGE_HOURS)
+    blobs = sorted(
+        container_client.list_blobs(name_starts_with=VOICE_REPLY_PREFIX),
+        key=lambda b: b.last_modified,
+    )
+
+    expired = [b for b in blobs if now - b.last_modified > max_age]
+    remaining = [b for b in blobs if now - b.last_modified <= max_age]
+    total = sum(b.size for b in remaining)
+    max_total = VOICE_REPLY_MAX_TOTAL_MB * 1024 * 1024
+    while remaining and total > max_total:
+        oldest = remaining.pop(0)
+        total -= oldest.size
+        expired.append(oldest)
+
+    deleted = 0
+    for blob in expired:
+        try:
+            container_client.delete_blob(blob.name)
+            deleted += 1
+        except ResourceNotFoundError:
+            # Another worker's janitor got there first
+            pass
+    if deleted:
+        logger.info(f"[VoiceReplyStore] Deleted {deleted} expired voice replies")
+    return deleted
+
+
+async def run_voice_reply_janitor():
+    while True:
+        try:
+            await asyncio.to_thread(sweep_voice_replies)
+        except Exception as e:
+            logger.warning(f"[VoiceReplyStore] Sweep failed: {e}")
+        await asyncio.sleep(VOICE_REPLY_SWEEP_INTERVAL_SECONDS)
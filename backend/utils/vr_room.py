@@ -0,0 +1,124 @@
+# backend/utils/vr_room.py
+
+import os
+import logging
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from azure.storage.blob import ContainerClient
+
+from utils.blob_sas import sign_read_urls
+from utils.file_type import detect_file_type
+from utils.memory_manifest import get_memory_manifest
+from utils.model_lod import vr_model_item
+from utils.renditions import VR_DISPLAY_SIZE, pick_rendition_info
+
+logger = logging.getLogger(__name__)
+
+# Memory file types as the VR client names them
+VR_ITEM_TYPES = {"image": "image", "video": "video", "audio": "audio", "document": "text", "model": "model"}
+
+
+def _item_type(entry: Dict) -> str:
+    file_type = entry.get("file_type") or detect_file_type(os.path.splitext(entry["file_path"])[1])
+    return VR_ITEM_TYPES.get(file_type, file_type)
+
+
+def _locate_unindexed(profile_id: str, memory_ids: List[str], container_client: ContainerClient) -> Dict[str, Dict]:
+    """
+    Fallback for memories missing from the manifest (e.g. uploaded before it existed):
+    one listing of the profile's blobs, matched on file name.
+    """
+    wanted = set(memory_ids)
+    found: Dict[str, Dict] = {}
+    prefix = f"profiles/{profile_id}/"
+    for blob in container_client.list_blobs(name_starts_with=prefix):
+        relative = blob.name[len(prefix):]
+        if relative.startswith("metadata/"):
+            continue
+        stem = os.path.splitext(os.path.basename(relative))[0]
+        if stem in wanted and stem not in found:
+            found[stem] = {"memory_id": stem, "file_path": blob.name}
+    return found
+
+
+def resolve_memories(
+    profile_id: str,
+    memory_ids: List[str],
+    container_client: ContainerClient,
+) -> Tuple[Dict[str, Dict], List[str]]:
+    """
+    Looks up where each memory is stored: one manifest read, plus a single prefix
+    listing only if some ids aren't in it. Returns ({memory_id: entry}, missing_ids).
+    """
+    manifest = {
+        entry.get("memory_id"): entry
+        for entry in get_memory_manifest(profile_id, container_client)
+        if entry.get("file_path")
+    }
+    entries = {mem_id: manifest[mem_id] for mem_id in memory_ids if mem_id in manifest}
+    unindexed = [mem_id for mem_id in memory_ids if mem_id not in entries]
+    if unindexed:
+        entries.update(_locate_unindexed(profile_id, unindexed, container_client))
+        logger.info(f"[VRRoom] {len(unindexed)} id(s) not in the manifest; listed profile blobs")
+    missing = [mem_id for mem_id in memory_ids if mem_id not in entries]
+    return entries, missing
+
+
+def room_items(profile_id: str, memory_ids: List[str], container_client: ContainerClient) -> Tuple[List[Dict], List[str]]:
+    """
+    Unsigned VR room items (blob `path`s) for the selected memories, in selection
+    order. Images use their display-sized rendition when one exists.
+    Returns (items, missing_ids).
+    """
+    entries, missing = resolve_memories(profile_id, memory_ids, container_client)
+    items = []
+    for mem_id in dict.fromkeys(memory_ids):
+        entry = entries.get(mem_id)
+        if entry is None:
+            continue
+        if entry.get("file_type") == "model":
+            # Mirrored 3D models live under models/ with their LOD variants
+            items.append(vr_model_item(entry))
+            continue
+        rendition = pick_rendition_info(entry, VR_DISPLAY_SIZE)
+        item = {
+            "id": mem_id,
+            "type": _item_type(entry),
+            "path": rendition["path"] if rendition else entry["file_path"],
+            "title": os.path.basename(entry["file_path"]),
+            "position": None,
+            "rotation": None,
+            "scale": None,
+        }
+        if rendition:
+            # Used for frame proportions and load ordering
+            item.update(width=rendition["width"], height=rendition["height"], bytes=rendition["bytes"])
+        items.append(item)
+    return items, missing
+
+
+def sign_items(
+    items: List[Dict],
+    sign_many: Callable[[Iterable[str]], Dict[str, str]] = sign_read_urls,
+) -> List[Dict]:
+    """Copies of `items` with a `url` next to every `path` (LODs included), signed in one batch."""
+    paths = [item["path"] for item in items] + [lod["path"] for item in items for lod in item.get("lods") or []]
+    urls = sign_many(paths)
+    signed = []
+    for item in items:
+        copy = {**item, "url": urls[item["path"]]}
+        if item.get("lods"):
+            copy["lods"] = [{**lod, "url": urls[lod["path"]]} for lod in item["lods"]]
+        signed.append(copy)
+    return signed
+
+
+def build_room_items(
+    profile_id: str,
+    memory_ids: List[str],
+    container_client: ContainerClient,
+    sign_many: Callable[[Iterable[str]], Dict[str, str]] = sign_read_urls,
+) -> Tuple[List[Dict], List[str]]:
+    """Signed VR room items for the selected memories. Returns (items, missing_ids)."""
+    items, missing = room_items(profile_id, memory_ids, container_client)
+    return sign_items(items, sign_many), missing
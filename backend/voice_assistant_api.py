@@ -1,31 +1,30 @@
 import os
-import io
+import asyncio
+import logging
+import tempfile
 from dotenv import load_dotenv
-from fastapi import APIRouter, File, UploadFile
+from typing import Optional, Tuple
+from fastapi import APIRouter, File, Form, Request, UploadFile
 from fastapi.responses import StreamingResponse
-from azure.storage.blob import BlobServiceClient
 import azure.cognitiveservices.speech as speechsdk
 from openai import AzureOpenAI
+from utils.speech.engine_pool import speech_pool
+from utils.voice_context import get_voice_context, format_voice_context
+from utils.speech.tts_cache import get_or_synthesize, stream_tts, DEFAULT_OUTPUT_FORMAT
+from utils.speech.audio_formats import AUDIO_FORMATS, negotiate_audio_format
+from utils.speech.vad import trim_silence
+from utils.speech.long_form import LONG_FORM_MIN_CHARS, iter_long_form, synthesize_long_form
+from utils.tracing import trace, span, traced_stream
 
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
-# Azure Blob Storage setup
-blob_service_client = BlobServiceClient.from_connection_string(
-    os.getenv("AZURE_STORAGE_CONNECTION_STRING")
-)
-container_client = blob_service_client.get_container_client(
-    os.getenv("AZURE_CONTAINER_NAME")
-)
-
-# Azure Speech setup
-speech_config = speechsdk.SpeechConfig(
-    subscription=os.getenv("AZURE_SPEECH_KEY"),
-    region=os.getenv("AZURE_SPEECH_REGION"),
-)
-speech_config.speech_recognition_language = "en-US"
+# Azure Speech setup (engines come from the shared pool)
+SPEECH_LANGUAGE = "en-US"
 
 # Azure OpenAI setup
 openai_client = AzureOpenAI(
@@ -35,24 +34,42 @@ openai_client = AzureOpenAI(
 )
 deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT")
 
-def fetch_memories():
-    memory_context = ""
-    for blob in container_client.list_blobs():
-        if blob.name.endswith(('.txt', '.json')):
-            stream = container_client.download_blob(blob.name).readall().decode('utf-8')
-            memory_context += f"\n\n---\n{blob.name}:\n{stream}"
-    return memory_context
+def fetch_memories(profile_id: Optional[str]) -> str:
+    """Compact, cached context for one profile (never other profiles' data)."""
+    if not profile_id:
+        return ""
+    return format_voice_context(get_voice_context(profile_id))
 
 def recognize_audio_file(file_path) -> str:
-    audio_config = speechsdk.audio.AudioConfig(filename=file_path)
-    recognizer = speechsdk.SpeechRecognizer(
-        speech_config=speech_config, audio_config=audio_config
-    )
+    recognizer = speech_pool.file_recognizer(file_path, language=SPEECH_LANGUAGE)
     result = recognizer.recognize_once()
     if result.reason == speechsdk.ResultReason.RecognizedSpeech:
         return result.text
     return ""
 
+def recognize_audio_bytes(audio_bytes: bytes) -> str:
+    fd, temp_filename = tempfile.mkstemp(suffix=".wav")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(audio_bytes)
+        return recognize_audio_file(temp_filename)
+    finally:
+        os.remove(temp_filename)
+
+def recognize_clip(audio_bytes: bytes) -> Tuple[str, float]:
+    """
+    Trims silence locally before STT and recognizes each speech segment.
+    Returns (text, seconds of audio not sent to the service).
+    """
+    vad = trim_silence(audio_bytes)
+    if vad is None:
+        # Not PCM WAV; let the service deal with it as before
+        return recognize_audio_bytes(audio_bytes), 0.0
+    if not vad["segments"]:
+        return "", vad["seconds_saved"]
+    texts = [recognize_audio_bytes(segment) for segment in vad["segments"]]
+    return " ".join(t for t in texts if t), vad["seconds_saved"]
+
 def get_instruction_prompt():
     return (
         "You are a compassionate memory-based voice assistant. "
@@ -73,45 +90,65 @@ def get_response_from_openai(user_input, context):
     )
     return response.choices[0].message.content.strip()
 
-def speak_text_to_bytes(text) -> bytes:
-    speech_synthesizer = speechsdk.SpeechSynthesizer(
-        speech_config=speech_config,
-        audio_config=speechsdk.audio.AudioOutputConfig(use_default_speaker=False)
+def _synthesize_chunk(text, audio_format: Optional[str] = None) -> bytes:
+    sdk_format = AUDIO_FORMATS[audio_format]["sdk_format"] if audio_format else None
+    return speech_pool.synthesize_to_bytes(text, language=SPEECH_LANGUAGE, output_format=sdk_format)
+
+def _synthesize_to_bytes(text, audio_format: Optional[str] = None) -> bytes:
+    if len(text) >= LONG_FORM_MIN_CHARS:
+        return synthesize_long_form(text, lambda chunk: _synthesize_chunk(chunk, audio_format), audio_format)
+    return _synthesize_chunk(text, audio_format)
+
+def _synthesize_stream(text, audio_format: str):
+    """Long replies stream sentence chunks as they finish instead of waiting for the whole reply."""
+    if len(text) >= LONG_FORM_MIN_CHARS:
+        return iter_long_form(text, lambda chunk: _synthesize_chunk(chunk, audio_format), audio_format)
+    return _synthesize_chunk(text, audio_format)
+
+def speak_text_to_bytes(text, audio_format: Optional[str] = None) -> bytes:
+    return get_or_synthesize(
+        None,
+        SPEECH_LANGUAGE,
+        text,
+        lambda: _synthesize_to_bytes(text, audio_format),
+        output_format=audio_format or DEFAULT_OUTPUT_FORMAT,
     )
-    result = speech_synthesizer.speak_text_async(text).get()
-    return result.audio_data
-
-@router.post("/voice-chat-once/")
-async def voice_chat_once(file: UploadFile = File(...)):
-    temp_filename = "temp_audio.wav"
-    with open(temp_filename, "wb") as f:
-        f.write(await file.read())
-
-    user_text = recognize_audio_file(temp_filename)
-    if not user_text:
-        return {"error": "Could not recognize speech"}
-
-    context = fetch_memories()
-    ai_reply = get_response_from_openai(user_text, context)
-    audio_bytes = speak_text_to_bytes(ai_reply)
-
-    return StreamingResponse(io.BytesIO(audio_bytes), media_type="audio/wav")
-
-
-# (All initialization as before...)
 
 @router.post("/voice-chat-once/")
-async def voice_chat_once(file: UploadFile = File(...)):
-    # (All logic as before...)
-    temp_filename = "temp_audio.wav"
-    with open(temp_filename, "wb") as f:
-        f.write(await file.read())
-    user_text = recognize_audio_file(temp_filename)
-    if not user_text:
-        return {"error": "Could not recognize speech"}
-    context = fetch_memories()
-    ai_reply = get_response_from_openai(user_text, context)
-    audio_bytes = speak_text_to_bytes(ai_reply)
-    return StreamingResponse(io.BytesIO(audio_bytes), media_type="audio/wav")
-
-# (All helper functions stay the same...)
+async def voice_chat_once(
+    request: Request,
+    file: UploadFile = File(...),
+    profile_id: Optional[str] = Form(None),
+):
+    # Opus/OGG and MP3 are roughly 10x smaller than WAV; clients opt in via Accept
+    audio_format = negotiate_audio_format(request.headers.get("accept"))
+
+    with trace("voice_chat_once", profile_id=profile_id, audio_format=audio_format) as turn:
+        audio = await file.read()
+        with span("stt", bytes_in=len(audio)) as stt:
+            user_text, seconds_saved = await asyncio.to_thread(recognize_clip, audio)
+            stt.set(vad_seconds_saved=seconds_saved, chars=len(user_text))
+        logger.info(f"[voice-chat-once] VAD skipped {seconds_saved:.2f}s of silence")
+        if not user_text:
+            return {"error": "Could not recognize speech", "vad_seconds_saved": seconds_saved}
+
+        with span("context") as ctx:
+            context = fetch_memories(profile_id)
+            ctx.set(chars=len(context))
+        with span("llm", prompt_chars=len(user_text) + len(context)) as llm:
+            ai_reply = get_response_from_openai(user_text, context)
+            llm.set(reply_chars=len(ai_reply))
+        with span("tts_start"):
+            audio_stream = stream_tts(
+                None,
+                SPEECH_LANGUAGE,
+                ai_reply,
+                lambda: _synthesize_stream(ai_reply, audio_format),
+                output_format=audio_format,
+            )
+
+        return StreamingResponse(
+            traced_stream(audio_stream, "tts_stream"),
+            media_type=AUDIO_FORMATS[audio_format]["media_type"],
+            headers={"X-VAD-Seconds-Saved": str(seconds_saved), "X-Trace-Id": turn.trace_id},
+        )
@@ -1,24 +1,15 @@
-import os
 import azure.cognitiveservices.speech as speechsdk
+from utils.speech.engine_pool import speech_pool
 
 # Transcribe user voice audio to text
 def transcribe_audio(file_path: str) -> str:
-    speech_config = speechsdk.SpeechConfig(
-        subscription=os.getenv("SPEECH_KEY"),
-        region=os.getenv("SPEECH_REGION")
-    )
-    audio_config = speechsdk.audio.AudioConfig(filename=file_path)
-    recognizer = speechsdk.SpeechRecognizer(speech_config, audio_config)
+    recognizer = speech_pool.file_recognizer(file_path)
     result = recognizer.recognize_once()
     return result.text if result.reason == speechsdk.ResultReason.RecognizedSpeech else ""
 
 # Synthesize text into spoken audio
 def synthesize_speech(text: str, output_path: str) -> str:
-    speech_config = speechsdk.SpeechConfig(
-        subscription=os.getenv("SPEECH_KEY"),
-        region=os.getenv("SPEECH_REGION")
-    )
-    audio_config = speechsdk.audio.AudioOutputConfig(filename=output_path)
-    synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config, audio_config=audio_config)
-    synthesizer.speak_text(text)
+    audio = speech_pool.synthesize_to_bytes(text)
+    with open(output_path, "wb") as f:
+        f.write(audio)
     return output_path
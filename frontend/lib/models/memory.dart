@@ -5,12 +5,16 @@ class Memory {
   final String filePath;
   final String fileType;
   final String contentUrl;
+  final String thumbnailUrl;
+  final String displayUrl;
 
   Memory({
     required this.title,
     required this.filePath,
     required this.fileType,
     required this.contentUrl,
+    this.thumbnailUrl = '',
+    this.displayUrl = '',
   });
 
 String get uniqueId {
@@ -20,11 +24,14 @@ String get uniqueId {
 }
 
   factory Memory.fromJson(Map<String, dynamic> json) {
+    final contentUrl = json['content_url'] ?? '';
     return Memory(
       title: json['title'] ?? '',
       filePath: json['file_path'] ?? '',
       fileType: json['file_type'] ?? '',
-      contentUrl: json['content_url'] ?? '',
+      contentUrl: contentUrl,
+      thumbnailUrl: json['thumbnail_url'] ?? contentUrl,
+      displayUrl: json['display_url'] ?? contentUrl,
     );
   }
 }
@@ -53,7 +53,16 @@ class _FluxAgingPageState extends State<FluxAgingPage> {
         ..files.add(await http.MultipartFile.fromPath('file', _imageFile!.path));
       var streamedResponse = await request.send();
       var respStr = await streamedResponse.stream.bytesToString();
-      var jsonResp = jsonDecode(respStr);
+      var submitted = jsonDecode(respStr);
+      Map<String, dynamic> jsonResp;
+      if (submitted['status'] == 'completed' && submitted['result'] != null) {
+        // Cached result from an earlier run with the same image and settings
+        jsonResp = Map<String, dynamic>.from(submitted['result']);
+      } else if (submitted['job_id'] != null) {
+        jsonResp = await _waitForJob(submitted['job_id']);
+      } else {
+        throw Exception(submitted['detail'] ?? 'Could not start the transformation.');
+      }
 
       if (jsonResp['status'] == 'completed' && jsonResp['image_url'] != null) {
         setState(() {
@@ -82,6 +91,25 @@ class _FluxAgingPageState extends State<FluxAgingPage> {
     }
   }
 
+  /// Polls the aging job until it finishes; returns its result, or an {'error': ...} map.
+  Future<Map<String, dynamic>> _waitForJob(String jobId) async {
+    final statusUri = Uri.parse('http://localhost:8000/flux/age-transform/status/$jobId');
+    for (int attempt = 0; attempt < 120; attempt++) {
+      await Future.delayed(Duration(seconds: 2));
+      var response = await http.get(statusUri);
+      if (response.statusCode != 200) {
+        return {'error': 'Status check failed (${response.statusCode})'};
+      }
+      var data = jsonDecode(response.body);
+      if (data['status'] == 'completed') {
+        return Map<String, dynamic>.from(data['result']);
+      } else if (data['status'] == 'failed') {
+        return {'error': data['error']};
+      }
+    }
+    return {'error': 'Timed out waiting for the result.'};
+  }
+
   Widget _uploadSection() {
     return LayoutBuilder(
       builder: (context, constraints) {
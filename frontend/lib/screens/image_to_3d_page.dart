@@ -71,7 +71,14 @@ class _ImageTo3DPageState extends State<ImageTo3DPage> with TickerProviderStateM
 
       if (response.statusCode == 200) {
         var jsonResponse = json.decode(response.body);
-        if (jsonResponse['task_id'] != null) {
+        if (jsonResponse['status'] == 'completed') {
+          // Same photo was converted before; the server returns the stored model
+          setState(() {
+            _previewUrl = jsonResponse['preview'];
+            _modelUrl = jsonResponse['model_url'];
+            _isLoading = false;
+          });
+        } else if (jsonResponse['task_id'] != null) {
           String taskId = jsonResponse['task_id'];
           _startPolling(taskId);
         } else {
@@ -128,7 +128,7 @@ class _MediaViewerScreenState extends State<MediaViewerScreen> {
         appBar: AppBar(title: Text(memory.title)),
         body: Center(
           child: Image.network(
-            memory.contentUrl,
+            memory.displayUrl,
             fit: BoxFit.contain,
             errorBuilder: (context, error, stackTrace) =>
                 const Center(child: Icon(Icons.broken_image)),
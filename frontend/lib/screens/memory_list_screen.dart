@@ -191,7 +191,7 @@ class _MemoryListScreenState extends State<MemoryListScreen> with TickerProvider
               if (isImage(fileType) && memory.contentUrl.isNotEmpty)
                 Positioned.fill(
                   child: Image.network(
-                    memory.contentUrl,
+                    memory.thumbnailUrl,
                     fit: BoxFit.cover,
                     errorBuilder: (_, __, ___) => Container(color: Colors.black26),
                     loadingBuilder: (context, child, progress) {
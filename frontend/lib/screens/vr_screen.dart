@@ -167,7 +167,7 @@ class _VRoomScreenState extends State<VRoomScreen> {
                 children: [
                   if (isImage(memory.fileType) && memory.contentUrl.isNotEmpty)
                     Image.network(
-                      memory.contentUrl,
+                      memory.thumbnailUrl,
                       fit: BoxFit.cover,
                       errorBuilder: (_, __, ___) =>
                           Container(color: Colors.black26),